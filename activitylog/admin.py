@@ -8,12 +8,13 @@ from django.utils.html import escape
 from django.utils.safestring import mark_safe
 
 from .admin_helpers import ActivityLogModelAdmin, prettify_json
-from .models import CRUDEvent, LoginEvent, RequestEvent, CorsEvent
+from .models import CRUDEvent, LoginEvent, RequestEvent, CorsEvent, FlaggedRequest
 from .settings import (
     ADMIN_SHOW_AUTH_EVENTS,
     ADMIN_SHOW_MODEL_EVENTS,
     ADMIN_SHOW_REQUEST_EVENTS,
     CRUD_EVENT_LIST_FILTER,
+    DETECTOR,
     CRUD_EVENT_SEARCH_FIELDS,
     LOGIN_EVENT_LIST_FILTER,
     LOGIN_EVENT_SEARCH_FIELDS,
@@ -174,7 +175,9 @@ class LoginEventAdmin(ActivityLogModelAdmin):
 
 # Request events
 class RequestEventAdmin(ActivityLogModelAdmin):
-    list_display = ["datetime", "user_link", "method", "url", "remote_ip"]
+    list_display = [
+        "datetime", "user_link", "method", "url", "status_code", "duration_ms", "remote_ip"
+    ]
     date_hierarchy = "datetime"
     list_filter = REQUEST_EVENT_LIST_FILTER
     search_fields = REQUEST_EVENT_SEARCH_FIELDS
@@ -192,6 +195,10 @@ class RequestEventAdmin(ActivityLogModelAdmin):
         "country",
         "remote_ip",
         "datetime",
+        "status_code",
+        "duration_ms",
+        "response_bytes",
+        "db_query_count",
     ]
 
     def get_user(self, obj):
@@ -231,6 +238,32 @@ class CorsEventAdmin(ActivityLogModelAdmin):
     actions = [export_to_csv]
 
 
+class FlaggedRequestAdmin(ActivityLogModelAdmin):
+    list_display = [
+        "datetime", "method", "url", "reasons", "duration_ms", "db_query_count", "status_code"
+    ]
+    date_hierarchy = "datetime"
+    list_filter = ["reasons", "method", "datetime"]
+    search_fields = ["url", "fingerprints"]
+    readonly_fields = [
+        "url",
+        "method",
+        "status_code",
+        "duration_ms",
+        "db_query_count",
+        "reasons",
+        "fingerprints",
+        "query_shapes_prettified",
+        "request_event_id",
+        "datetime",
+    ]
+    exclude = ["query_shapes"]
+
+    @admin.display(description="query shapes")
+    def query_shapes_prettified(self, obj):
+        return prettify_json(obj.query_shapes)
+
+
 if ADMIN_SHOW_MODEL_EVENTS:
     admin.site.register(CRUDEvent, CRUDEventAdmin)
 
@@ -242,3 +275,6 @@ if ADMIN_SHOW_REQUEST_EVENTS:
 
 if ADMIN_SHOW_CORS_EVENTS:
     admin.site.register(CorsEvent, CorsEventAdmin)
+
+if DETECTOR:
+    admin.site.register(FlaggedRequest, FlaggedRequestAdmin)
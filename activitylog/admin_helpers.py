@@ -1,14 +1,23 @@
 import json
 from django.contrib import admin, messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
 from django.contrib.auth import get_user_model
 from django.core.exceptions import PermissionDenied
+from django.db import connections, router
 from django.http import HttpResponseRedirect
 from django.shortcuts import render
 from django.urls import re_path, reverse
 from django.utils.html import escape
 from django.utils.safestring import mark_safe
 from django.utils.translation import gettext_lazy as _
-from .settings import READONLY_EVENTS, TRUNCATE_TABLE_SQL_STATEMENT
+from .keyset import AFTER_VAR, BEFORE_VAR, InvalidCursor, keyset_page
+from .settings import (
+    ADMIN_DATABASE_ALIAS,
+    ADMIN_KEYSET_PAGINATION,
+    READONLY_EVENTS,
+    TRUNCATE_TABLE_SQL_STATEMENT,
+)
 
 
 def prettify_json(json_string):
@@ -22,10 +31,98 @@ def prettify_json(json_string):
     return html
 
 
+class KeysetChangeList(ChangeList):
+    """Changelist paginated by a ``(datetime, id)`` cursor instead of page numbers.
+
+    Filters, search and the date hierarchy narrow the queryset as usual; only the
+    final paging step is replaced, and no ``COUNT`` query is issued.
+    """
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(AFTER_VAR, None)
+        lookup_params.pop(BEFORE_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Changing a filter or the search always starts over from the newest events.
+        new_params = {AFTER_VAR: None, BEFORE_VAR: None, **(new_params or {})}
+        return super().get_query_string(new_params, remove)
+
+    def get_ordering(self, request, queryset):
+        return ["-datetime", "-pk"]
+
+    def get_results(self, request):
+        try:
+            page = keyset_page(
+                self.queryset,
+                self.list_per_page,
+                after=request.GET.get(AFTER_VAR),
+                before=request.GET.get(BEFORE_VAR),
+            )
+        except InvalidCursor:
+            raise IncorrectLookupParameters
+
+        self.result_list = page.object_list
+        self.result_count = len(page.object_list)
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = page.has_next or page.has_previous
+        self.paginator = None
+        self.first_url = self.get_query_string() if page.has_previous else None
+        self.next_url = (
+            self.get_query_string({AFTER_VAR: page.next_cursor}) if page.has_next else None
+        )
+        self.previous_url = (
+            self.get_query_string({BEFORE_VAR: page.previous_cursor})
+            if page.has_previous
+            else None
+        )
+
+
 class ActivityLogModelAdmin(admin.ModelAdmin):
+    keyset_pagination = ADMIN_KEYSET_PAGINATION
+    keyset_change_list_template = "admin/activity/keyset_change_list.html"
+    read_database_alias = ADMIN_DATABASE_ALIAS
+
+    def __init__(self, model, admin_site):
+        super().__init__(model, admin_site)
+        if self.keyset_pagination and self.change_list_template is None:
+            self.change_list_template = self.keyset_change_list_template
+
+    def changelist_view(self, request, extra_context=None):
+        # Only the change list reads from read_database_alias; detail views and writes
+        # keep using the routed database.
+        request.activitylog_read_database_alias = self.read_database_alias
+        return super().changelist_view(request, extra_context)
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        alias = getattr(request, "activitylog_read_database_alias", None)
+        if alias:
+            queryset = queryset.using(alias)
+        return queryset
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset.using(router.db_for_write(self.model)))
+
+    def get_changelist(self, request, **kwargs):
+        if self.keyset_pagination:
+            return KeysetChangeList
+        return super().get_changelist(request, **kwargs)
+
+    def get_sortable_by(self, request):
+        # Keyset pages are only stable for the (datetime, id) ordering.
+        if self.keyset_pagination:
+            return ()
+        return super().get_sortable_by(request)
+
     def get_changelist_instance(self, *args, **kwargs):
         changelist_instance = super().get_changelist_instance(*args, **kwargs)
-        user_ids = [obj.user_id for obj in changelist_instance.result_list]
+        # flagged requests have no user
+        user_ids = [getattr(obj, "user_id", None) for obj in changelist_instance.result_list]
         self.users_by_id = {
             user.id: user for user in get_user_model().objects.filter(id__in=user_ids)
         }
@@ -89,10 +186,8 @@ class ActivityLogModelAdmin(admin.ModelAdmin):
 
         def truncate_table(model):
             if TRUNCATE_TABLE_SQL_STATEMENT:
-                from django.db import connection
-
                 sql = TRUNCATE_TABLE_SQL_STATEMENT.format(db_table=model._meta.db_table)
-                cursor = connection.cursor()
+                cursor = connections[router.db_for_write(model)].cursor()
                 cursor.execute(sql)
             else:
                 model.objects.all().delete()
@@ -6,9 +6,12 @@ class ActivitylogConfig(AppConfig):
     name = 'activitylog'
 
     def ready(self):
+        from activitylog.registry import registry
         from activitylog.signals import (
             auth_signals,
             model_signals,
             request_signals,
             cors_signals,
-        )
\ No newline at end of file
+        )
+
+        registry.populate(self.apps.get_models())
\ No newline at end of file
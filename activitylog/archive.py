@@ -0,0 +1,277 @@
+"""Monthly CSV.gz archives of old events, see the ``archive_activitylog`` command.
+
+Archives are laid out as ``<directory>/<kind>/<YYYY-MM>/<kind>-<YYYY-MM>-<run>.csv.gz``,
+one file per event kind, month (UTC) and archiving run. Each file starts with a
+header naming its columns, the model fields of the events, and stores NULL as
+``\\N``. :func:`read_archive` streams them back, so reading an archive never holds
+more than one row in memory.
+
+Before CRUD events are deleted, a :class:`~activitylog.models.CRUDCheckpoint` of each
+object they touched is written, so that objects whose first events are archived can
+still be reconstructed.
+"""
+import csv
+import gzip
+import os
+from datetime import timezone
+
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Q
+from django.utils import timezone as django_timezone
+from django.utils.dateparse import parse_datetime
+
+from activitylog.backends import EVENT_MODELS
+from activitylog.managers import decode_object_ids
+from activitylog.models import CRUDCheckpoint, CRUDEvent, CRUDEventObject
+from activitylog.reconstruction import checkpoint_after
+from activitylog.utils import suppress_instance_auditing
+
+NULL = "\\N"
+SUFFIX = ".csv.gz"
+TMP_SUFFIX = ".tmp"
+
+
+def columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def month_of(value):
+    if django_timezone.is_aware(value):
+        value = value.astimezone(timezone.utc)
+    return value.strftime("%Y-%m")
+
+
+def _encode(value):
+    if value is None:
+        return NULL
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return value
+
+
+class ArchiveWriter:
+    """Write the events of one kind older than ``cutoff`` to monthly archive files.
+
+    Rows are read in ``(datetime, id)`` order ``batch_size`` at a time, so one month
+    is written at a time. A file is written under a temporary name and only renamed
+    once reading it back returned as many rows as were written to it.
+
+    Events already in a completed file of their month, e.g. written by a run with
+    ``--keep`` or interrupted while deleting, are skipped; the ids of the archived
+    events of the month being written are held in memory for that. Those files are
+    listed in ``skipped_files``.
+    """
+
+    def __init__(self, directory, kind, cutoff, batch_size=1000, using=None):
+        self.directory = directory
+        self.kind = kind
+        self.model = EVENT_MODELS[kind]
+        self.columns = columns(self.model)
+        self.datetime_index = self.columns.index("datetime")
+        self.pk_index = self.columns.index(self.model._meta.pk.attname)
+        self.cutoff = cutoff
+        self.batch_size = batch_size
+        self.using = using
+        self.run = django_timezone.now().strftime("%Y%m%dT%H%M%S%f")
+        self.skipped_files = []
+
+    def _rows(self):
+        events = self.model.objects.using(self.using).filter(datetime__lt=self.cutoff)
+        last = None
+        while True:
+            batch = events
+            if last is not None:
+                batch = batch.filter(datetime__gte=last[0]).filter(
+                    Q(datetime__gt=last[0]) | Q(pk__gt=last[1])
+                )
+            rows = list(
+                batch.order_by("datetime", "pk").values_list(*self.columns)[: self.batch_size]
+            )
+            yield from rows
+            if len(rows) < self.batch_size:
+                return
+            last = rows[-1][self.datetime_index], rows[-1][self.pk_index]
+
+    def _path(self, month):
+        name = f"{self.kind}-{month}-{self.run}{SUFFIX}"
+        return os.path.join(self.directory, self.kind, month, name)
+
+    def _archived(self, month):
+        """``{id: path}`` of the events in the completed files of ``month``."""
+        pk = self.columns[self.pk_index]
+        archived = {}
+        for path in archive_files(self.directory, self.kind, month=month):
+            for row in read_file(path):
+                archived[row[pk]] = path
+        return archived
+
+    def write(self):
+        """Write the archives, yielding ``(path, row count)`` for each completed file."""
+        month = f = writer = None
+        archived = {}
+        count = 0
+        try:
+            for row in self._rows():
+                row_month = month_of(row[self.datetime_index])
+                if row_month != month:
+                    if f is not None:
+                        f.close()
+                        f = None
+                        yield self._complete(month, count)
+                    month, count = row_month, 0
+                    archived = self._archived(month)
+                path = archived.get(str(row[self.pk_index]))
+                if path is not None:
+                    if path not in self.skipped_files:
+                        self.skipped_files.append(path)
+                    continue
+                if f is None:
+                    path = self._path(month)
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    f = gzip.open(path + TMP_SUFFIX, "wt", encoding="utf-8", newline="")
+                    writer = csv.writer(f)
+                    writer.writerow(self.columns)
+                writer.writerow([_encode(value) for value in row])
+                count += 1
+            if f is not None:
+                f.close()
+                f = None
+                yield self._complete(month, count)
+        finally:
+            if f is not None:
+                # an incomplete file is never renamed, nor its events deleted
+                f.close()
+                os.remove(self._path(month) + TMP_SUFFIX)
+
+    def _complete(self, month, count):
+        path = self._path(month)
+        read = sum(1 for _ in read_file(path + TMP_SUFFIX))
+        if read != count:
+            raise ValueError(f"{path}{TMP_SUFFIX} holds {read} rows instead of {count}.")
+        os.replace(path + TMP_SUFFIX, path)
+        return path, count
+
+
+def delete_archived(path, kind, batch_size=1000, using=None):
+    """Delete the events archived in ``path`` from their table, ``batch_size`` at a time.
+
+    For CRUD events, a checkpoint of every object they touched is written first.
+    Returns how many were deleted.
+    """
+    model = EVENT_MODELS[kind]
+    if model is CRUDEvent:
+        _write_checkpoints(path, batch_size, using)
+    pk = model._meta.pk.attname
+    deleted = 0
+    batch = []
+    for row in read_file(path):
+        batch.append(row[pk])
+        if len(batch) == batch_size:
+            deleted += _delete(model, batch, using)
+            batch = []
+    if batch:
+        deleted += _delete(model, batch, using)
+    return deleted
+
+
+def _write_checkpoints(path, batch_size, using):
+    # the state of each object right after its last archived event
+    last = {}
+    for row in read_file(path):
+        object_ids = [row["object_id"]] if row["object_id"] else decode_object_ids(
+            row.get("object_ids")
+        )
+        for object_id in object_ids:
+            last[row["content_type_id"], object_id] = row["datetime"], row["id"]
+
+    checkpoints = []
+    for (content_type_id, object_id), (datetime, event_id) in last.items():
+        content_type = ContentType.objects.get_for_id(content_type_id)
+        checkpoint = checkpoint_after(content_type, object_id, parse_datetime(datetime), event_id)
+        if checkpoint is not None:
+            checkpoints.append(checkpoint)
+        if len(checkpoints) == batch_size:
+            CRUDCheckpoint.objects.using(using).bulk_create(checkpoints)
+            checkpoints = []
+    CRUDCheckpoint.objects.using(using).bulk_create(checkpoints)
+
+
+def _delete(model, pks, using):
+    with suppress_instance_auditing(model):
+        deleted, _ = model.objects.using(using).filter(pk__in=pks).delete()
+    if model is CRUDEvent:
+        CRUDEventObject.objects.using(using).filter(event_id__in=pks).delete()
+    return deleted
+
+
+def read_file(path):
+    """Yield the rows of one archive file as dicts of strings, or None for NULL."""
+    with gzip.open(path, "rt", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+        for values in reader:
+            yield {
+                column: None if value == NULL else value for column, value in zip(header, values)
+            }
+
+
+_FIELDS = {}
+
+
+def convert(row, kind):
+    """Convert the values of an archived ``kind`` event to Python values, in place."""
+    fields = _FIELDS.get(kind)
+    if fields is None:
+        fields = _FIELDS[kind] = {
+            field.attname: field for field in EVENT_MODELS[kind]._meta.concrete_fields
+        }
+    for column, value in row.items():
+        field = fields.get(column)
+        # columns of removed fields are kept as strings
+        if field is not None and value is not None:
+            row[column] = field.to_python(value)
+    return row
+
+
+def archive_files(directory, kind, start=None, end=None, month=None):
+    """Paths of the archive files of ``kind`` for the months overlapping ``[start, end)``.
+
+    ``month`` ("YYYY-MM") selects the files of one month.
+    """
+    root = os.path.join(directory, kind)
+    if not os.path.isdir(root):
+        return []
+    first = month_of(start) if start is not None else month
+    last = month_of(end) if end is not None else month
+    paths = []
+    for month in sorted(os.listdir(root)):
+        if (first and month < first) or (last and month > last):
+            continue
+        month_dir = os.path.join(root, month)
+        paths.extend(
+            os.path.join(month_dir, name)
+            for name in sorted(os.listdir(month_dir))
+            if name.endswith(SUFFIX)
+        )
+    return paths
+
+
+def read_archive(directory, kind, start=None, end=None, where=None, **filters):
+    """Yield the archived events of ``kind`` as dicts, oldest month first.
+
+    Only the files of the months overlapping ``[start, end)`` are opened, and they are
+    decoded as they are read. ``filters`` keep the events whose field equals the value,
+    e.g. ``user_id=3``, and ``where`` the events for which ``where(event)`` is true.
+    """
+    for path in archive_files(directory, kind, start, end):
+        for row in read_file(path):
+            value = parse_datetime(row["datetime"])
+            if (start is not None and value < start) or (end is not None and value >= end):
+                continue
+            row = convert(row, kind)
+            if any(row.get(field) != expected for field, expected in filters.items()):
+                continue
+            if where is None or where(row):
+                yield row
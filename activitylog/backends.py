@@ -1,18 +1,203 @@
+import json
 import logging
-from activitylog.models import CRUDEvent, LoginEvent, RequestEvent, CorsEvent
+import threading
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from activitylog.managers import decode_object_ids
+from activitylog.models import CRUDEvent, CRUDEventObject, LoginEvent, RequestEvent, CorsEvent
 
 logger = logging.getLogger(__name__)
 
+_audit_logger = None
+
+EVENT_MODELS = {
+    "crud": CRUDEvent,
+    "login": LoginEvent,
+    "request": RequestEvent,
+    "cors": CorsEvent,
+}
+
+
+def get_audit_logger():
+    """Return the process wide instance of ``DJANGO_ACTIVITY_LOG_LOGGING_BACKEND``.
+
+    Unless ``DJANGO_ACTIVITY_LOG_METRICS`` is disabled (and no per-request cost is
+    reported), it is wrapped in a :class:`activitylog.metrics.MeteredBackend`. With
+    ``DJANGO_ACTIVITY_LOG_SPOOL_DIR`` set, events it fails to write are spooled by an
+    outer :class:`activitylog.spool.SpoolingBackend`.
+    """
+    global _audit_logger
+    if _audit_logger is None:
+        from activitylog import metrics
+        from activitylog.settings import LOGGING_BACKEND
+        from activitylog.spool import SpoolingBackend, get_spool
+
+        backend = import_string(LOGGING_BACKEND)()
+        if metrics.registry.enabled or metrics.REQUEST_COST:
+            backend = metrics.MeteredBackend(backend)
+        if get_spool() is not None:
+            backend = SpoolingBackend(backend)
+        _audit_logger = backend
+    return _audit_logger
+
+
+def build_event(data):
+    """Model instance for an event dict carrying its kind under ``"event"``."""
+    model = EVENT_MODELS.get(data.get("event"))
+    if model is None:
+        return None
+    names = {field.attname for field in model._meta.concrete_fields}
+    event = model(**{key: value for key, value in data.items() if key in names})
+    if event.datetime is None:
+        event.datetime = timezone.now()
+    return event
+
+
+def write_events(events, using):
+    """Insert already recorded events, e.g. read back from a file or a queue.
+
+    Events keep their ``datetime``, and rows whose UUID already exists are skipped,
+    so writing the same events twice is harmless.
+    """
+    by_model = {}
+    for data in events:
+        event = build_event(data)
+        if event is not None:
+            by_model.setdefault(type(event), []).append(event)
+    with transaction.atomic(using=using):
+        for model, objs in by_model.items():
+            _insert_events(model, objs, using)
+
+
+def _insert_events(model, objs, using, batch_size=500):
+    # the datetime of the events is kept, see EventDateTimeField
+    model.objects.using(using).bulk_create(objs, batch_size=batch_size, ignore_conflicts=True)
+    if model is CRUDEvent:
+        link_objects(objs, using)
+
+
+def link_objects(events, using=None, batch_size=500):
+    """Write the :class:`~activitylog.models.CRUDEventObject` rows of summary bulk events.
+
+    Rows already written are skipped, like the events themselves.
+    """
+    links = [
+        CRUDEventObject(event_id=event.pk, content_type_id=event.content_type_id, object_id=pk)
+        for event in events
+        for pk in decode_object_ids(event.object_ids)
+    ]
+    if links:
+        CRUDEventObject.objects.using(using).bulk_create(
+            links, batch_size=batch_size, ignore_conflicts=True
+        )
+
 
 class ModelBackend:
     def request(self, request_info):
         return RequestEvent.objects.create(**request_info)
 
+    def bulk_request(self, request_infos):
+        return RequestEvent.objects.bulk_create(
+            [RequestEvent(**request_info) for request_info in request_infos], batch_size=500
+        )
+
     def cors(self, cors_info):
         return CorsEvent.objects.create(**cors_info)
 
+    def bulk_cors(self, cors_infos):
+        return CorsEvent.objects.bulk_create(
+            [CorsEvent(**cors_info) for cors_info in cors_infos], batch_size=500
+        )
+
     def crud(self, crud_info):
+        if crud_info.get("object_ids"):
+            return self.bulk_crud([crud_info])[0]
         return CRUDEvent.objects.create(**crud_info)
 
+    def bulk_crud(self, crud_infos):
+        events = [CRUDEvent(**crud_info) for crud_info in crud_infos]
+        if not any(event.object_ids for event in events):
+            return CRUDEvent.objects.bulk_create(events, batch_size=500)
+        # summary bulk events and their objects are written together
+        with transaction.atomic(using=router.db_for_write(CRUDEvent)):
+            CRUDEvent.objects.bulk_create(events, batch_size=500)
+            link_objects(events)
+        return events
+
     def login(self, login_info):
         return LoginEvent.objects.create(**login_info)
+
+    def bulk_login(self, login_infos):
+        return LoginEvent.objects.bulk_create(
+            [LoginEvent(**login_info) for login_info in login_infos], batch_size=500
+        )
+
+
+class JSONLinesBackend:
+    """Append every event as one JSON object per line to ``path``."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _write(self, event, infos):
+        lines = "".join(
+            json.dumps({"event": event, **info}, cls=DjangoJSONEncoder) + "\n" for info in infos
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(lines)
+
+    def request(self, request_info):
+        self._write("request", [request_info])
+
+    def bulk_request(self, request_infos):
+        self._write("request", request_infos)
+
+    def cors(self, cors_info):
+        self._write("cors", [cors_info])
+
+    def bulk_cors(self, cors_infos):
+        self._write("cors", cors_infos)
+
+    def crud(self, crud_info):
+        self._write("crud", [crud_info])
+
+    def bulk_crud(self, crud_infos):
+        self._write("crud", crud_infos)
+
+    def login(self, login_info):
+        self._write("login", [login_info])
+
+    def bulk_login(self, login_infos):
+        self._write("login", login_infos)
+
+
+class LoggingBackend:
+    """Emit every event as a JSON log record, e.g. for a log shipper."""
+
+    def __init__(self, logger_name="activitylog.events", level=logging.INFO):
+        self.logger = logging.getLogger(logger_name)
+        self.level = level
+
+    def _log(self, event, info):
+        self.logger.log(
+            self.level,
+            json.dumps({"event": event, **info}, cls=DjangoJSONEncoder),
+            extra={"activitylog_event": event},
+        )
+
+    def request(self, request_info):
+        self._log("request", request_info)
+
+    def cors(self, cors_info):
+        self._log("cors", cors_info)
+
+    def crud(self, crud_info):
+        self._log("crud", crud_info)
+
+    def login(self, login_info):
+        self._log("login", login_info)
@@ -0,0 +1,193 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from django.utils.module_loading import import_string
+
+from activitylog import metrics
+from activitylog import settings as activitylog_settings
+from activitylog.spool import get_spool
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+HALF_OPEN = "half_open"
+OPEN = "open"
+
+# Values of the activitylog_breaker_state gauge.
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreakerBackend:
+    """Shed low-priority events while the wrapped backend is slow or failing.
+
+    The outcome of the last ``window`` writes is kept. The breaker opens when, over at
+    least ``min_calls`` of them, the share of writes taking ``slow_call_seconds`` or more
+    reaches ``slow_call_rate``, or the share of failed writes reaches ``error_rate``.
+    While it is open, events of the ``shed_events`` kinds are sampled (``shed_mode``
+    "sample", ``sample_rate`` of them are still written), dropped ("drop") or written
+    to the local spool ("spool", see :mod:`activitylog.spool`); other events, by
+    default CRUD and login events, are always written.
+
+    After ``cooldown`` seconds the breaker half-opens and lets every event through
+    again; the next ``min_calls`` writes close it, or open it for another cooldown.
+    Failed writes are still raised to the caller.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        options=None,
+        name=None,
+        slow_call_seconds=None,
+        slow_call_rate=None,
+        error_rate=None,
+        window=None,
+        min_calls=None,
+        cooldown=None,
+        shed_events=None,
+        shed_mode=None,
+        sample_rate=None,
+    ):
+        backend = backend or activitylog_settings.BREAKER_BACKEND
+        if isinstance(backend, str):
+            if options is None:
+                options = activitylog_settings.BREAKER_BACKEND_OPTIONS
+            backend = import_string(backend)(**options)
+        self.backend = backend
+        self.name = name or type(backend).__name__
+
+        def option(value, default):
+            return default if value is None else value
+
+        self.slow_call_seconds = option(
+            slow_call_seconds, activitylog_settings.BREAKER_SLOW_CALL_SECONDS
+        )
+        self.slow_call_rate = option(slow_call_rate, activitylog_settings.BREAKER_SLOW_CALL_RATE)
+        self.error_rate = option(error_rate, activitylog_settings.BREAKER_ERROR_RATE)
+        self.min_calls = max(1, option(min_calls, activitylog_settings.BREAKER_MIN_CALLS))
+        window = max(self.min_calls, option(window, activitylog_settings.BREAKER_WINDOW))
+        self.cooldown = option(cooldown, activitylog_settings.BREAKER_COOLDOWN)
+        self.shed_events = frozenset(option(shed_events, activitylog_settings.BREAKER_SHED_EVENTS))
+        self.shed_mode = option(shed_mode, activitylog_settings.BREAKER_SHED_MODE)
+        if self.shed_mode not in ("sample", "drop", "spool"):
+            raise ValueError(f"Unknown circuit breaker shed mode {self.shed_mode!r}.")
+        self.spool = get_spool() if self.shed_mode == "spool" else None
+        if self.shed_mode == "spool" and self.spool is None:
+            raise ValueError(
+                "The spool shed mode needs a spool directory (DJANGO_ACTIVITY_LOG_SPOOL_DIR)."
+            )
+        self.sample_rate = option(sample_rate, activitylog_settings.BREAKER_SAMPLE_RATE)
+
+        # (slow, failed) of the last writes, with running totals
+        self._calls = deque(maxlen=window)
+        self._slow = 0
+        self._failed = 0
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        self.opened_at = None
+        metrics.breaker_state.set(STATE_VALUES[CLOSED], self.name)
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _transition(self, state):
+        # Called with the lock held.
+        self.state = state
+        self.opened_at = time.monotonic() if state == OPEN else None
+        self._calls.clear()
+        self._slow = self._failed = 0
+        metrics.breaker_state.set(STATE_VALUES[state], self.name)
+        metrics.breaker_transitions.inc(self.name, state)
+        log = logger.info if state == CLOSED else logger.warning
+        log("Circuit breaker %s is now %s.", self.name, state)
+
+    def _current_state(self):
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            with self._lock:
+                if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                    self._transition(HALF_OPEN)
+        return self.state
+
+    def _record(self, duration, failed):
+        slow = duration >= self.slow_call_seconds
+        with self._lock:
+            if self.state == OPEN:
+                # only the cooldown ends the open state, see _current_state()
+                return
+            if len(self._calls) == self._calls.maxlen:
+                old_slow, old_failed = self._calls[0]
+                self._slow -= old_slow
+                self._failed -= old_failed
+            self._calls.append((slow, failed))
+            self._slow += slow
+            self._failed += failed
+
+            calls = len(self._calls)
+            if calls < self.min_calls:
+                return
+            unhealthy = (
+                self._slow >= self.slow_call_rate * calls
+                or self._failed >= self.error_rate * calls
+            )
+            if unhealthy:
+                self._transition(OPEN)
+            elif self.state == HALF_OPEN:
+                self._transition(CLOSED)
+
+    def _shed(self, kind, infos):
+        """The events of ``infos`` to write anyway while the breaker is open."""
+        kept = []
+        if self.shed_mode == "sample":
+            kept = [info for info in infos if random.random() < self.sample_rate]
+        elif self.shed_mode == "spool":
+            self.spool.append(kind, infos, "shed")
+        if len(kept) < len(infos):
+            metrics.shed_events.inc(self.name, kind, amount=len(infos) - len(kept))
+        return kept
+
+    def _write(self, kind, infos, bulk=False):
+        if kind in self.shed_events and self._current_state() == OPEN:
+            infos = self._shed(kind, infos)
+            if not infos:
+                return None
+
+        start = time.perf_counter()
+        try:
+            if not bulk:
+                result = getattr(self.backend, kind)(infos[0])
+            elif hasattr(self.backend, f"bulk_{kind}"):
+                result = getattr(self.backend, f"bulk_{kind}")(infos)
+            else:
+                result = [getattr(self.backend, kind)(info) for info in infos]
+        except Exception:
+            self._record(time.perf_counter() - start, True)
+            raise
+        self._record(time.perf_counter() - start, False)
+        return result
+
+    def request(self, request_info):
+        return self._write("request", [request_info])
+
+    def bulk_request(self, request_infos):
+        return self._write("request", request_infos, bulk=True)
+
+    def cors(self, cors_info):
+        return self._write("cors", [cors_info])
+
+    def bulk_cors(self, cors_infos):
+        return self._write("cors", cors_infos, bulk=True)
+
+    def crud(self, crud_info):
+        return self._write("crud", [crud_info])
+
+    def bulk_crud(self, crud_infos):
+        return self._write("crud", crud_infos, bulk=True)
+
+    def login(self, login_info):
+        return self._write("login", [login_info])
+
+    def bulk_login(self, login_infos):
+        return self._write("login", login_infos, bulk=True)
@@ -1,15 +1,60 @@
+import json
 from urllib.parse import urlencode
 
 from django.contrib import admin
 from django.contrib.admin.templatetags.admin_urls import add_preserved_filters
+from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
 from django.db.models import Model
-from django.http import HttpRequest, HttpResponseRedirect
+from django.http import Http404, HttpRequest
 from django.shortcuts import redirect
+from django.template.response import TemplateResponse
 from django.urls import path, reverse
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
+from .keyset import AFTER_VAR, BEFORE_VAR, InvalidCursor, keyset_page
+from .reconstruction import object_events
+from .settings import ADMIN_DATABASE_ALIAS, CRUD_HISTORY_COUNT_CACHE_TIMEOUT
+
+# Columns needed to render the timeline; the (possibly large) JSON snapshot is not loaded.
+CRUD_HISTORY_FIELDS = (
+    "id",
+    "event_type",
+    "datetime",
+    "changed_fields",
+    "user_id",
+    "user_pk_as_string",
+    "remote_ip",
+)
+
+
+def parse_changed_fields(event):
+    """Turn the stored ``changed_fields`` JSON of an event into change rows.
+
+    Each row has the ``field`` and its ``new`` value; the ``old`` value is only there
+    for updates, and may be falsy (``0``, ``False``, ``""``) or None.
+    """
+    try:
+        data = json.loads(event.changed_fields or "null")
+    except ValueError:
+        return []
+    if not isinstance(data, dict):
+        return []
+
+    rows = []
+    for field, values in data.items():
+        if event.is_update() and isinstance(values, list) and len(values) == 2:
+            rows.append({"field": field, "old": values[0], "new": values[1]})
+        elif isinstance(values, list):
+            # many-to-many events store the list of related pks
+            rows.append({"field": field, "new": ", ".join(str(value) for value in values)})
+        else:
+            rows.append({"field": field, "new": values})
+    return rows
+
 
 class BaseProcessActionsAdminMixin:
     def get_action_methods(self):
@@ -43,6 +88,9 @@ class BaseProcessActionsAdminMixin:
 class CRUDHistoryAdminMixin(BaseProcessActionsAdminMixin, admin.ModelAdmin):
     CRUD_HISTORY = "crud_history"
     crud_history_translated_title = _("CRUD history")
+    crud_history_template = "admin/activity/crud_history.html"
+    crud_history_per_page = 50
+    crud_history_count_cache_timeout = CRUD_HISTORY_COUNT_CACHE_TIMEOUT
 
     def get_urls(self) -> list:
         urls = super().get_urls()
@@ -64,17 +112,65 @@ class CRUDHistoryAdminMixin(BaseProcessActionsAdminMixin, admin.ModelAdmin):
     def crud_history_view(self, request: HttpRequest, object_id: int):
         return self.process_action(request, object_id, self.CRUD_HISTORY)
 
-    def crud_history_action(self, request: HttpRequest, obj: Model) -> HttpResponseRedirect:
-        base_history_url = reverse(
-            "admin:activitylog_crudevent_changelist",
-        )
-        app_label, model_name = self._get_path_info()
-        content_type = ContentType.objects.get_by_natural_key(app_label, model_name)
-        params = {"content_type__id": content_type.id, "object_id": obj.id}
-        params = urlencode(params)
-        history_url = f"{base_history_url}?{params}"
+    def get_crud_history_queryset(self, obj: Model):
+        """Events of ``obj``, bulk ones included; served by the (content_type, object_id,
+        datetime, id) index.
+        """
+        queryset = object_events(self.model, obj.pk)
+        if ADMIN_DATABASE_ALIAS:
+            queryset = queryset.using(ADMIN_DATABASE_ALIAS)
+        return queryset
+
+    def crud_history_action(self, request: HttpRequest, obj: Model) -> TemplateResponse:
+        if obj is None:
+            raise Http404
+        if not self.has_view_or_change_permission(request, obj):
+            raise PermissionDenied
+
+        queryset = self.get_crud_history_queryset(obj).only(*CRUD_HISTORY_FIELDS)
+        try:
+            page = keyset_page(
+                queryset,
+                self.crud_history_per_page,
+                after=request.GET.get(AFTER_VAR),
+                before=request.GET.get(BEFORE_VAR),
+            )
+        except InvalidCursor:
+            return redirect(request.path)
+
+        user_ids = {event.user_id for event in page.object_list}
+        users_by_id = {
+            user.pk: user for user in get_user_model().objects.filter(pk__in=user_ids)
+        }
+        entries = [
+            {
+                "event": event,
+                "user": users_by_id.get(event.user_id),
+                "changes": parse_changed_fields(event),
+            }
+            for event in page.object_list
+        ]
 
-        return redirect(history_url)
+        opts = self.model._meta
+        content_type = ContentType.objects.get_for_model(self.model)
+        changelist_params = urlencode({"content_type__id": content_type.pk, "object_id": obj.pk})
+        context = {
+            **self.admin_site.each_context(request),
+            "title": f"{self.crud_history_translated_title}: {obj}",
+            "opts": opts,
+            "module_name": str(opts.verbose_name_plural),
+            "object": obj,
+            "entries": entries,
+            "next_url": f"?{urlencode({AFTER_VAR: page.next_cursor})}" if page.has_next else None,
+            "previous_url": (
+                f"?{urlencode({BEFORE_VAR: page.previous_cursor})}" if page.has_previous else None
+            ),
+            "first_url": request.path if page.has_previous else None,
+            "events_changelist_url": (
+                f"{reverse('admin:activitylog_crudevent_changelist')}?{changelist_params}"
+            ),
+        }
+        return TemplateResponse(request, self.crud_history_template, context)
 
     crud_history_action.short_description = crud_history_translated_title
 
@@ -82,12 +178,24 @@ class CRUDHistoryAdminMixin(BaseProcessActionsAdminMixin, admin.ModelAdmin):
         info = self._get_path_info()
         return reverse(f"admin:%s_%s_{self.CRUD_HISTORY}" % info, args=[obj.pk])
 
+    def get_crud_history_count(self, obj: Model) -> int:
+        """Number of CRUD events of ``obj``, cached for ``crud_history_count_cache_timeout``."""
+        content_type = ContentType.objects.get_for_model(self.model)
+        cache_key = f"activitylog:crud_history_count:{content_type.pk}:{obj.pk}"
+        count = cache.get(cache_key)
+        if count is None:
+            count = self.get_crud_history_queryset(obj).count()
+            cache.set(cache_key, count, self.crud_history_count_cache_timeout)
+        return count
+
     def crud_history_link(self, obj: Model) -> str:
         crud_history_url = self.get_crud_history_url(obj=obj)
-        crud_history_a = (
-            f"<a href={crud_history_url}>> {self.crud_history_translated_title}</a>"
+        return format_html(
+            '<a href="{}">&gt; {} ({})</a>',
+            crud_history_url,
+            self.crud_history_translated_title,
+            self.get_crud_history_count(obj),
         )
-        return format_html(crud_history_a)
 
     crud_history_link.allow_tags = True
     crud_history_link.short_description = crud_history_translated_title
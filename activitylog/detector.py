@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import re
+from functools import lru_cache
+
+from activitylog import metrics
+from activitylog.models import FlaggedRequest
+from activitylog.settings import (
+    DATABASE_ALIAS,
+    DETECTOR_MAX_QUERIES,
+    DETECTOR_REPEATED_QUERIES,
+    DETECTOR_SLOW_MS,
+    DETECTOR_TOP_QUERIES,
+)
+from activitylog.utils import isolated, should_propagate_exceptions
+
+logger = logging.getLogger(__name__)
+
+# Longest normalized SQL stored per query shape.
+MAX_SQL_LENGTH = 1000
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER = re.compile(r"%s|\?")
+_VALUE_LIST = re.compile(r"\(\?(?:\s*,\s*\?)*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=4096)
+def normalize_sql(sql):
+    """``sql`` with literals and parameters replaced by ``?``, and lists of them by ``(...)``.
+
+    Queries differing only in their parameters, or in the length of an ``IN`` list,
+    have the same normalized form.
+    """
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _VALUE_LIST.sub("(...)", sql)
+    return _WHITESPACE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:12]
+
+
+def query_shapes(statements):
+    """``[fingerprint, count, normalized SQL]`` of ``statements``, most run first.
+
+    ``statements`` maps the SQL of the queries run to the number of times each ran.
+    """
+    counts = {}
+    for sql, count in statements.items():
+        normalized = normalize_sql(sql)
+        counts[normalized] = counts.get(normalized, 0) + count
+    return [
+        [fingerprint(normalized), count, normalized[:MAX_SQL_LENGTH]]
+        for normalized, count in sorted(counts.items(), key=lambda item: -item[1])
+    ]
+
+
+def inspect(context, response, duration_ms, queries, request_event_id=None):
+    """Store a :class:`FlaggedRequest` if the request crossed a detector threshold.
+
+    ``queries`` is the ``QueryCounter`` of the request. Returns the flagged request, or
+    None when it was not flagged or could not be stored. Flagged requests are written to
+    ``DJANGO_ACTIVITY_LOG_DATABASE_ALIAS`` like the events, and a failed write is logged
+    rather than raised.
+    """
+    reasons = []
+    if duration_ms >= DETECTOR_SLOW_MS:
+        reasons.append(FlaggedRequest.SLOW)
+    if queries.count >= DETECTOR_MAX_QUERIES:
+        reasons.append(FlaggedRequest.QUERIES)
+    # No shape can be repeated often enough when there were not that many queries.
+    shapes = []
+    if queries.count >= DETECTOR_REPEATED_QUERIES:
+        shapes = query_shapes(queries.statements)
+        if shapes[0][1] >= DETECTOR_REPEATED_QUERIES:
+            reasons.append(FlaggedRequest.REPEATED)
+    if not reasons:
+        return None
+
+    if not shapes:
+        shapes = query_shapes(queries.statements)
+    top = shapes[:DETECTOR_TOP_QUERIES]
+    try:
+        with isolated(DATABASE_ALIAS):
+            flagged = FlaggedRequest.objects.using(DATABASE_ALIAS).create(
+                url=context.path[:254],
+                method=context.method,
+                status_code=response.status_code,
+                duration_ms=round(duration_ms, 3),
+                db_query_count=queries.count,
+                reasons=",".join(reasons),
+                fingerprints=" ".join(shape[0] for shape in top)[:255],
+                query_shapes=json.dumps(top),
+                request_event_id=request_event_id,
+            )
+    except Exception:
+        metrics.failures.inc("detector")
+        logger.exception("activity log could not store the flagged request %s", context.path)
+        if should_propagate_exceptions():
+            raise
+        return None
+    for reason in reasons:
+        metrics.flagged_requests.inc(reason)
+    return flagged
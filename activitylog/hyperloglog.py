@@ -0,0 +1,156 @@
+"""HyperLogLog sketches, estimating the number of distinct values added to them.
+
+A sketch first keeps the 64 bit hashes of its values, and counts them exactly (short
+of hash collisions, which are negligible below millions of values). Past
+``2 ** precision / 8`` values the hashes are turned into registers: with the default
+precision of 12 that happens after 512 values, from which the standard error is
+about 1.6%, and a sketch never takes more than 4096 bytes however many values it saw.
+Sketches of the same values can be merged, e.g. the sketches of 7 days to count the
+distinct users of the week.
+"""
+import hashlib
+import math
+import struct
+import zlib
+
+# Serialized forms: (index, rank) pairs of the registers set, written by earlier
+# versions and still read; every register; the hashes of the values.
+SPARSE = 0
+DENSE = 1
+EXACT = 2
+
+_INVERSE_POWERS = [2.0 ** -rank for rank in range(66)]
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), "big")
+
+
+class HyperLogLog:
+    """Sketch of ``2 ** precision`` registers.
+
+    ``hashes`` holds the hashes of the values while there are at most ``size // 8``
+    of them, as many bytes as the registers; ``registers`` is None until then.
+    """
+
+    __slots__ = ("precision", "hashes", "registers")
+
+    def __init__(self, precision=12):
+        if not 4 <= precision <= 16:
+            raise ValueError(f"HyperLogLog precision must be between 4 and 16, not {precision}.")
+        self.precision = precision
+        self.hashes = set()
+        self.registers = None
+
+    @property
+    def size(self):
+        return 1 << self.precision
+
+    @property
+    def exact(self):
+        return self.registers is None
+
+    def _densify(self):
+        hashes, self.hashes = self.hashes, None
+        self.registers = bytearray(self.size)
+        for x in hashes:
+            self._add_hash(x)
+
+    def _add_hash(self, x):
+        if self.registers is None:
+            self.hashes.add(x)
+            if len(self.hashes) > self.size // 8:
+                self._densify()
+            return
+        bits = 64 - self.precision
+        index = x >> bits
+        rank = bits - (x & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, value):
+        self._add_hash(_hash(value))
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+        return self
+
+    def fold(self, precision):
+        """Return this sketch at the lower ``precision``, to merge it with such sketches."""
+        if precision == self.precision:
+            return self
+        if precision > self.precision:
+            raise ValueError("A HyperLogLog sketch cannot be folded to a higher precision.")
+        folded = HyperLogLog(precision)
+        if self.registers is None:
+            # hashes do not depend on the precision
+            for x in self.hashes:
+                folded._add_hash(x)
+            return folded
+        folded.hashes, folded.registers = None, bytearray(folded.size)
+        shift = self.precision - precision
+        for index, rank in enumerate(self.registers):
+            if not rank:
+                continue
+            low = index & ((1 << shift) - 1)
+            # the dropped index bits now start the bits the rank is counted in
+            rank = shift - low.bit_length() + 1 if low else shift + rank
+            if rank > folded.registers[index >> shift]:
+                folded.registers[index >> shift] = rank
+        return folded
+
+    def merge(self, other):
+        """Add the values seen by ``other`` to this sketch, folding it if needed."""
+        if other.precision < self.precision:
+            folded = self.fold(other.precision)
+            self.precision, self.hashes, self.registers = (
+                folded.precision, folded.hashes, folded.registers
+            )
+        other = other.fold(self.precision)
+        if other.registers is None:
+            for x in other.hashes:
+                self._add_hash(x)
+        else:
+            if self.registers is None:
+                self._densify()
+            self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def estimate(self):
+        if self.registers is None:
+            return len(self.hashes)
+        size = self.size
+        zeros = self.registers.count(0)
+        total = sum(_INVERSE_POWERS[rank] for rank in self.registers)
+        estimate = 0.7213 / (1 + 1.079 / size) * size * size / total
+        if estimate <= 2.5 * size and zeros:
+            # linear counting is more accurate for small cardinalities
+            estimate = size * math.log(size / zeros)
+        return round(estimate)
+
+    def __len__(self):
+        return self.estimate()
+
+    def to_bytes(self):
+        if self.registers is None:
+            hashes = sorted(self.hashes)
+            return bytes((EXACT, self.precision)) + struct.pack(f">{len(hashes)}Q", *hashes)
+        return bytes((DENSE, self.precision)) + zlib.compress(bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        encoding, precision = data[0], data[1]
+        sketch = cls(precision)
+        if encoding == EXACT:
+            sketch.hashes = {x for (x,) in struct.iter_unpack(">Q", data[2:])}
+        elif encoding == DENSE:
+            sketch.hashes, sketch.registers = None, bytearray(zlib.decompress(data[2:]))
+        elif encoding == SPARSE:
+            sketch.hashes, sketch.registers = None, bytearray(sketch.size)
+            for index, rank in struct.iter_unpack(">HB", data[2:]):
+                sketch.registers[index] = rank
+        else:
+            raise ValueError(f"Unknown HyperLogLog encoding {encoding}.")
+        return sketch
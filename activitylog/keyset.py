@@ -0,0 +1,99 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+# Query string parameters carrying the seek cursors.
+AFTER_VAR = "after"
+BEFORE_VAR = "before"
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(obj):
+    """Encode the ``(datetime, pk)`` position of an event as an opaque cursor."""
+    value = f"{obj.datetime.isoformat()}|{obj.pk}"
+    return urlsafe_base64_encode(value.encode())
+
+
+def decode_cursor(model, cursor):
+    """Decode a cursor produced by :func:`encode_cursor` for ``model``.
+
+    :raises InvalidCursor: if the cursor was tampered with or is malformed.
+    """
+    try:
+        raw_datetime, raw_pk = urlsafe_base64_decode(cursor).decode().split("|", 1)
+        value = parse_datetime(raw_datetime)
+        pk = model._meta.pk.to_python(raw_pk)
+    except (ValueError, TypeError, ValidationError) as e:
+        raise InvalidCursor(cursor) from e
+    if value is None:
+        raise InvalidCursor(cursor)
+    return value, pk
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def _newer(queryset, value, pk):
+    return queryset.filter(Q(datetime__gte=value) & (Q(datetime__gt=value) | Q(pk__gt=pk)))
+
+
+def _older(queryset, value, pk, inclusive=False):
+    same = Q(pk__lte=pk) if inclusive else Q(pk__lt=pk)
+    return queryset.filter(Q(datetime__lte=value) & (Q(datetime__lt=value) | same))
+
+
+def keyset_page(queryset, per_page, after=None, before=None):
+    """Return one page of ``queryset`` ordered newest first by ``(datetime, pk)``.
+
+    Instead of ``OFFSET`` the page is located by seeking past the cursor, so with an
+    index on ``(datetime, id)`` every page costs the same as the first one. The
+    redundant ``datetime`` bound lets the database turn the seek into an index range.
+    ``after`` walks towards older events, ``before`` towards newer ones. Whether there
+    is a page beyond either side is probed with an extra row, never assumed.
+    """
+    model = queryset.model
+    if before:
+        value, pk = decode_cursor(model, before)
+        newer = list(_newer(queryset, value, pk).order_by("datetime", "pk")[: per_page + 1])
+        has_previous = len(newer) > per_page
+        rows = newer[:per_page][::-1]
+        # back at the newest end: fill the page up with the rows from the cursor on
+        missing = per_page - len(rows)
+        older = list(
+            _older(queryset, value, pk, inclusive=True).order_by("-datetime", "-pk")[: missing + 1]
+        )
+        has_next = len(older) > missing
+        rows += older[:missing]
+    else:
+        older = queryset
+        if after:
+            value, pk = decode_cursor(model, after)
+            older = _older(queryset, value, pk)
+        rows = list(older.order_by("-datetime", "-pk")[: per_page + 1])
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
+        has_previous = (
+            bool(after) and bool(rows) and _newer(queryset, rows[0].datetime, rows[0].pk).exists()
+        )
+
+    return KeysetPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1]) if has_next else None,
+        previous_cursor=encode_cursor(rows[0]) if has_previous else None,
+    )
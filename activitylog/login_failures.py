@@ -0,0 +1,232 @@
+"""Failed logins per remote IP and per username over a sliding window.
+
+With ``DJANGO_ACTIVITY_LOG_LOGIN_FAILURE_TRACKER`` the ``user_login_failed`` receiver
+counts every failure here, so a login view or an authentication backend can refuse
+an attempt without querying the LoginEvent table::
+
+    if login_failures.is_locked_out(ip=ip, username=username):
+        raise PermissionDenied
+
+Failures are counted per IP only when :func:`client_ip` finds one the client cannot
+forge: ``REMOTE_ADDR``, or behind ``DJANGO_ACTIVITY_LOG_LOGIN_FAILURE_TRUSTED_PROXIES``
+proxies the address the first of them saw.
+"""
+import abc
+import functools
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.utils.module_loading import import_string
+
+from activitylog import metrics
+from activitylog import settings as activitylog_settings
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+class WindowCounter(abc.ABC):
+    """Counts per key over the last ``window`` seconds, split in ``buckets`` sub-windows.
+
+    A count is forgotten once its whole sub-window is out of the window, so counts
+    cover between ``window - window / buckets`` and ``window`` seconds.
+    """
+
+    def __init__(self, window, buckets):
+        self.window = window
+        self.buckets = buckets
+        self.bucket_seconds = window / buckets
+
+    def _bucket(self, now=None):
+        return int((time.time() if now is None else now) // self.bucket_seconds)
+
+    @abc.abstractmethod
+    def add(self, key, now=None):
+        """Count one more ``key``, returning its count over the window."""
+
+    @abc.abstractmethod
+    def count(self, key, now=None):
+        """The count of ``key`` over the window."""
+
+    @abc.abstractmethod
+    def clear(self, key):
+        """Forget the counts of ``key``."""
+
+
+class LocalWindowCounter(WindowCounter):
+    """Counts kept in this process. The keys counted least recently are forgotten
+    beyond ``max_keys``.
+    """
+
+    def __init__(self, window, buckets, max_keys):
+        super().__init__(window, buckets)
+        self.max_keys = max_keys
+        # key -> {bucket: count}, least recently counted first
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _total(self, counts, bucket):
+        oldest = bucket - self.buckets + 1
+        for old in [old for old in counts if old < oldest]:
+            del counts[old]
+        return sum(counts.values())
+
+    def add(self, key, now=None):
+        bucket = self._bucket(now)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = {}
+                if len(self._counts) > self.max_keys:
+                    self._counts.popitem(last=False)
+            else:
+                self._counts.move_to_end(key)
+            counts[bucket] = counts.get(bucket, 0) + 1
+            return self._total(counts, bucket)
+
+    def count(self, key, now=None):
+        bucket = self._bucket(now)
+        with self._lock:
+            counts = self._counts.get(key)
+            return self._total(counts, bucket) if counts else 0
+
+    def clear(self, key):
+        with self._lock:
+            self._counts.pop(key, None)
+
+
+class CacheWindowCounter(WindowCounter):
+    """Counts kept in the Django cache ``cache``, one cache key per key and sub-window,
+    so that every process sees the failures of the others.
+    """
+
+    def __init__(self, window, buckets, cache):
+        super().__init__(window, buckets)
+        self.cache = caches[cache]
+        # a sub-window expires once it is out of the window
+        self.timeout = math.ceil(window + self.bucket_seconds)
+
+    def _keys(self, key, bucket):
+        # cache keys must be short and free of spaces, e.g. for memcached
+        digest = hashlib.sha1(key.encode()).hexdigest()
+        return [
+            f"activitylog:login_failures:{digest}:{old}"
+            for old in range(bucket - self.buckets + 1, bucket + 1)
+        ]
+
+    def add(self, key, now=None):
+        keys = self._keys(key, self._bucket(now))
+        self.cache.add(keys[-1], 0, timeout=self.timeout)
+        try:
+            count = self.cache.incr(keys[-1])
+        except ValueError:
+            # expired or evicted since add()
+            self.cache.set(keys[-1], 1, timeout=self.timeout)
+            count = 1
+        return count + sum(self.cache.get_many(keys[:-1]).values())
+
+    def count(self, key, now=None):
+        return sum(self.cache.get_many(self._keys(key, self._bucket(now))).values())
+
+    def clear(self, key):
+        self.cache.delete_many(self._keys(key, self._bucket()))
+
+
+def get_counter():
+    """Return the process wide counter of failed logins."""
+    global _counter
+    if _counter is None:
+        with _counter_lock:
+            if _counter is None:
+                window = activitylog_settings.LOGIN_FAILURE_WINDOW
+                buckets = activitylog_settings.LOGIN_FAILURE_BUCKETS
+                if activitylog_settings.LOGIN_FAILURE_CACHE:
+                    _counter = CacheWindowCounter(
+                        window, buckets, activitylog_settings.LOGIN_FAILURE_CACHE
+                    )
+                else:
+                    _counter = LocalWindowCounter(
+                        window, buckets, activitylog_settings.LOGIN_FAILURE_MAX_KEYS
+                    )
+    return _counter
+
+
+@functools.lru_cache(maxsize=None)
+def _lockout_handler():
+    handler = activitylog_settings.LOGIN_FAILURE_LOCKOUT_HANDLER
+    return import_string(handler) if isinstance(handler, str) else handler
+
+
+def client_ip(request, trusted_proxies=None):
+    """The IP of the client of ``request`` as seen by the first trusted proxy, or None.
+
+    Without ``trusted_proxies`` (``DJANGO_ACTIVITY_LOG_LOGIN_FAILURE_TRUSTED_PROXIES`` by
+    default) that is ``REMOTE_ADDR``; otherwise it is the address that many entries from
+    the right of ``X-Forwarded-For``, as the entries left of it are sent by the client.
+    """
+    if request is None:
+        return None
+    if trusted_proxies is None:
+        trusted_proxies = activitylog_settings.LOGIN_FAILURE_TRUSTED_PROXIES
+    if not trusted_proxies:
+        return request.META.get("REMOTE_ADDR") or None
+    forwarded = [
+        address.strip()
+        for address in request.META.get("HTTP_X_FORWARDED_FOR", "").split(",")
+        if address.strip()
+    ]
+    # fewer entries than proxies: the request did not come through all of them
+    return forwarded[-trusted_proxies] if len(forwarded) >= trusted_proxies else None
+
+
+def _keys(ip, username):
+    keys = {}
+    if ip:
+        keys["ip"] = f"ip:{ip}"
+    if username:
+        keys["username"] = f"username:{username}"
+    return keys
+
+
+def record_failure(request=None, ip=None, username=None):
+    """Count a failed login, returning the failures of ``ip`` and ``username`` by "ip"
+    and "username".
+
+    Once either count reaches ``DJANGO_ACTIVITY_LOG_LOGIN_FAILURE_LOCKOUT_THRESHOLD``, the
+    lockout handler is called as ``handler(request, ip=ip, username=username,
+    failures=failures)``, e.g. to alert or to deactivate the account.
+    """
+    counter = get_counter()
+    failures = {by: counter.add(key) for by, key in _keys(ip, username).items()}
+
+    threshold = activitylog_settings.LOGIN_FAILURE_LOCKOUT_THRESHOLD
+    if threshold is not None:
+        locked_out = [by for by, count in failures.items() if count >= threshold]
+        for by in locked_out:
+            metrics.login_lockouts.inc(by)
+        handler = _lockout_handler()
+        if locked_out and handler is not None:
+            handler(request, ip=ip, username=username, failures=failures)
+    return failures
+
+
+def recent_failures(ip=None, username=None):
+    """Failed logins from ``ip`` or for ``username`` over the window; with both, the larger."""
+    counter = get_counter()
+    return max((counter.count(key) for key in _keys(ip, username).values()), default=0)
+
+
+def is_locked_out(ip=None, username=None):
+    """Whether ``ip`` or ``username`` reached the lockout threshold, if one is set."""
+    threshold = activitylog_settings.LOGIN_FAILURE_LOCKOUT_THRESHOLD
+    return threshold is not None and recent_failures(ip, username) >= threshold
+
+
+def reset_failures(ip=None, username=None):
+    counter = get_counter()
+    for key in _keys(ip, username).values():
+        counter.clear(key)
@@ -0,0 +1,52 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from activitylog.metrics import registry, render_prometheus
+
+
+class Command(BaseCommand):
+    help = (
+        "Show the activity log metrics of all processes writing to "
+        "DJANGO_ACTIVITY_LOG_METRICS_DIR."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--format", choices=("text", "json", "prometheus"), default="text"
+        )
+        parser.add_argument(
+            "--reset",
+            action="store_true",
+            help="Remove the metric files, e.g. before the server starts.",
+        )
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            registry.reset()
+            self.stdout.write("Metrics reset.")
+            return
+        if not registry.directory:
+            self.stderr.write(
+                "DJANGO_ACTIVITY_LOG_METRICS_DIR is not set: only the metrics of this command "
+                "can be shown."
+            )
+
+        snapshot = registry.collect()
+        if options["format"] == "json":
+            self.stdout.write(json.dumps(snapshot, indent=2))
+        elif options["format"] == "prometheus":
+            self.stdout.write(render_prometheus(snapshot), ending="")
+        else:
+            self.write_text(snapshot)
+
+    def write_text(self, snapshot):
+        for name, data in sorted(snapshot.items()):
+            for labels, value in sorted(data["samples"]):
+                label = ",".join(f"{key}={val}" for key, val in zip(data["labels"], labels))
+                label = f"{{{label}}}" if label else ""
+                if data["type"] == "histogram":
+                    total, count = value[-2], value[-1]
+                    mean = total / count * 1000 if count else 0
+                    value = f"count={count} total={total:.3f}s mean={mean:.2f}ms"
+                self.stdout.write(f"{name}{label} {value}")
@@ -0,0 +1,77 @@
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from activitylog.archive import ArchiveWriter, delete_archived
+from activitylog.backends import EVENT_MODELS
+from activitylog.settings import ARCHIVE_AFTER_DAYS, ARCHIVE_DIR, DATABASE_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        "Move old activity log events to monthly CSV.gz archive files, deleting them from "
+        "the event tables once their file is written and verified."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory",
+            default=ARCHIVE_DIR,
+            help="Archive directory (default: DJANGO_ACTIVITY_LOG_ARCHIVE_DIR).",
+        )
+        parser.add_argument(
+            "--older-than",
+            type=int,
+            default=ARCHIVE_AFTER_DAYS,
+            metavar="DAYS",
+            help="Archive the events older than DAYS (default: DJANGO_ACTIVITY_LOG_ARCHIVE_AFTER_DAYS).",
+        )
+        parser.add_argument(
+            "--kinds",
+            nargs="+",
+            choices=sorted(EVENT_MODELS),
+            default=["crud", "request"],
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Write the archives without deleting the archived events.",
+        )
+
+    def handle(self, *args, **options):
+        directory = options["directory"]
+        if not directory:
+            raise CommandError("Set DJANGO_ACTIVITY_LOG_ARCHIVE_DIR or pass --directory.")
+        if options["older_than"] is None:
+            raise CommandError("Set DJANGO_ACTIVITY_LOG_ARCHIVE_AFTER_DAYS or pass --older-than.")
+        os.makedirs(directory, exist_ok=True)
+        cutoff = timezone.now() - timedelta(days=options["older_than"])
+
+        for kind in options["kinds"]:
+            writer = ArchiveWriter(
+                directory, kind, cutoff, options["batch_size"], using=DATABASE_ALIAS
+            )
+            total = 0
+            for path, count in writer.write():
+                message = f"{os.path.relpath(path, directory)}: {count} event(s)"
+                if not options["keep"]:
+                    deleted = delete_archived(path, kind, options["batch_size"], DATABASE_ALIAS)
+                    if deleted != count:
+                        self.stderr.write(
+                            f"{path}: {count} event(s) archived but only {deleted} deleted."
+                        )
+                    message += f", {deleted} deleted"
+                self.stdout.write(message)
+                total += count
+            if not options["keep"]:
+                # events archived by an earlier run that did not delete them
+                for path in writer.skipped_files:
+                    deleted = delete_archived(path, kind, options["batch_size"], DATABASE_ALIAS)
+                    self.stdout.write(
+                        f"{os.path.relpath(path, directory)}: {deleted} already archived "
+                        "event(s) deleted"
+                    )
+            self.stdout.write(f"{kind}: {total} event(s) archived.")
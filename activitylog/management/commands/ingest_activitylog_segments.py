@@ -0,0 +1,94 @@
+import contextlib
+import os
+import shutil
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+
+from activitylog.backends import write_events
+from activitylog.segments import closed_segments, read_segment
+from activitylog.settings import DATABASE_ALIAS, SEGMENT_DIR, SEGMENT_MAX_AGE
+
+# Number of events of a segment already written, kept next to the segment.
+PROGRESS_SUFFIX = ".progress"
+INGESTED_DIR = "ingested"
+
+
+class Command(BaseCommand):
+    help = "Load closed activity log segment files into the event tables."
+
+    directory = SEGMENT_DIR
+    directory_setting = "DJANGO_ACTIVITY_LOG_SEGMENT_DIR"
+    recover_older_than = None
+    # Open segments may still be appended to until they are max_age old, see SegmentBackend.
+    max_age = SEGMENT_MAX_AGE
+    max_age_setting = "DJANGO_ACTIVITY_LOG_SEGMENT_MAX_AGE"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--directory",
+            default=self.directory,
+            help=f"Segment directory (default: {self.directory_setting}).",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help=f"Delete ingested segments instead of moving them to '{INGESTED_DIR}/'.",
+        )
+        parser.add_argument(
+            "--recover-older-than",
+            type=int,
+            default=self.recover_older_than,
+            metavar="SECONDS",
+            help=(
+                "Also ingest open segments not written to for SECONDS, e.g. of killed processes; "
+                f"at least {self.max_age_setting}."
+            ),
+        )
+
+    def handle(self, *args, **options):
+        directory = options["directory"]
+        if not directory or not os.path.isdir(directory):
+            raise CommandError(f"Segment directory does not exist: {directory}")
+        recover_older_than = options["recover_older_than"]
+        if recover_older_than is not None and recover_older_than < self.max_age:
+            raise CommandError(
+                f"--recover-older-than must be at least {self.max_age_setting} ({self.max_age}): "
+                "younger open segments may still be written to."
+            )
+
+        total = 0
+        for path in closed_segments(directory, recover_older_than):
+            count = self.ingest(path, options["batch_size"])
+            if options["delete"]:
+                os.remove(path)
+            else:
+                os.makedirs(os.path.join(directory, INGESTED_DIR), exist_ok=True)
+                shutil.move(path, os.path.join(directory, INGESTED_DIR, os.path.basename(path)))
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path + PROGRESS_SUFFIX)
+            self.stdout.write(f"{os.path.basename(path)}: {count} event(s)")
+            total += count
+        self.stdout.write(f"{total} event(s) ingested.")
+
+    def ingest(self, path, batch_size):
+        """Write the events of one segment, resuming after the last completed batch.
+
+        A batch written again after a crash does not create duplicates, see
+        :func:`activitylog.backends.write_events`.
+        """
+        done = 0
+        with contextlib.suppress(FileNotFoundError, ValueError):
+            with open(path + PROGRESS_SUFFIX) as f:
+                done = int(f.read())
+
+        events = islice(read_segment(path), done, None)
+        while True:
+            batch = list(islice(events, batch_size))
+            if not batch:
+                return done
+            write_events(batch, using=DATABASE_ALIAS)
+            done += len(batch)
+            with open(path + PROGRESS_SUFFIX, "w") as f:
+                f.write(str(done))
@@ -0,0 +1,50 @@
+import json
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from activitylog.reconstruction import reconstruct, write_checkpoints
+
+
+class Command(BaseCommand):
+    help = "Print the fields of an audited object as they were at a point in time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", help="Model in app_label.model_name format.")
+        parser.add_argument("object_id", help="Primary key of the object.")
+        parser.add_argument(
+            "--at",
+            help="ISO 8601 date time to reconstruct the object at (default: now).",
+        )
+        parser.add_argument(
+            "--checkpoint-every",
+            type=int,
+            help="First write checkpoints so that no reconstruction replays more than N events.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options["model"])
+        except (LookupError, ValueError) as e:
+            raise CommandError(e)
+
+        at = None
+        if options["at"]:
+            at = parse_datetime(options["at"])
+            if at is None:
+                raise CommandError(f"Invalid date time: {options['at']}")
+            if settings.USE_TZ and timezone.is_naive(at):
+                at = timezone.make_aware(at)
+
+        if options["checkpoint_every"]:
+            created = write_checkpoints(model, options["object_id"], options["checkpoint_every"])
+            self.stderr.write(f"{created} checkpoint(s) written.")
+
+        fields = reconstruct(model, options["object_id"], at=at)
+        if fields is None:
+            raise CommandError(f"{options['model']} {options['object_id']} did not exist at that time.")
+        self.stdout.write(json.dumps(fields, cls=DjangoJSONEncoder, indent=4, sort_keys=True))
@@ -0,0 +1,18 @@
+from activitylog.management.commands.ingest_activitylog_segments import (
+    Command as IngestCommand,
+)
+from activitylog.settings import SPOOL_DIR, SPOOL_MAX_AGE
+
+
+class Command(IngestCommand):
+    help = (
+        "Write the spooled activity log events to the event tables. Events already in "
+        "the database are skipped."
+    )
+
+    directory = SPOOL_DIR
+    directory_setting = "DJANGO_ACTIVITY_LOG_SPOOL_DIR"
+    # Spool files are not appended to once they are SPOOL_MAX_AGE old, see SegmentBackend.
+    recover_older_than = SPOOL_MAX_AGE
+    max_age = SPOOL_MAX_AGE
+    max_age_setting = "DJANGO_ACTIVITY_LOG_SPOOL_MAX_AGE"
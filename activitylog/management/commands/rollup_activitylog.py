@@ -0,0 +1,51 @@
+from datetime import datetime, time, timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from activitylog.rollups import ROLLUP_SOURCES, rebuild_rollups, update_rollups
+from activitylog.settings import ROLLUP_BATCH_SIZE, ROLLUP_LAG
+
+
+class Command(BaseCommand):
+    help = (
+        "Count the activity log events written since the last run into the hourly and "
+        "daily rollups."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--kinds",
+            nargs="+",
+            choices=sorted(ROLLUP_SOURCES),
+            default=sorted(ROLLUP_SOURCES),
+        )
+        parser.add_argument("--batch-size", type=int, default=ROLLUP_BATCH_SIZE)
+        parser.add_argument(
+            "--lag",
+            type=int,
+            default=ROLLUP_LAG,
+            metavar="SECONDS",
+            help="Leave the events of the last SECONDS for the next run "
+            "(default: DJANGO_ACTIVITY_LOG_ROLLUP_LAG).",
+        )
+        parser.add_argument(
+            "--rebuild-since",
+            metavar="YYYY-MM-DD",
+            help="Count the events of that day and later again.",
+        )
+
+    def handle(self, *args, **options):
+        if options["rebuild_since"]:
+            try:
+                day = datetime.strptime(options["rebuild_since"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError(f"Invalid date: {options['rebuild_since']}")
+            # rollup periods are UTC days
+            since = datetime.combine(day, time.min, timezone.utc if settings.USE_TZ else None)
+            for kind in options["kinds"]:
+                rebuild_rollups(kind, since, options["batch_size"])
+
+        for kind in options["kinds"]:
+            count = update_rollups(kind, options["batch_size"], options["lag"])
+            self.stdout.write(f"{kind}: {count} event(s) counted")
@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from activitylog.backends import write_events
+from activitylog.settings import (
+    DATABASE_ALIAS,
+    QUEUE_BATCH_SIZE,
+    QUEUE_MAX_ATTEMPTS,
+    QUEUE_WORKER_CONCURRENCY,
+)
+from activitylog.taskqueue import MemoryBroker, get_broker
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Write the events queued by activitylog.taskqueue.QueueBackend to the database."
+    stopping = False
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=QUEUE_WORKER_CONCURRENCY,
+            help="Number of worker threads (default: DJANGO_ACTIVITY_LOG_QUEUE_WORKER_CONCURRENCY).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=QUEUE_BATCH_SIZE,
+            help="Events written per bulk insert (default: DJANGO_ACTIVITY_LOG_QUEUE_BATCH_SIZE).",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=QUEUE_MAX_ATTEMPTS,
+            help="Attempts after which a job that cannot be written is moved to the dead letters "
+            "(default: DJANGO_ACTIVITY_LOG_QUEUE_MAX_ATTEMPTS).",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty.",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once the queue is empty instead of waiting for more events.",
+        )
+
+    def handle(self, *args, **options):
+        self.broker = get_broker()
+        if isinstance(self.broker, MemoryBroker):
+            raise CommandError(
+                "MemoryBroker only holds the jobs of the process that queued them; "
+                "set DJANGO_ACTIVITY_LOG_QUEUE_BROKER to a broker shared across processes, "
+                "e.g. activitylog.taskqueue.SQLiteBroker."
+            )
+        self.written = 0
+        self.buried = 0
+        self.lock = threading.Lock()
+        threads = [
+            threading.Thread(target=self.work, args=(options,), name=f"activitylog-worker-{i}")
+            for i in range(max(1, options["concurrency"]))
+        ]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except KeyboardInterrupt:
+            self.stopping = True
+            for thread in threads:
+                thread.join()
+        self.stdout.write(f"{self.written} event(s) written.")
+        if self.buried:
+            self.stderr.write(f"{self.buried} event(s) moved to the dead letters.")
+
+    def work(self, options):
+        try:
+            while not self.stopping:
+                try:
+                    jobs = self.broker.reserve(options["batch_size"])
+                except Exception:
+                    # a failed reservation hands out no job, the next one may succeed
+                    logger.exception("activity log worker failed to reserve jobs.")
+                    time.sleep(options["poll_interval"])
+                    continue
+                if not jobs:
+                    if options["once"]:
+                        return
+                    time.sleep(options["poll_interval"])
+                    continue
+                if not self.process(jobs, options["max_attempts"]):
+                    time.sleep(options["poll_interval"])
+        finally:
+            connections.close_all()
+
+    def process(self, jobs, max_attempts):
+        """Write reserved jobs, returning how many were written.
+
+        A failed batch is written again one event at a time. Events that still fail
+        are left reserved, to be retried after the visibility timeout, unless they have
+        had ``max_attempts`` attempts and other events could be written: then they are
+        moved to the dead letters. When nothing can be written, the database is more
+        likely at fault than the events, and every job is retried.
+        """
+        try:
+            write_events([event for _, event, _ in jobs], using=DATABASE_ALIAS)
+        except Exception:
+            logger.exception(f"activity log worker failed to write {len(jobs)} event(s).")
+            written, failed = [], []
+            for job in jobs:
+                try:
+                    write_events([job[1]], using=DATABASE_ALIAS)
+                except Exception as e:
+                    failed.append((job, e))
+                else:
+                    written.append(job)
+        else:
+            written, failed = jobs, []
+
+        self.broker.ack([job_id for job_id, _, _ in written])
+        buried = []
+        if written:
+            for (job_id, _, attempts), error in failed:
+                if attempts >= max_attempts:
+                    logger.error(
+                        f"activity log worker gave up on job {job_id} after {attempts} attempt(s): {error!r}"
+                    )
+                    self.broker.bury([job_id], error=repr(error))
+                    buried.append(job_id)
+        with self.lock:
+            self.written += len(written)
+            self.buried += len(buried)
+        return len(written)
@@ -0,0 +1,224 @@
+import json
+from urllib.parse import quote, unquote
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import prefetch_related_objects
+from django.utils.encoding import smart_str
+
+from activitylog.utils import suppress_instance_auditing
+
+ROWS = "rows"
+SUMMARY = "summary"
+
+# Primary keys are read back in chunks to stay below database parameter limits.
+CHUNK_SIZE = 500
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def encode_object_ids(pks):
+    if not pks:
+        return ""
+    return "," + ",".join(quote(str(pk), safe="") for pk in pks) + ","
+
+
+def decode_object_ids(object_ids):
+    """The primary keys listed in ``CRUDEvent.object_ids``, as strings."""
+    return [unquote(token) for token in (object_ids or "").split(",") if token]
+
+
+class AuditQuerySetMixin:
+    """Record ``bulk_create``, ``update`` and ``delete`` as CRUD events.
+
+    These operations either bypass the model signals or, for ``delete``, produce one
+    insert per row. ``audit_bulk_events`` selects how they are recorded:
+
+    * ``"rows"``: one CREATE/UPDATE/DELETE event per affected row, written with a
+      single ``bulk_create``;
+    * ``"summary"``: one BULK_CREATE/BULK_UPDATE/BULK_DELETE event whose ``object_ids``
+      lists the affected primary keys, so that the history and the reconstruction of
+      each object still find it. BULK_CREATE events serialize the created objects,
+      which reconstruction starts from.
+
+    When left as None, ``DJANGO_ACTIVITY_LOG_BULK_EVENTS`` decides.
+    """
+
+    audit_bulk_events = None
+
+    def _get_audit_bulk_events(self):
+        if self.audit_bulk_events is not None:
+            return self.audit_bulk_events
+        from activitylog.settings import BULK_EVENTS
+
+        return BULK_EVENTS
+
+    def _get_plan(self):
+        from activitylog.registry import registry
+
+        return registry.get_plan(self.model)
+
+    def _should_audit(self):
+        return self._get_plan().audited
+
+    def _log_bulk_events(self, crud_infos):
+        from activitylog.signals.crud_flows import handle_flow_exception, log_bulk_events
+
+        def crud_flow():
+            try:
+                for chunk in _chunks(crud_infos):
+                    log_bulk_events(chunk)
+            except Exception:
+                handle_flow_exception(self.model, "bulk")
+
+        if getattr(settings, "TEST", False):
+            crud_flow()
+        else:
+            transaction.on_commit(crud_flow, using=self.db)
+
+    def _summary_event(self, event_type, pks, object_json_repr="", **changed_fields):
+        opts = self.model._meta
+        return {
+            "content_type_id": self._get_plan().content_type_id,
+            "event_type": event_type,
+            "object_id": "",
+            "object_ids": encode_object_ids(pks),
+            "object_repr": f"{len(pks)} {opts.verbose_name_plural}",
+            "object_json_repr": object_json_repr,
+            "changed_fields": json.dumps(changed_fields or None, cls=DjangoJSONEncoder),
+        }
+
+    def _m2m_field_names(self):
+        # Prefetched so serializing many rows does not issue one query per row.
+        return self._get_plan().m2m_field_names
+
+    def _row_event(self, event_type, instance, **kwargs):
+        plan = self._get_plan()
+        return {
+            "content_type_id": plan.content_type_id,
+            "event_type": event_type,
+            "object_id": instance.pk,
+            "object_repr": str(instance),
+            "object_json_repr": plan.serialize(instance),
+            **kwargs,
+        }
+
+    def bulk_create(self, objs, *args, **kwargs):
+        from activitylog.models import CRUDEvent
+
+        objs = super().bulk_create(objs, *args, **kwargs)
+        if not objs or not self._should_audit():
+            return objs
+
+        prefetch_related_objects(objs, *self._m2m_field_names())
+        # Some backends do not return the primary keys of bulk inserted rows.
+        if self._get_audit_bulk_events() == ROWS and all(obj.pk is not None for obj in objs):
+            crud_infos = [self._row_event(CRUDEvent.CREATE, obj) for obj in objs]
+        else:
+            pks = [obj.pk for obj in objs if obj.pk is not None]
+            crud_infos = [
+                self._summary_event(
+                    CRUDEvent.BULK_CREATE,
+                    pks,
+                    object_json_repr=self._get_plan().serialize_many(objs),
+                    count=len(objs),
+                )
+            ]
+        self._log_bulk_events(crud_infos)
+        return objs
+
+    def update(self, **kwargs):
+        from activitylog.models import CRUDEvent
+        from activitylog.registry import hash_value
+
+        if not self._should_audit():
+            return super().update(**kwargs)
+
+        # Excluded fields are left out of the recorded changes, hashed ones are digested.
+        plan = self._get_plan()
+        plain = {field.name for field in plan.diff_fields}
+        hashed = {field.name for field in plan.hash_fields}
+        compared = {}
+        for name in kwargs:
+            field_name = self.model._meta.get_field(name).name
+            if field_name in plain or field_name in hashed:
+                compared[name] = smart_str if field_name in plain else hash_value
+
+        if self._get_audit_bulk_events() != ROWS:
+            pks = list(self.values_list("pk", flat=True))
+            rows = super().update(**kwargs)
+            # the values of expressions, e.g. F("count") + 1, differ per row
+            changes = {
+                name: convert(kwargs[name])
+                for name, convert in compared.items()
+                if not hasattr(kwargs[name], "resolve_expression")
+            }
+            computed = [name for name in compared if name not in changes]
+            extra = {"computed": computed} if computed else {}
+            self._log_bulk_events(
+                [self._summary_event(CRUDEvent.BULK_UPDATE, pks, fields=changes, **extra)]
+            )
+            return rows
+
+        old_values = {
+            row["pk"]: row
+            for row in self.values("pk", *compared).iterator(chunk_size=CHUNK_SIZE)
+        }
+        rows = super().update(**kwargs)
+
+        crud_infos = []
+        base_manager = self.model._base_manager.using(self.db).prefetch_related(
+            *self._m2m_field_names()
+        )
+        for pks in _chunks(list(old_values)):
+            for instance in base_manager.filter(pk__in=pks):
+                old = old_values[instance.pk]
+                delta = {}
+                for name, convert in compared.items():
+                    old_value = convert(old[name])
+                    new_value = convert(instance.serializable_value(name))
+                    if old_value != new_value:
+                        delta[name] = [old_value, new_value]
+                crud_infos.append(
+                    self._row_event(
+                        CRUDEvent.UPDATE, instance, changed_fields=json.dumps(delta or None)
+                    )
+                )
+        self._log_bulk_events(crud_infos)
+        return rows
+
+    def delete(self):
+        from activitylog.models import CRUDEvent
+
+        if not self._should_audit():
+            return super().delete()
+
+        if self._get_audit_bulk_events() == ROWS:
+            objs = self._chain().prefetch_related(*self._m2m_field_names())
+            crud_infos = [
+                self._row_event(CRUDEvent.DELETE, obj)
+                for obj in objs.iterator(chunk_size=CHUNK_SIZE)
+            ]
+        else:
+            pks = list(self.values_list("pk", flat=True))
+            crud_infos = [self._summary_event(CRUDEvent.BULK_DELETE, pks)]
+
+        # Rows of other models deleted by cascade are still audited one by one.
+        with suppress_instance_auditing(self.model):
+            deleted = super().delete()
+        self._log_bulk_events(crud_infos)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
+class AuditQuerySet(AuditQuerySetMixin, models.QuerySet):
+    pass
+
+
+AuditManager = models.Manager.from_queryset(AuditQuerySet)
@@ -0,0 +1,559 @@
+import atexit
+import contextlib
+import contextvars
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+
+from activitylog.settings import (
+    METRICS,
+    METRICS_DIR,
+    METRICS_WRITE_INTERVAL,
+    REQUEST_COST_LOG,
+    SERVER_TIMING,
+)
+
+# Upper bounds, in seconds, of the histogram buckets; the last bucket is +Inf.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+FILE_PREFIX = "activitylog-metrics-"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Whether the cost of the activity log is broken down per request, see RequestCost.
+REQUEST_COST = SERVER_TIMING or REQUEST_COST_LOG
+
+_request_cost = contextvars.ContextVar("activitylog_request_cost", default=None)
+
+
+class Counter:
+    type = "counter"
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        if not self.registry.enabled:
+            return
+        self.registry.touch()
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """Current values, e.g. a state, which are not cleared by ``reset()``.
+
+    Values of several running processes are merged by taking the largest one; the
+    values of processes that exited are dropped.
+    """
+
+    type = "gauge"
+
+    def set(self, value, *labels):
+        if not self.registry.enabled:
+            return
+        self.registry.touch()
+        with self._lock:
+            self._values[labels] = value
+
+    def reset(self):
+        pass
+
+
+class Histogram(Counter):
+    """Durations in seconds, counted per bucket with their sum and count."""
+
+    type = "histogram"
+
+    def __init__(
+        self, registry, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, section=None
+    ):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # name of the RequestCost section the durations are added to
+        self.section = section
+
+    def observe(self, value, *labels):
+        if not self.registry.enabled:
+            return
+        self.registry.touch()
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            # per bucket counts (not cumulative), then sum and count
+            values = self._values.get(labels)
+            if values is None:
+                values = self._values[labels] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            values[index] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    def time(self, *labels):
+        """Context manager observing the duration of its block."""
+        return _Timer(self, labels)
+
+    def samples(self):
+        with self._lock:
+            return [[list(labels), list(values)] for labels, values in self._values.items()]
+
+
+class _Timer:
+    # A plain class: a generator based context manager costs several times more.
+    __slots__ = ("histogram", "labels", "start", "cost")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.cost = _request_cost.get()
+        if self.cost is not None:
+            self.cost.enter(self.histogram.section)
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        duration = time.perf_counter() - self.start
+        self.histogram.observe(duration, *self.labels)
+        if self.cost is not None:
+            self.cost.leave(duration)
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms of this process.
+
+    With a ``directory``, every process periodically writes its values to a file of its
+    own there, and :meth:`collect` adds up the files of all processes, e.g. the workers
+    of a gunicorn server. A forked process starts over from zero.
+
+    Files are named after the pid and start time of their process, so a process reusing
+    the pid of an exited one does not overwrite its file. :meth:`collect` removes the
+    files of processes that are gone, or that were not written for ``stale_after``
+    seconds, and leaves their values out: counts of exited processes are dropped, which
+    Prometheus handles as a counter reset.
+    """
+
+    def __init__(self, directory=None, write_interval=5, enabled=True):
+        self.directory = directory
+        self.write_interval = write_interval
+        # a running process rewrites its file every write_interval seconds
+        self.stale_after = max(10 * write_interval, 60)
+        self.enabled = enabled
+        self._started = time.time()
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._writer = None
+        if directory:
+            atexit.register(self.write)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(
+        self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, section=None
+    ):
+        return self._register(
+            Histogram(self, name, documentation, labelnames, buckets, section)
+        )
+
+    def _register(self, metric):
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def touch(self):
+        # Starts the writer on the first update of this process.
+        if self.directory and self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(
+                        target=self._run, name="activitylog-metrics", daemon=True
+                    )
+                    self._writer.start()
+
+    def _run(self):
+        while True:
+            time.sleep(self.write_interval)
+            self.write()
+
+    def _after_fork(self):
+        self._started = time.time()
+        self._lock = threading.Lock()
+        self._writer = None
+        for metric in self._metrics.values():
+            metric._lock = threading.Lock()
+            metric.reset()
+
+    @property
+    def path(self):
+        name = f"{FILE_PREFIX}{os.getpid()}-{int(self._started * 1000)}.json"
+        return os.path.join(self.directory, name)
+
+    def snapshot(self):
+        """Values of this process, as a JSON serializable dict keyed by metric name."""
+        data = {}
+        for name, metric in list(self._metrics.items()):
+            data[name] = {
+                "type": metric.type,
+                "help": metric.documentation,
+                "labels": list(metric.labelnames),
+                "samples": metric.samples(),
+            }
+            if metric.type == "histogram":
+                data[name]["buckets"] = list(metric.buckets)
+        return data
+
+    def write(self):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(f"{path}.tmp", path)
+
+    def collect(self):
+        """Values of all processes writing to ``directory``, added up."""
+        snapshots = [self.snapshot()]
+        if self.directory:
+            own_path = self.path
+            for path in glob.glob(os.path.join(self.directory, f"{FILE_PREFIX}*.json")):
+                if path == own_path:
+                    continue
+                if not self._is_live(path):
+                    with contextlib.suppress(OSError):
+                        os.remove(path)
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshots.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return merge(snapshots)
+
+    def _is_live(self, path):
+        """Whether the file at ``path`` belongs to a process still running."""
+        try:
+            if time.time() - os.path.getmtime(path) > self.stale_after:
+                return False
+            pid = int(os.path.basename(path)[len(FILE_PREFIX):].split("-")[0].split(".")[0])
+        except (OSError, ValueError):
+            return False
+        return _pid_exists(pid)
+
+    def reset(self):
+        """Forget the values of this process and remove the files of all processes."""
+        for metric in self._metrics.values():
+            metric.reset()
+        if self.directory:
+            for path in glob.glob(os.path.join(self.directory, f"{FILE_PREFIX}*.json")):
+                os.remove(path)
+
+
+def _pid_exists(pid):
+    if os.name != "posix":
+        # os.kill() would signal the process; rely on the file age only
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # running under another user
+        return True
+    return True
+
+
+def merge(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            target = merged.setdefault(name, {**data, "samples": {}})
+            for labels, value in data["samples"]:
+                key = tuple(labels)
+                if key not in target["samples"]:
+                    target["samples"][key] = value
+                elif data["type"] == "gauge":
+                    target["samples"][key] = max(target["samples"][key], value)
+                elif isinstance(value, list):
+                    target["samples"][key] = [a + b for a, b in zip(target["samples"][key], value)]
+                else:
+                    target["samples"][key] += value
+    for data in merged.values():
+        data["samples"] = [[list(labels), value] for labels, value in data["samples"].items()]
+    return merged
+
+
+def _format_labels(names, values, **extra):
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    escaped = (
+        str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        for _, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def render_prometheus(snapshot):
+    """Render the result of :meth:`MetricsRegistry.collect` in the Prometheus text format."""
+    lines = []
+    for name, data in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['type']}")
+        for labels, value in data["samples"]:
+            if data["type"] != "histogram":
+                lines.append(f"{name}{_format_labels(data['labels'], labels)} {value}")
+                continue
+            cumulative = 0
+            bounds = [repr(float(bound)) for bound in data["buckets"]] + ["+Inf"]
+            for bound, count in zip(bounds, value):
+                cumulative += count
+                lines.append(
+                    f"{name}_bucket{_format_labels(data['labels'], labels, le=bound)} {cumulative}"
+                )
+            lines.append(f"{name}_sum{_format_labels(data['labels'], labels)} {value[-2]}")
+            lines.append(f"{name}_count{_format_labels(data['labels'], labels)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry(METRICS_DIR, METRICS_WRITE_INTERVAL, enabled=METRICS)
+
+events = registry.counter(
+    "activitylog_events_total", "Events handed to the logging backend.", ("kind",)
+)
+write_errors = registry.counter(
+    "activitylog_write_errors_total", "Events the logging backend failed to write.", ("kind",)
+)
+failures = registry.counter(
+    "activitylog_failures_total",
+    "Exceptions caught and logged by the activity log instead of being raised.",
+    ("stage",),
+)
+handler_seconds = registry.histogram(
+    "activitylog_handler_seconds",
+    "Time spent in activity log signal handlers.",
+    ("handler",),
+    section="handlers",
+)
+geoip_seconds = registry.histogram(
+    "activitylog_geoip_seconds",
+    "Time spent locating remote addresses with GeoIP.",
+    section="geoip",
+)
+serialize_seconds = registry.histogram(
+    "activitylog_serialize_seconds",
+    "Time spent serializing audited instances.",
+    section="serialize",
+)
+write_seconds = registry.histogram(
+    "activitylog_write_seconds",
+    "Time spent in the logging backend per call.",
+    ("kind",),
+    section="write",
+)
+breaker_state = registry.gauge(
+    "activitylog_breaker_state",
+    "State of each circuit breaker: 0 closed, 1 half-open, 2 open.",
+    ("breaker",),
+)
+breaker_transitions = registry.counter(
+    "activitylog_breaker_transitions_total",
+    "Circuit breaker state changes, by the state entered.",
+    ("breaker", "state"),
+)
+shed_events = registry.counter(
+    "activitylog_shed_events_total",
+    "Events an open circuit breaker did not write.",
+    ("breaker", "kind"),
+)
+flagged_requests = registry.counter(
+    "activitylog_flagged_requests_total",
+    "Requests stored by the detector, by the threshold they crossed.",
+    ("reason",),
+)
+spooled_events = registry.counter(
+    "activitylog_spooled_events_total",
+    "Events written to the local spool, because their write failed or they were shed.",
+    ("kind", "reason"),
+)
+login_lockouts = registry.counter(
+    "activitylog_login_lockouts_total",
+    "Failed logins from an IP or for a username over the lockout threshold.",
+    ("by",),
+)
+
+
+def timed(handler):
+    """Record the duration of the decorated signal handler under ``handler``."""
+
+    def decorator(func):
+        if not registry.enabled and not REQUEST_COST:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with handler_seconds.time(handler):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class MeteredBackend:
+    """Count and time the events written through ``backend``.
+
+    Wraps the backend returned by :func:`activitylog.backends.get_audit_logger`; any
+    other attribute is the one of the wrapped backend.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _write(self, kind, infos, bulk=False):
+        events.inc(kind, amount=len(infos))
+        try:
+            with write_seconds.time(kind):
+                if not bulk:
+                    return getattr(self.backend, kind)(infos[0])
+                bulk_method = getattr(self.backend, f"bulk_{kind}", None)
+                if bulk_method is not None:
+                    return bulk_method(infos)
+                for info in infos:
+                    getattr(self.backend, kind)(info)
+        except Exception:
+            write_errors.inc(kind, amount=len(infos))
+            raise
+
+    def request(self, request_info):
+        return self._write("request", [request_info])
+
+    def bulk_request(self, request_infos):
+        return self._write("request", request_infos, bulk=True)
+
+    def cors(self, cors_info):
+        return self._write("cors", [cors_info])
+
+    def bulk_cors(self, cors_infos):
+        return self._write("cors", cors_infos, bulk=True)
+
+    def crud(self, crud_info):
+        return self._write("crud", [crud_info])
+
+    def bulk_crud(self, crud_infos):
+        return self._write("crud", crud_infos, bulk=True)
+
+    def login(self, login_info):
+        return self._write("login", [login_info])
+
+    def bulk_login(self, login_infos):
+        return self._write("login", login_infos, bulk=True)
+
+
+class RequestCost:
+    """Time and queries spent in activity log code while handling one request.
+
+    Timed sections may nest, e.g. a backend write inside a signal handler: every section
+    keeps its own time, unless nested in a section of the same name, ``total`` only
+    counts the outermost ones, and queries are counted when run inside any section.
+    """
+
+    __slots__ = ("sections", "total", "queries", "_stack", "_start")
+
+    def __init__(self):
+        self.sections = {}
+        self.total = 0.0
+        self.queries = 0
+        self._stack = []
+        self._start = 0.0
+
+    def enter(self, section):
+        if not self._stack:
+            self._start = time.perf_counter()
+        self._stack.append(section)
+
+    def leave(self, duration):
+        section = self._stack.pop()
+        if not self._stack:
+            self.total += time.perf_counter() - self._start
+        if section is not None and section not in self._stack:
+            self.sections[section] = self.sections.get(section, 0.0) + duration
+
+    def server_timing(self):
+        """Value of a ``Server-Timing`` header, durations in milliseconds."""
+        entries = [
+            f'activitylog;dur={self.total * 1000:.2f};desc="activity log, {self.queries} queries"'
+        ]
+        entries += [
+            f"activitylog-{section};dur={seconds * 1000:.2f}"
+            for section, seconds in self.sections.items()
+        ]
+        return ", ".join(entries)
+
+    def as_dict(self):
+        return {
+            "total_ms": round(self.total * 1000, 3),
+            "queries": self.queries,
+            **{
+                f"{section}_ms": round(seconds * 1000, 3)
+                for section, seconds in self.sections.items()
+            },
+        }
+
+
+def start_request_cost(sender=None, **kwargs):
+    _request_cost.set(RequestCost())
+
+
+def pop_request_cost():
+    """The :class:`RequestCost` of the current request, which is no longer tracked."""
+    cost = _request_cost.get()
+    _request_cost.set(None)
+    return cost
+
+
+def _count_query(execute, sql, params, many, context):
+    cost = _request_cost.get()
+    if cost is not None and cost._stack:
+        cost.queries += 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(sender, connection, **kwargs):
+    # First in the list: connection.execute_wrapper() blocks pop the last wrapper.
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _count_query)
+
+
+if REQUEST_COST:
+    # Connected when this module is first imported, i.e. before the request_started
+    # receivers of the activity log, whose cost is then part of the request.
+    request_started.connect(start_request_cost, dispatch_uid="activitylog_request_cost")
+    connection_created.connect(
+        _install_query_counter, dispatch_uid="activitylog_request_cost_queries"
+    )
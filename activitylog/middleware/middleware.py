@@ -1,6 +1,15 @@
 import contextlib
+import json
+import logging
+import time
 from threading import local
 
+from activitylog.metrics import pop_request_cost
+from activitylog.settings import REQUEST_COST_LOG, SERVER_TIMING
+from activitylog.signals.request_signals import MEASURE_RESPONSES, QueryCounter, log_response
+
+cost_logger = logging.getLogger("activitylog.request_cost")
+
 
 class MockRequest:
     def __init__(self, *args, **kwargs):
@@ -41,7 +50,15 @@ def set_local_details():
 
 
 class ActivityLogMiddleware:
-    """Makes request available to this app signals."""
+    """Makes request available to this app signals.
+
+    With ``DJANGO_ACTIVITY_LOG_REQUEST_EVENT_CAPTURE = "response"`` it writes the request
+    event, with the status code, duration, size and number of queries of the response.
+    With ``DJANGO_ACTIVITY_LOG_DETECTOR`` slow requests and N+1 queries are flagged.
+    With ``DJANGO_ACTIVITY_LOG_SERVER_TIMING`` the time and queries spent in the activity
+    log while handling the request are reported in a ``Server-Timing`` header, with
+    ``DJANGO_ACTIVITY_LOG_REQUEST_COST_LOG`` in a log line.
+    """
 
     def __init__(self, get_response=None):
         self.get_response = get_response
@@ -50,9 +67,15 @@ class ActivityLogMiddleware:
         _thread_locals.request = (
             request
         )
+        if MEASURE_RESPONSES:
+            start = time.perf_counter()
+            queries = QueryCounter()
         if hasattr(self, "process_request"):
             response = self.process_request(request)
         response = response or self.get_response(request)
+        if MEASURE_RESPONSES:
+            queries.stop()
+            log_response(request, response, time.perf_counter() - start, queries)
         if hasattr(self, "process_response"):
             response = self.process_response(request, response)
         return response
@@ -73,8 +96,28 @@ class ActivityLogMiddleware:
     def process_response(self, request, response):
         with contextlib.suppress(AttributeError):
             del _thread_locals.request
+        if SERVER_TIMING or REQUEST_COST_LOG:
+            self.report_cost(request, response)
         return response
 
+    def report_cost(self, request, response):
+        cost = pop_request_cost()
+        if cost is None:
+            return
+        if SERVER_TIMING:
+            timing = cost.server_timing()
+            if response.has_header("Server-Timing"):
+                timing = f"{response['Server-Timing']}, {timing}"
+            response["Server-Timing"] = timing
+        if REQUEST_COST_LOG:
+            data = {
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                **cost.as_dict(),
+            }
+            cost_logger.info(json.dumps(data), extra={"activitylog_request_cost": data})
+
     def process_exception(self, request, exception):
         with contextlib.suppress(AttributeError):
             del _thread_locals.request
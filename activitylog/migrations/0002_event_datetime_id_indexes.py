@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-19 17:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0001_initial'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='corsevent',
+            index=models.Index(fields=['datetime', 'id'], name='activitylog_cors_dt_id'),
+        ),
+        migrations.AddIndex(
+            model_name='crudevent',
+            index=models.Index(fields=['datetime', 'id'], name='activitylog_crud_dt_id'),
+        ),
+        migrations.AddIndex(
+            model_name='loginevent',
+            index=models.Index(fields=['datetime', 'id'], name='activitylog_login_dt_id'),
+        ),
+        migrations.AddIndex(
+            model_name='requestevent',
+            index=models.Index(fields=['datetime', 'id'], name='activitylog_request_dt_id'),
+        ),
+    ]
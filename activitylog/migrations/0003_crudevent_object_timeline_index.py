@@ -0,0 +1,25 @@
+# Generated by Django 5.0.14 on 2026-10-19 17:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0002_event_datetime_id_indexes'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='crudevent',
+            index=models.Index(fields=['content_type', 'object_id', 'datetime', 'id'], name='activitylog_crud_object_dt_id'),
+        ),
+        # (content_type, object_id) lookups are served by the timeline index
+        migrations.AlterIndexTogether(
+            name='crudevent',
+            index_together=set(),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-19 17:08
+
+import activitylog.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0003_crudevent_object_timeline_index'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CRUDCheckpoint',
+            fields=[
+                ('id', models.UUIDField(default=activitylog.models.default_uuid, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('object_id', models.CharField(max_length=255, verbose_name='Object ID')),
+                ('event_id', models.UUIDField(verbose_name='Last event ID')),
+                ('datetime', models.DateTimeField(verbose_name='Date time')),
+                ('fields', models.TextField(verbose_name='Fields')),
+                ('content_type', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Content type')),
+            ],
+            options={
+                'verbose_name': 'CRUD checkpoint',
+                'verbose_name_plural': 'CRUD checkpoints',
+                'ordering': ['-datetime'],
+                'indexes': [models.Index(fields=['content_type', 'object_id', 'datetime', 'event_id'], name='activitylog_checkpoint_obj')],
+            },
+        ),
+    ]
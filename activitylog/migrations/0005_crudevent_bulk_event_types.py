@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0004_crudcheckpoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='crudevent',
+            name='event_type',
+            field=models.SmallIntegerField(choices=[(1, 'Create'), (2, 'Update'), (3, 'Delete'), (4, 'Many-to-Many Change'), (5, 'Reverse Many-to-Many Change'), (6, 'Many-to-Many Add'), (7, 'Reverse Many-to-Many Add'), (8, 'Many-to-Many Remove'), (9, 'Reverse Many-to-Many Remove'), (10, 'Many-to-Many Clear'), (11, 'Reverse Many-to-Many Clear'), (12, 'Bulk Create'), (13, 'Bulk Update'), (14, 'Bulk Delete')], verbose_name='Event type'),
+        ),
+    ]
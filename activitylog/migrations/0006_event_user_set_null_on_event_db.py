@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-19 17:23
+
+import activitylog.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0005_crudevent_bulk_event_types'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='corsevent',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=activitylog.models.SET_NULL_ON_EVENT_DB, to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.AlterField(
+            model_name='crudevent',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=activitylog.models.SET_NULL_ON_EVENT_DB, to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.AlterField(
+            model_name='loginevent',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=activitylog.models.SET_NULL_ON_EVENT_DB, to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+        migrations.AlterField(
+            model_name='requestevent',
+            name='user',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=activitylog.models.SET_NULL_ON_EVENT_DB, to=settings.AUTH_USER_MODEL, verbose_name='User'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0006_event_user_set_null_on_event_db'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='requestevent',
+            name='db_query_count',
+            field=models.PositiveIntegerField(blank=True, null=True, verbose_name='Database queries'),
+        ),
+        migrations.AddField(
+            model_name='requestevent',
+            name='duration_ms',
+            field=models.FloatField(blank=True, null=True, verbose_name='Duration (ms)'),
+        ),
+        migrations.AddField(
+            model_name='requestevent',
+            name='response_bytes',
+            field=models.PositiveBigIntegerField(blank=True, null=True, verbose_name='Response size (bytes)'),
+        ),
+        migrations.AddField(
+            model_name='requestevent',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Status code'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:04
+
+import activitylog.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0007_requestevent_response_fields'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlaggedRequest',
+            fields=[
+                ('id', models.UUIDField(default=activitylog.models.default_uuid, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('url', models.CharField(db_index=True, max_length=254, verbose_name='URL')),
+                ('method', models.CharField(max_length=20, verbose_name='Method')),
+                ('status_code', models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='Status code')),
+                ('duration_ms', models.FloatField(verbose_name='Duration (ms)')),
+                ('db_query_count', models.PositiveIntegerField(verbose_name='Database queries')),
+                ('reasons', models.CharField(max_length=50, verbose_name='Reasons')),
+                ('fingerprints', models.CharField(blank=True, max_length=255, verbose_name='Query fingerprints')),
+                ('query_shapes', models.TextField(blank=True, verbose_name='Query shapes')),
+                ('request_event_id', models.UUIDField(blank=True, null=True, verbose_name='Request event ID')),
+                ('datetime', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Date time')),
+            ],
+            options={
+                'verbose_name': 'flagged request',
+                'verbose_name_plural': 'flagged requests',
+                'ordering': ['-datetime'],
+                'indexes': [models.Index(fields=['datetime', 'id'], name='activitylog_flagged_dt_id')],
+            },
+        ),
+    ]
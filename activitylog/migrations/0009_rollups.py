@@ -0,0 +1,45 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0008_flaggedrequest'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=10, verbose_name='Event kind')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4, verbose_name='Period')),
+                ('start', models.DateTimeField(verbose_name='Period start')),
+                ('key', models.CharField(blank=True, max_length=255, verbose_name='Key')),
+                ('subkey', models.CharField(blank=True, max_length=30, verbose_name='Subkey')),
+                ('count', models.BigIntegerField(default=0, verbose_name='Count')),
+            ],
+            options={
+                'verbose_name': 'event rollup',
+                'verbose_name_plural': 'event rollups',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('kind', models.CharField(max_length=10, primary_key=True, serialize=False, verbose_name='Event kind')),
+                ('datetime', models.DateTimeField(verbose_name='Date time')),
+                ('event_id', models.UUIDField(verbose_name='Event ID')),
+            ],
+            options={
+                'verbose_name': 'rollup watermark',
+                'verbose_name_plural': 'rollup watermarks',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='eventrollup',
+            constraint=models.UniqueConstraint(fields=('kind', 'period', 'start', 'key', 'subkey'), name='activitylog_rollup_unique'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0009_rollups'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventrollup',
+            name='ip_sketch',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Remote IPs sketch'),
+        ),
+        migrations.AddField(
+            model_name='eventrollup',
+            name='user_sketch',
+            field=models.BinaryField(blank=True, null=True, verbose_name='Users sketch'),
+        ),
+    ]
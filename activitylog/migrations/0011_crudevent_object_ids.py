@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0010_eventrollup_sketches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crudevent',
+            name='object_ids',
+            field=models.TextField(blank=True, null=True, verbose_name='Object IDs'),
+        ),
+    ]
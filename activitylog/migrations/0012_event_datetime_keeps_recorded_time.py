@@ -0,0 +1,34 @@
+# Generated by Django 5.0.14 on 2026-10-19 18:54
+
+import activitylog.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0011_crudevent_object_ids'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='corsevent',
+            name='datetime',
+            field=activitylog.models.EventDateTimeField(auto_now_add=True, db_index=True, verbose_name='Date time'),
+        ),
+        migrations.AlterField(
+            model_name='crudevent',
+            name='datetime',
+            field=activitylog.models.EventDateTimeField(auto_now_add=True, verbose_name='Date time'),
+        ),
+        migrations.AlterField(
+            model_name='loginevent',
+            name='datetime',
+            field=activitylog.models.EventDateTimeField(auto_now_add=True, verbose_name='Date time'),
+        ),
+        migrations.AlterField(
+            model_name='requestevent',
+            name='datetime',
+            field=activitylog.models.EventDateTimeField(auto_now_add=True, db_index=True, verbose_name='Date time'),
+        ),
+    ]
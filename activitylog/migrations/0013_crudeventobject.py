@@ -0,0 +1,57 @@
+# Generated by Django 5.0.14 on 2026-10-19 19:06
+
+from urllib.parse import unquote
+
+import activitylog.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def link_bulk_events(apps, schema_editor):
+    CRUDEvent = apps.get_model('activitylog', 'CRUDEvent')
+    CRUDEventObject = apps.get_model('activitylog', 'CRUDEventObject')
+    using = schema_editor.connection.alias
+    events = (
+        CRUDEvent.objects.using(using)
+        .filter(object_id='').exclude(object_ids=None).exclude(object_ids='')
+        .values_list('id', 'content_type_id', 'object_ids')
+    )
+    for event_id, content_type_id, object_ids in events.iterator(chunk_size=500):
+        CRUDEventObject.objects.using(using).bulk_create(
+            [
+                CRUDEventObject(event_id=event_id, content_type_id=content_type_id,
+                                object_id=unquote(token))
+                for token in object_ids.split(',') if token
+            ],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0012_event_datetime_keeps_recorded_time'),
+        ('contenttypes', '0002_remove_content_type_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CRUDEventObject',
+            fields=[
+                ('id', models.UUIDField(default=activitylog.models.default_uuid, editable=False, primary_key=True, serialize=False, unique=True)),
+                ('event_id', models.UUIDField(verbose_name='Event ID')),
+                ('object_id', models.CharField(max_length=255, verbose_name='Object ID')),
+                ('content_type', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype', verbose_name='Content type')),
+            ],
+            options={
+                'verbose_name': 'CRUD event object',
+                'verbose_name_plural': 'CRUD event objects',
+                'indexes': [models.Index(fields=['content_type', 'object_id'], name='activitylog_eventobject_obj')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='crudeventobject',
+            constraint=models.UniqueConstraint(fields=('event_id', 'object_id'), name='activitylog_eventobject_unique'),
+        ),
+        migrations.RunPython(link_bulk_events, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.0.14 on 2026-10-19 19:20
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_datetime(apps, schema_editor):
+    # the rollup watermarks were written from the event datetimes
+    using = schema_editor.connection.alias
+    for model_name in ('CRUDEvent', 'LoginEvent', 'RequestEvent'):
+        model = apps.get_model('activitylog', model_name)
+        model.objects.using(using).update(inserted_at=F('datetime'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('activitylog', '0013_crudeventobject'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crudevent',
+            name='inserted_at',
+            field=models.DateTimeField(null=True, verbose_name='Inserted at'),
+        ),
+        migrations.AddField(
+            model_name='loginevent',
+            name='inserted_at',
+            field=models.DateTimeField(null=True, verbose_name='Inserted at'),
+        ),
+        migrations.AddField(
+            model_name='requestevent',
+            name='inserted_at',
+            field=models.DateTimeField(null=True, verbose_name='Inserted at'),
+        ),
+        migrations.RunPython(copy_datetime, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='crudevent',
+            name='inserted_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Inserted at'),
+        ),
+        migrations.AlterField(
+            model_name='loginevent',
+            name='inserted_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Inserted at'),
+        ),
+        migrations.AlterField(
+            model_name='requestevent',
+            name='inserted_at',
+            field=models.DateTimeField(auto_now_add=True, verbose_name='Inserted at'),
+        ),
+        migrations.AddIndex(
+            model_name='crudevent',
+            index=models.Index(fields=['inserted_at', 'id'], name='activitylog_crud_ins_id'),
+        ),
+        migrations.AddIndex(
+            model_name='loginevent',
+            index=models.Index(fields=['inserted_at', 'id'], name='activitylog_login_ins_id'),
+        ),
+        migrations.AddIndex(
+            model_name='requestevent',
+            index=models.Index(fields=['inserted_at', 'id'], name='activitylog_request_ins_id'),
+        ),
+    ]
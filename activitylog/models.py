@@ -1,7 +1,7 @@
 import uuid
 from django.conf import settings
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import models, router
 from django.utils.translation import gettext_lazy as _
 
 
@@ -9,6 +9,30 @@ def default_uuid():
     return getattr(settings, "DJANGO_ACTIVITY_LOG_PRIMARY_KEY", uuid.uuid4())
 
 
+def SET_NULL_ON_EVENT_DB(collector, field, sub_objs, using):
+    """``SET_NULL`` run on the database of the events, which may not be the user's."""
+    collector.add_field_update(field, None, sub_objs.using(router.db_for_write(field.model)))
+
+
+# Lets the deletion collector pass the events unevaluated, so they are never read
+# from the database of the deleted user.
+SET_NULL_ON_EVENT_DB.lazy_sub_objs = True
+
+
+class EventDateTimeField(models.DateTimeField):
+    """``auto_now_add`` that keeps a datetime already set on the event.
+
+    Events recorded earlier and written later, e.g. from a segment file or a queue,
+    are stored with the time they were recorded at.
+    """
+
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+        if add and value is not None:
+            return value
+        return super().pre_save(model_instance, add)
+
+
 class CRUDEvent(models.Model):
     id = models.UUIDField(primary_key=True, default=default_uuid, editable=False, unique=True)
     CREATE = 1
@@ -22,6 +46,9 @@ class CRUDEvent(models.Model):
     M2M_REMOVE_REV = 9
     M2M_CLEAR = 10
     M2M_CLEAR_REV = 11
+    BULK_CREATE = 12
+    BULK_UPDATE = 13
+    BULK_DELETE = 14
 
     TYPES = (
         (CREATE, _('Create')),
@@ -35,6 +62,9 @@ class CRUDEvent(models.Model):
         (M2M_REMOVE_REV, _('Reverse Many-to-Many Remove')),
         (M2M_CLEAR, _('Many-to-Many Clear')),
         (M2M_CLEAR_REV, _('Reverse Many-to-Many Clear')),
+        (BULK_CREATE, _('Bulk Create')),
+        (BULK_UPDATE, _('Bulk Update')),
+        (BULK_DELETE, _('Bulk Delete')),
     )
 
     event_type = models.SmallIntegerField(choices=TYPES, verbose_name=_('Event type'))
@@ -55,13 +85,17 @@ class CRUDEvent(models.Model):
 
     remote_ip = models.CharField(max_length=50, null=True, db_index=True, verbose_name=_('Remote IP'))
     changed_fields = models.TextField(null=True, blank=True, verbose_name=_('Changed fields'))
+    # Bulk events: the affected pks, as ",pk1,pk2,", see activitylog.managers.
+    object_ids = models.TextField(null=True, blank=True, verbose_name=_('Object IDs'))
     user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True,
-                             blank=True, on_delete=models.SET_NULL,
+                             blank=True, on_delete=SET_NULL_ON_EVENT_DB,
                              db_constraint=False, verbose_name=_('User'))
     user_pk_as_string = models.CharField(max_length=255, null=True, blank=True,
                                          help_text=_('String version of the user pk'),
                                          verbose_name=_('User PK as string'))
-    datetime = models.DateTimeField(auto_now_add=True, verbose_name=_('Date time'))
+    datetime = EventDateTimeField(auto_now_add=True, verbose_name=_('Date time'))
+    # when the row was written, which can be later than datetime; see activitylog.rollups
+    inserted_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Inserted at'))
 
     def is_create(self):
         return self.CREATE == self.event_type
@@ -76,7 +110,62 @@ class CRUDEvent(models.Model):
         verbose_name = _('CRUD event')
         verbose_name_plural = _('CRUD events')
         ordering = ['-datetime']
-        index_together = ['object_id', 'content_type', ]
+        indexes = [
+            models.Index(fields=['datetime', 'id'], name='activitylog_crud_dt_id'),
+            models.Index(fields=['inserted_at', 'id'], name='activitylog_crud_ins_id'),
+            models.Index(fields=['content_type', 'object_id', 'datetime', 'id'],
+                         name='activitylog_crud_object_dt_id'),
+        ]
+
+
+class CRUDCheckpoint(models.Model):
+    """Reconstructed state of an object right after ``event_id``.
+
+    Written periodically so that rebuilding an object at a point in time never has to
+    replay more than a bounded number of ``changed_fields`` deltas.
+    """
+    id = models.UUIDField(primary_key=True, default=default_uuid, editable=False, unique=True)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, db_constraint=False,
+                                     verbose_name=_('Content type'))
+    object_id = models.CharField(max_length=255, verbose_name=_('Object ID'))
+    event_id = models.UUIDField(verbose_name=_('Last event ID'))
+    datetime = models.DateTimeField(verbose_name=_('Date time'))
+    fields = models.TextField(verbose_name=_('Fields'))
+
+    class Meta:
+        verbose_name = _('CRUD checkpoint')
+        verbose_name_plural = _('CRUD checkpoints')
+        ordering = ['-datetime']
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', 'datetime', 'event_id'],
+                         name='activitylog_checkpoint_obj'),
+        ]
+
+
+class CRUDEventObject(models.Model):
+    """An object affected by a summary bulk event.
+
+    One row per primary key listed in ``CRUDEvent.object_ids``, so that the history
+    of an object finds the bulk events through an index instead of scanning
+    ``object_ids``.
+    """
+    id = models.UUIDField(primary_key=True, default=default_uuid, editable=False, unique=True)
+    event_id = models.UUIDField(verbose_name=_('Event ID'))
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, db_constraint=False,
+                                     verbose_name=_('Content type'))
+    object_id = models.CharField(max_length=255, verbose_name=_('Object ID'))
+
+    class Meta:
+        verbose_name = _('CRUD event object')
+        verbose_name_plural = _('CRUD event objects')
+        indexes = [
+            models.Index(fields=['content_type', 'object_id'], name='activitylog_eventobject_obj'),
+        ]
+        constraints = [
+            # lets events written twice skip their rows, see write_events
+            models.UniqueConstraint(fields=['event_id', 'object_id'],
+                                    name='activitylog_eventobject_unique'),
+        ]
 
 
 class LoginEvent(models.Model):
@@ -92,7 +181,7 @@ class LoginEvent(models.Model):
     login_type = models.SmallIntegerField(choices=TYPES, verbose_name=_('Event type'))
     username = models.CharField(max_length=255, null=True, blank=True, verbose_name=_('Username'))
     user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True,
-                             on_delete=models.SET_NULL, db_constraint=False,
+                             on_delete=SET_NULL_ON_EVENT_DB, db_constraint=False,
                              verbose_name=_('User'))
 
     browser = models.TextField(null=True, blank=True, verbose_name=_('Browser fields'))
@@ -105,12 +194,17 @@ class LoginEvent(models.Model):
     country = models.CharField(max_length=500, blank=True, null=True, verbose_name=_('country fields'))
 
     remote_ip = models.CharField(max_length=50, null=True, db_index=True, verbose_name=_('Remote IP'))
-    datetime = models.DateTimeField(auto_now_add=True, verbose_name=_('Date time'))
+    datetime = EventDateTimeField(auto_now_add=True, verbose_name=_('Date time'))
+    inserted_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Inserted at'))
 
     class Meta:
         verbose_name = _('login event')
         verbose_name_plural = _('login events')
         ordering = ['-datetime']
+        indexes = [
+            models.Index(fields=['datetime', 'id'], name='activitylog_login_dt_id'),
+            models.Index(fields=['inserted_at', 'id'], name='activitylog_login_ins_id'),
+        ]
 
 
 class RequestEvent(models.Model):
@@ -119,7 +213,7 @@ class RequestEvent(models.Model):
     method = models.CharField(max_length=20, null=False, db_index=True, verbose_name=_('Method'))
     query_string = models.TextField(null=True, blank=True, verbose_name=_('Query string'))
     user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True,
-                             on_delete=models.SET_NULL, db_constraint=False,
+                             on_delete=SET_NULL_ON_EVENT_DB, db_constraint=False,
                              verbose_name=_('User'))
 
     browser = models.TextField(null=True, blank=True, verbose_name=_('Browser fields'))
@@ -132,12 +226,23 @@ class RequestEvent(models.Model):
     country = models.CharField(max_length=500, blank=True, null=True, verbose_name=_('country fields'))
 
     remote_ip = models.CharField(max_length=50, null=True, blank=True, db_index=True, verbose_name=_('Remote IP'))
-    datetime = models.DateTimeField(auto_now_add=True, blank=True, db_index=True, verbose_name=_('Date time'))
+    datetime = EventDateTimeField(auto_now_add=True, blank=True, db_index=True, verbose_name=_('Date time'))
+    inserted_at = models.DateTimeField(auto_now_add=True, verbose_name=_('Inserted at'))
+
+    # Only recorded with DJANGO_ACTIVITY_LOG_REQUEST_EVENT_CAPTURE = "response".
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name=_('Status code'))
+    duration_ms = models.FloatField(null=True, blank=True, verbose_name=_('Duration (ms)'))
+    response_bytes = models.PositiveBigIntegerField(null=True, blank=True, verbose_name=_('Response size (bytes)'))
+    db_query_count = models.PositiveIntegerField(null=True, blank=True, verbose_name=_('Database queries'))
 
     class Meta:
         verbose_name = _('request event')
         verbose_name_plural = _('request events')
         ordering = ['-datetime']
+        indexes = [
+            models.Index(fields=['datetime', 'id'], name='activitylog_request_dt_id'),
+            models.Index(fields=['inserted_at', 'id'], name='activitylog_request_ins_id'),
+        ]
 
 
 class CorsEvent(models.Model):
@@ -146,7 +251,7 @@ class CorsEvent(models.Model):
     method = models.CharField(max_length=20, null=True, db_index=True, verbose_name=_('Method'))
     query_string = models.TextField(null=True, verbose_name=_('Query string'))
     user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True,
-                             on_delete=models.SET_NULL, db_constraint=False,
+                             on_delete=SET_NULL_ON_EVENT_DB, db_constraint=False,
                              verbose_name=_('User'))
 
     browser = models.TextField(null=True, blank=True, verbose_name=_('Browser fields'))
@@ -159,9 +264,88 @@ class CorsEvent(models.Model):
     country = models.CharField(max_length=500, blank=True, null=True, verbose_name=_('country fields'))
 
     remote_ip = models.CharField(max_length=50, null=True, db_index=True, verbose_name=_('Remote IP'))
-    datetime = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name=_('Date time'))
+    datetime = EventDateTimeField(auto_now_add=True, db_index=True, verbose_name=_('Date time'))
 
     class Meta:
         verbose_name = _('cors event')
         verbose_name_plural = _('cors events')
         ordering = ['-datetime']
+        indexes = [
+            models.Index(fields=['datetime', 'id'], name='activitylog_cors_dt_id'),
+        ]
+
+
+class FlaggedRequest(models.Model):
+    """A request the detector found slow or heavy on queries, see activitylog.detector.
+
+    ``query_shapes`` is a JSON list of ``[fingerprint, count, normalized SQL]`` of the most
+    repeated queries of the request; ``fingerprints`` lists the same fingerprints, for
+    searching requests that ran a given query.
+    """
+    SLOW = 'slow'
+    QUERIES = 'queries'
+    REPEATED = 'repeated'
+
+    id = models.UUIDField(primary_key=True, default=default_uuid, editable=False, unique=True)
+    url = models.CharField(max_length=254, db_index=True, verbose_name=_('URL'))
+    method = models.CharField(max_length=20, verbose_name=_('Method'))
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name=_('Status code'))
+    duration_ms = models.FloatField(verbose_name=_('Duration (ms)'))
+    db_query_count = models.PositiveIntegerField(verbose_name=_('Database queries'))
+    reasons = models.CharField(max_length=50, verbose_name=_('Reasons'))
+    fingerprints = models.CharField(max_length=255, blank=True, verbose_name=_('Query fingerprints'))
+    query_shapes = models.TextField(blank=True, verbose_name=_('Query shapes'))
+    request_event_id = models.UUIDField(null=True, blank=True, verbose_name=_('Request event ID'))
+    datetime = models.DateTimeField(auto_now_add=True, db_index=True, verbose_name=_('Date time'))
+
+    class Meta:
+        verbose_name = _('flagged request')
+        verbose_name_plural = _('flagged requests')
+        ordering = ['-datetime']
+        indexes = [
+            models.Index(fields=['datetime', 'id'], name='activitylog_flagged_dt_id'),
+        ]
+
+
+class EventRollup(models.Model):
+    """Number of events of one ``kind`` per hour or day, see activitylog.rollups.
+
+    ``key`` and ``subkey`` are the URL and method of request events, the username and
+    login type of login events, and the ``app_label.model`` and event type of CRUD events.
+    The sketches estimate the distinct users and IPs over any number of rows.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    PERIODS = (
+        (HOUR, _('Hour')),
+        (DAY, _('Day')),
+    )
+
+    kind = models.CharField(max_length=10, verbose_name=_('Event kind'))
+    period = models.CharField(max_length=4, choices=PERIODS, verbose_name=_('Period'))
+    start = models.DateTimeField(verbose_name=_('Period start'))
+    key = models.CharField(max_length=255, blank=True, verbose_name=_('Key'))
+    subkey = models.CharField(max_length=30, blank=True, verbose_name=_('Subkey'))
+    count = models.BigIntegerField(default=0, verbose_name=_('Count'))
+    # activitylog.hyperloglog sketches of the users and remote IPs of the events
+    user_sketch = models.BinaryField(null=True, blank=True, verbose_name=_('Users sketch'))
+    ip_sketch = models.BinaryField(null=True, blank=True, verbose_name=_('Remote IPs sketch'))
+
+    class Meta:
+        verbose_name = _('event rollup')
+        verbose_name_plural = _('event rollups')
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'period', 'start', 'key', 'subkey'],
+                                    name='activitylog_rollup_unique'),
+        ]
+
+
+class RollupWatermark(models.Model):
+    """``(inserted_at, id)`` of the last event of ``kind`` counted in the rollups."""
+    kind = models.CharField(max_length=10, primary_key=True, verbose_name=_('Event kind'))
+    datetime = models.DateTimeField(verbose_name=_('Date time'))
+    event_id = models.UUIDField(verbose_name=_('Event ID'))
+
+    class Meta:
+        verbose_name = _('rollup watermark')
+        verbose_name_plural = _('rollup watermarks')
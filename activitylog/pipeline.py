@@ -0,0 +1,208 @@
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from activitylog.utils import should_propagate_exceptions
+
+logger = logging.getLogger(__name__)
+
+
+class Sink:
+    """One backend of a :class:`PipelineBackend`, with its own buffer and metrics.
+
+    With ``batch_size == 1`` and no ``flush_interval`` events are written inline, in
+    the caller's thread. Otherwise they are queued and written by a background thread
+    of this sink, whenever ``batch_size`` events are pending or ``flush_interval``
+    seconds have passed. At most ``max_queue_size`` events are kept; further events
+    are dropped and counted, so a stalled sink never blocks the request path.
+    ``events`` restricts the sink to some event kinds ("crud", "login", "request", "cors").
+    """
+
+    def __init__(
+        self, backend, name=None, batch_size=1, flush_interval=0, max_queue_size=10000, events=None
+    ):
+        self.backend = backend
+        self.name = name or type(backend).__name__
+        self.events = frozenset(events) if events is not None else None
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = flush_interval or 0
+        self.max_queue_size = max_queue_size
+        self.buffered = self.batch_size > 1 or self.flush_interval > 0
+        self.stats = dict.fromkeys(
+            ("received", "written", "failed", "dropped", "flushes"), 0
+        )
+        self.stats["flush_seconds"] = 0.0
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    @classmethod
+    def from_settings(cls, config):
+        backend = import_string(config["BACKEND"])(**config.get("OPTIONS", {}))
+        return cls(
+            backend,
+            name=config.get("NAME"),
+            batch_size=config.get("BATCH_SIZE", 1),
+            flush_interval=config.get("FLUSH_INTERVAL", 0),
+            max_queue_size=config.get("MAX_QUEUE_SIZE", 10000),
+            events=config.get("EVENTS"),
+        )
+
+    def put(self, kind, infos):
+        """Hand events over to the sink. Returns the exception of a failed inline write."""
+        if not self.buffered:
+            with self._lock:
+                self.stats["received"] += len(infos)
+            return self._write([(kind, info) for info in infos])
+
+        with self._lock:
+            self.stats["received"] += len(infos)
+            room = max(self.max_queue_size - len(self._queue), 0)
+            self.stats["dropped"] += max(len(infos) - room, 0)
+            self._queue.extend((kind, info) for info in infos[:room])
+            full = len(self._queue) >= self.batch_size
+        self._ensure_worker()
+        if full:
+            self._wakeup.set()
+        return None
+
+    def flush(self):
+        """Write every queued event, in batches of ``batch_size``."""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    batch = [
+                        self._queue.popleft()
+                        for _ in range(min(self.batch_size, len(self._queue)))
+                    ]
+                if not batch:
+                    return
+                self._write(batch)
+
+    def metrics(self):
+        with self._lock:
+            return {**self.stats, "queued": len(self._queue)}
+
+    def _write(self, batch):
+        error = None
+        start = time.perf_counter()
+        # Consecutive events of the same kind go through the backend's bulk method.
+        for kind, items in groupby(batch, key=itemgetter(0)):
+            infos = [info for _, info in items]
+            try:
+                bulk = getattr(self.backend, f"bulk_{kind}", None)
+                if bulk is not None and len(infos) > 1:
+                    bulk(infos)
+                else:
+                    for info in infos:
+                        getattr(self.backend, kind)(info)
+            except Exception as e:
+                error = error or e
+                logger.exception(f"activity log sink {self.name} failed to write {len(infos)} {kind} event(s).")
+                with self._lock:
+                    self.stats["failed"] += len(infos)
+            else:
+                with self._lock:
+                    self.stats["written"] += len(infos)
+        with self._lock:
+            self.stats["flushes"] += 1
+            self.stats["flush_seconds"] += time.perf_counter() - start
+        return error
+
+    def _ensure_worker(self):
+        # A forked worker process does not inherit the thread of its parent.
+        if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(
+                target=self._run, name=f"activitylog-sink-{self.name}", daemon=True
+            )
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval or None)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # Database connections are per thread; do not keep this one open.
+                connections.close_all()
+
+
+class PipelineBackend:
+    """Fan every event out to the ordered sinks of ``DJANGO_ACTIVITY_LOG_PIPELINE_SINKS``.
+
+    A failing sink does not prevent the others from receiving the event. Events get
+    their ``id`` and ``datetime`` here, so every sink records the same values; the
+    event models keep the given ``datetime``, see ``EventDateTimeField``.
+    """
+
+    def __init__(self, sinks=None):
+        if sinks is None:
+            from activitylog.settings import PIPELINE_SINKS
+
+            sinks = [Sink.from_settings(config) for config in PIPELINE_SINKS]
+        self.sinks = list(sinks)
+        atexit.register(self.flush)
+
+    def _dispatch(self, kind, infos):
+        now = timezone.now()
+        infos = [{"id": uuid.uuid4(), "datetime": now, **info} for info in infos]
+        errors = [
+            sink.put(kind, infos)
+            for sink in self.sinks
+            if sink.events is None or kind in sink.events
+        ]
+        error = next((e for e in errors if e is not None), None)
+        if error is not None and should_propagate_exceptions():
+            raise error
+
+    def request(self, request_info):
+        self._dispatch("request", [request_info])
+
+    def bulk_request(self, request_infos):
+        self._dispatch("request", request_infos)
+
+    def cors(self, cors_info):
+        self._dispatch("cors", [cors_info])
+
+    def bulk_cors(self, cors_infos):
+        self._dispatch("cors", cors_infos)
+
+    def crud(self, crud_info):
+        self._dispatch("crud", [crud_info])
+
+    def bulk_crud(self, crud_infos):
+        self._dispatch("crud", crud_infos)
+
+    def login(self, login_info):
+        self._dispatch("login", [login_info])
+
+    def bulk_login(self, login_infos):
+        self._dispatch("login", login_infos)
+
+    def flush(self):
+        for sink in self.sinks:
+            if sink.buffered:
+                sink.flush()
+
+    def metrics(self):
+        """Counters of every sink, keyed by sink name."""
+        return {sink.name: sink.metrics() for sink in self.sinks}
@@ -0,0 +1,198 @@
+import json
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+from activitylog.models import CRUDCheckpoint, CRUDEvent, CRUDEventObject
+
+REPLAY_FIELDS = ("id", "event_type", "datetime", "object_json_repr", "changed_fields")
+
+
+def _get_content_type(model_or_content_type):
+    if isinstance(model_or_content_type, ContentType):
+        return model_or_content_type
+    return ContentType.objects.get_for_model(model_or_content_type)
+
+
+def _snapshot_fields(event, object_id=None):
+    """Return the ``fields`` of the serialized object, or None if there is no full snapshot.
+
+    Summary BULK_CREATE events serialize every created object, ``object_id`` selects one.
+    """
+    try:
+        objects = json.loads(event.object_json_repr)
+        if event.event_type == CRUDEvent.BULK_CREATE:
+            objects = [obj for obj in objects if str(obj["pk"]) == str(object_id)]
+        return dict(objects[0]["fields"])
+    except (ValueError, TypeError, LookupError):
+        return None
+
+
+def object_events(model_or_content_type, object_id):
+    """CRUD events of one object, including the summary bulk events that affected it.
+
+    The bulk events are first looked up among the
+    :class:`~activitylog.models.CRUDEventObject` rows, so that both queries use an
+    index on (content_type, object_id).
+    """
+    content_type = _get_content_type(model_or_content_type)
+    object_id = str(object_id)
+    events = CRUDEvent.objects.filter(content_type=content_type)
+    bulk_event_ids = list(
+        CRUDEventObject.objects.filter(content_type=content_type, object_id=object_id)
+        .values_list("event_id", flat=True)
+    )
+    if not bulk_event_ids:
+        return events.filter(object_id=object_id)
+    return events.filter(Q(object_id=object_id) | Q(pk__in=bulk_event_ids))
+
+
+def _is_base(event, object_id=None):
+    """Whether ``event`` fully determines the state, without looking at older events."""
+    return event.event_type in (CRUDEvent.CREATE, CRUDEvent.DELETE, CRUDEvent.BULK_DELETE) or (
+        _snapshot_fields(event, object_id) is not None
+    )
+
+
+def _changed_fields(event):
+    try:
+        data = json.loads(event.changed_fields or "null")
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def apply_event(fields, event, object_id=None):
+    """Apply a single CRUD event on top of ``fields`` and return the resulting state.
+
+    Full snapshots replace the state, deletions end it (None); summary bulk creations
+    give the fields of ``object_id``. Otherwise, the ``changed_fields`` delta is
+    applied: updates set the new value, which is stored as a string, and forward
+    many-to-many events add or remove related pks. Summary bulk updates set their
+    ``fields``; fields updated with an expression are left as they were.
+    """
+    if event.event_type in (CRUDEvent.DELETE, CRUDEvent.BULK_DELETE):
+        return None
+
+    snapshot = _snapshot_fields(event, object_id)
+    if snapshot is not None:
+        return snapshot
+    if fields is None:
+        return None
+
+    fields = dict(fields)
+    if event.event_type == CRUDEvent.BULK_UPDATE:
+        fields.update(_changed_fields(event).get("fields") or {})
+        return fields
+    for name, values in _changed_fields(event).items():
+        if event.event_type == CRUDEvent.UPDATE and isinstance(values, list) and len(values) == 2:
+            fields[name] = values[1]
+        elif event.event_type == CRUDEvent.M2M_ADD and isinstance(values, list):
+            fields[name] = list(dict.fromkeys([*fields.get(name, []), *values]))
+        elif event.event_type == CRUDEvent.M2M_REMOVE and isinstance(values, list):
+            fields[name] = [pk for pk in fields.get(name, []) if pk not in values]
+    return fields
+
+
+def _after(queryset, datetime, pk):
+    return queryset.filter(Q(datetime__gte=datetime) & (Q(datetime__gt=datetime) | Q(pk__gt=pk)))
+
+
+def _state(content_type, object_id, at=None, event_id=None):
+    events = object_events(content_type, object_id)
+    checkpoints = CRUDCheckpoint.objects.filter(
+        content_type=content_type, object_id=str(object_id)
+    )
+    if at is not None and event_id is not None:
+        events = events.filter(Q(datetime__lt=at) | Q(datetime=at, pk__lte=event_id))
+        checkpoints = checkpoints.filter(
+            Q(datetime__lt=at) | Q(datetime=at, event_id__lte=event_id)
+        )
+    elif at is not None:
+        events = events.filter(datetime__lte=at)
+        checkpoints = checkpoints.filter(datetime__lte=at)
+
+    checkpoint = checkpoints.order_by("-datetime", "-event_id").first()
+    state = None
+    if checkpoint is not None:
+        events = _after(events, checkpoint.datetime, checkpoint.event_id)
+        state = json.loads(checkpoint.fields)
+
+    pending = []
+    for event in events.only(*REPLAY_FIELDS).order_by("-datetime", "-pk").iterator(chunk_size=100):
+        pending.append(event)
+        if _is_base(event, object_id):
+            break
+
+    for event in reversed(pending):
+        state = apply_event(state, event, object_id)
+    return state
+
+
+def reconstruct(model_or_content_type, object_id, at=None):
+    """Rebuild the fields of an audited object as they were at ``at`` (default: now).
+
+    Starting from the most recent event at or before ``at``, events are read backwards
+    until one with a full snapshot is found, bounded by the nearest
+    :class:`~activitylog.models.CRUDCheckpoint`; the collected deltas are then replayed
+    forwards. Returns the fields dict, or None if the object did not exist at ``at``.
+    """
+    return _state(_get_content_type(model_or_content_type), object_id, at)
+
+
+def checkpoint_after(model_or_content_type, object_id, datetime, event_id):
+    """Unsaved checkpoint of the object right after its event ``event_id`` of ``datetime``.
+
+    Returns None if the object did not exist then.
+    """
+    content_type = _get_content_type(model_or_content_type)
+    state = _state(content_type, object_id, datetime, event_id)
+    if state is None:
+        return None
+    return CRUDCheckpoint(
+        content_type=content_type,
+        object_id=str(object_id),
+        event_id=event_id,
+        datetime=datetime,
+        fields=json.dumps(state, cls=DjangoJSONEncoder),
+    )
+
+
+def write_checkpoints(model_or_content_type, object_id, every):
+    """Write checkpoints so that no reconstruction of the object replays more than ``every`` events.
+
+    Only events newer than the latest existing checkpoint are read. Returns the number
+    of checkpoints created.
+    """
+    content_type = _get_content_type(model_or_content_type)
+    events = object_events(content_type, object_id)
+    last = (
+        CRUDCheckpoint.objects.filter(content_type=content_type, object_id=str(object_id))
+        .order_by("-datetime", "-event_id")
+        .first()
+    )
+    state = None
+    if last is not None:
+        events = _after(events, last.datetime, last.event_id)
+        state = json.loads(last.fields)
+
+    checkpoints = []
+    since_base = 0
+    for event in events.only(*REPLAY_FIELDS).order_by("datetime", "pk").iterator(chunk_size=500):
+        since_base = 0 if _is_base(event, object_id) else since_base + 1
+        state = apply_event(state, event, object_id)
+        if state is not None and since_base >= every:
+            checkpoints.append(
+                CRUDCheckpoint(
+                    content_type=content_type,
+                    object_id=str(object_id),
+                    event_id=event.pk,
+                    datetime=event.datetime,
+                    fields=json.dumps(state, cls=DjangoJSONEncoder),
+                )
+            )
+            since_base = 0
+
+    CRUDCheckpoint.objects.bulk_create(checkpoints, batch_size=500)
+    return len(checkpoints)
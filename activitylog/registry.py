@@ -0,0 +1,226 @@
+import hashlib
+import json
+from types import MappingProxyType
+
+from django.contrib.contenttypes.models import ContentType
+from django.core import serializers
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import router
+from django.utils.encoding import smart_str
+
+from activitylog import metrics
+from activitylog.utils import isolated, model_delta
+
+
+def _is_audited(model):
+    from activitylog.settings import REGISTERED_CLASSES, UNREGISTERED_CLASSES
+
+    # do not audit any model listed in UNREGISTERED_CLASSES
+    if any(issubclass(model, unregistered) for unregistered in UNREGISTERED_CLASSES):
+        return False
+
+    # only audit models listed in REGISTERED_CLASSES (if it's set)
+    if len(REGISTERED_CLASSES) > 0:
+        return any(issubclass(model, registered) for registered in REGISTERED_CLASSES)
+
+    return True
+
+
+def _get_field_spec(model):
+    """Audited, excluded and hashed field names of ``model``.
+
+    ``DJANGO_ACTIVITY_LOG_MODEL_FIELDS["app_label.ModelName"]`` takes precedence over an
+    ``ActivityLogMeta`` inner class declared on the model. Both accept ``fields``,
+    ``exclude_fields`` and ``hash_fields``.
+    """
+    from activitylog.settings import MODEL_FIELDS
+
+    spec = MODEL_FIELDS.get(model._meta.label, MODEL_FIELDS.get(model._meta.label_lower))
+    if spec is None:
+        meta = getattr(model, "ActivityLogMeta", None)
+        spec = {
+            key: getattr(meta, key)
+            for key in ("fields", "exclude_fields", "hash_fields")
+            if hasattr(meta, key)
+        }
+
+    for key in ("fields", "exclude_fields", "hash_fields"):
+        for name in spec.get(key) or ():
+            try:
+                model._meta.get_field(name)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(
+                    f"activitylog {key} of {model._meta.label} refers to unknown field '{name}'."
+                )
+    return spec
+
+
+def hash_value(value):
+    if value is None:
+        return None
+    return hashlib.sha256(smart_str(value).encode()).hexdigest()
+
+
+class ModelAuditPlan:
+    """Everything the signal handlers need to know about auditing one model.
+
+    Built once per model and read-only afterwards. The content type id is resolved on
+    first use, since the database must not be queried while apps are loading.
+    """
+
+    __slots__ = (
+        "model",
+        "audited",
+        "diff_fields",
+        "hash_fields",
+        "serialize_fields",
+        "m2m_field_names",
+        "m2m_fields",
+        "m2m_rev_fields",
+        "_content_type_id",
+    )
+
+    def __init__(self, model):
+        opts = model._meta
+        self.model = model
+        self.audited = _is_audited(model)
+
+        spec = _get_field_spec(model) if self.audited else {}
+        include = spec.get("fields")
+        exclude = set(spec.get("exclude_fields") or ())
+        hashed = set(spec.get("hash_fields") or ())
+
+        def selected(field):
+            return (include is None or field.name in include) and field.name not in exclude
+
+        # Concrete fields compared by pre_save; hashed fields are compared by digest.
+        self.diff_fields = tuple(
+            field for field in opts.fields if selected(field) and field.name not in hashed
+        )
+        self.hash_fields = tuple(
+            field for field in opts.fields if selected(field) and field.name in hashed
+        )
+        # Many-to-many fields the serializer dumps (auto-created through tables only).
+        self.m2m_field_names = tuple(
+            field.name
+            for field in opts.many_to_many
+            if field.remote_field.through._meta.auto_created and selected(field)
+        )
+        # Field names passed to the serializer; None serializes every field.
+        if include is None and not exclude and not hashed:
+            self.serialize_fields = None
+        else:
+            self.serialize_fields = tuple(
+                field.name for field in self.diff_fields if not field.primary_key
+            ) + self.m2m_field_names
+        # m2m_changed sender (the through model) -> name of the ManyToManyField,
+        # for relations declared on this model...
+        self.m2m_fields = MappingProxyType(
+            {field.remote_field.through: field.name for field in opts.many_to_many}
+        )
+        # ... and -> (field name, reverse accessor) for relations declared on other models.
+        self.m2m_rev_fields = MappingProxyType(
+            {
+                rel.through: (rel.remote_field.name, rel.get_accessor_name())
+                for rel in opts.related_objects
+                if rel.many_to_many and rel.auto_created
+            }
+        )
+        self._content_type_id = None
+
+    def __repr__(self):
+        return f"<ModelAuditPlan: {self.model._meta.label} audited={self.audited}>"
+
+    @property
+    def content_type_id(self):
+        if self._content_type_id is None:
+            # the first lookup may create the content type, inside the caller's transaction
+            with isolated(router.db_for_write(ContentType)):
+                self._content_type_id = ContentType.objects.get_for_model(self.model).id
+        return self._content_type_id
+
+    @property
+    def loaded_field_names(self):
+        """Names of the fields needed to diff an instance, for ``QuerySet.only()``."""
+        names = [field.name for field in self.diff_fields + self.hash_fields]
+        return names or [self.model._meta.pk.name]
+
+    def serialize(self, instance):
+        return self.serialize_many([instance])
+
+    def serialize_many(self, instances):
+        with metrics.serialize_seconds.time():
+            if not self.hash_fields:
+                return serializers.serialize("json", instances, fields=self.serialize_fields)
+            return json.dumps(self._serialize_python(instances), cls=DjangoJSONEncoder)
+
+    def serialize_python(self, instance):
+        with metrics.serialize_seconds.time():
+            return self._serialize_python([instance])
+
+    def _serialize_python(self, instances):
+        data = serializers.serialize("python", instances, fields=self.serialize_fields)
+        for item, instance in zip(data, instances):
+            for field in self.hash_fields:
+                item["fields"][field.name] = hash_value(field.value_from_object(instance))
+        return data
+
+    def diff(self, old_instance, new_instance):
+        delta = model_delta(old_instance, new_instance, fields=self.diff_fields) or {}
+        for field in self.hash_fields:
+            old_value = hash_value(field.value_from_object(old_instance))
+            new_value = hash_value(field.value_from_object(new_instance))
+            if old_value != new_value:
+                delta[field.name] = [old_value, new_value]
+        return delta or None
+
+    def as_dict(self):
+        return {
+            "model": self.model._meta.label,
+            "audited": self.audited,
+            "diff_fields": [field.name for field in self.diff_fields],
+            "hash_fields": [field.name for field in self.hash_fields],
+            "serialize_fields": self.serialize_fields,
+            "m2m_fields": {through._meta.label: name for through, name in self.m2m_fields.items()},
+            "m2m_rev_fields": {
+                through._meta.label: list(names) for through, names in self.m2m_rev_fields.items()
+            },
+        }
+
+
+class AuditRegistry:
+    """Audit plans of all models, keyed by model class.
+
+    Populated by ``ActivitylogConfig.ready()``; models created later get their plan on
+    first use.
+    """
+
+    def __init__(self):
+        self._plans = {}
+
+    def __contains__(self, model):
+        return model in self._plans
+
+    def __iter__(self):
+        return iter(self._plans.values())
+
+    def __len__(self):
+        return len(self._plans)
+
+    def populate(self, models):
+        for model in models:
+            self._plans[model] = ModelAuditPlan(model)
+
+    def get_plan(self, model):
+        try:
+            return self._plans[model]
+        except KeyError:
+            plan = self._plans[model] = ModelAuditPlan(model)
+            return plan
+
+    def clear(self):
+        self._plans.clear()
+
+
+registry = AuditRegistry()
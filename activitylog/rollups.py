@@ -0,0 +1,271 @@
+"""Hourly and daily event counts, maintained incrementally.
+
+``rollup_activitylog`` counts the events written since its last run, from a watermark
+on their ``inserted_at`` kept per event kind, into :class:`~activitylog.models.EventRollup`. The functions at the
+end of this module read those counts, so a dashboard costs the same however much raw
+history is kept. Each rollup also keeps HyperLogLog sketches of the users and remote
+IPs of its events, which :func:`distinct` merges to estimate unique users or IPs.
+"""
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from activitylog.hyperloglog import HyperLogLog
+from activitylog.models import (
+    CRUDEvent,
+    EventRollup,
+    LoginEvent,
+    RequestEvent,
+    RollupWatermark,
+)
+from activitylog.settings import (
+    DATABASE_ALIAS,
+    ROLLUP_BATCH_SIZE,
+    ROLLUP_LAG,
+    ROLLUP_SKETCH_PRECISION,
+)
+
+HOUR = EventRollup.HOUR
+DAY = EventRollup.DAY
+
+# Event kind -> (model, fields read to compute the key and the subkey).
+ROLLUP_SOURCES = {
+    "request": (RequestEvent, ("url", "method")),
+    "login": (LoginEvent, ("username", "login_type")),
+    "crud": (CRUDEvent, ("content_type_id", "event_type")),
+}
+# Event fields counted by the user and IP sketches of every rollup.
+SKETCH_FIELDS = ("user_id", "remote_ip")
+
+
+def truncate(value, period):
+    """Start of the hour or day ``value`` falls in."""
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if period == DAY:
+        value = value.replace(hour=0)
+    return value
+
+
+def _keys(kind, fields):
+    if kind == "crud":
+        content_type_id, event_type = fields
+        content_type = ContentType.objects.get_for_id(content_type_id)
+        return f"{content_type.app_label}.{content_type.model}", str(event_type)
+    key, subkey = fields
+    return (key or "")[:255], str(subkey or "")
+
+
+def _merge_sketch(data, sketch):
+    if sketch is None:
+        return data
+    if data is not None:
+        sketch.merge(HyperLogLog.from_bytes(data))
+    return sketch.to_bytes()
+
+
+def _add_counts(kind, counts, using):
+    """Add ``counts`` to the rollup rows.
+
+    ``counts`` maps ``(period, start, key, subkey)`` to ``[count, user sketch, IP sketch]``,
+    the sketches being None without users or IPs.
+    """
+    starts = {HOUR: set(), DAY: set()}
+    for period, start, _, _ in counts:
+        starts[period].add(start)
+    existing = EventRollup.objects.using(using).filter(kind=kind).filter(
+        Q(period=HOUR, start__gte=min(starts[HOUR]), start__lte=max(starts[HOUR]))
+        | Q(period=DAY, start__gte=min(starts[DAY]), start__lte=max(starts[DAY]))
+    )
+    rows = {
+        (row.period, row.start, row.key, row.subkey): row
+        for row in existing.select_for_update()
+    }
+    to_update = []
+    to_create = []
+    for (period, start, key, subkey), (count, users, ips) in counts.items():
+        row = rows.get((period, start, key, subkey))
+        if row is None:
+            row = EventRollup(kind=kind, period=period, start=start, key=key, subkey=subkey)
+            to_create.append(row)
+        else:
+            to_update.append(row)
+        row.count += count
+        row.user_sketch = _merge_sketch(row.user_sketch, users)
+        row.ip_sketch = _merge_sketch(row.ip_sketch, ips)
+    EventRollup.objects.using(using).bulk_update(
+        to_update, ["count", "user_sketch", "ip_sketch"], batch_size=500
+    )
+    EventRollup.objects.using(using).bulk_create(to_create, batch_size=500)
+
+
+def _count(kind, rows):
+    """Counts of ``rows`` as :func:`_add_counts` takes them."""
+    counts = {}
+    for event_datetime, user_id, remote_ip, *values in rows:
+        key, subkey = _keys(kind, values)
+        for period in (HOUR, DAY):
+            bucket = (period, truncate(event_datetime, period), key, subkey)
+            totals = counts.get(bucket)
+            if totals is None:
+                totals = counts[bucket] = [0, None, None]
+            totals[0] += 1
+            for position, value in ((1, user_id), (2, remote_ip)):
+                if value is not None:
+                    if totals[position] is None:
+                        totals[position] = HyperLogLog(ROLLUP_SKETCH_PRECISION)
+                    totals[position].add(value)
+    return counts
+
+
+def update_rollups(kind, batch_size=None, lag=None, using=None):
+    """Count the events of ``kind`` inserted after its watermark. Returns how many were counted.
+
+    Events are read in ``(inserted_at, id)`` order, ``batch_size`` at a time, each batch
+    and the new watermark being written in one transaction, and counted in the periods
+    of their ``datetime``. Events written late with an older ``datetime``, e.g. by the
+    segment or queue backends or replayed from a spool, are thus still counted. Events
+    inserted less than ``lag`` seconds ago are left for the next run, as their
+    transaction may not be committed yet.
+    """
+    using = using or DATABASE_ALIAS
+    batch_size = batch_size or ROLLUP_BATCH_SIZE
+    lag = ROLLUP_LAG if lag is None else lag
+    model, fields = ROLLUP_SOURCES[kind]
+    cutoff = timezone.now() - timedelta(seconds=lag)
+    total = 0
+    while True:
+        with transaction.atomic(using=using):
+            watermark = (
+                RollupWatermark.objects.using(using).select_for_update().filter(kind=kind).first()
+            )
+            events = model.objects.using(using).filter(inserted_at__lt=cutoff)
+            if watermark is not None:
+                events = events.filter(inserted_at__gte=watermark.datetime).filter(
+                    Q(inserted_at__gt=watermark.datetime) | Q(id__gt=watermark.event_id)
+                )
+            rows = list(
+                events.order_by("inserted_at", "id").values_list(
+                    "inserted_at", "id", "datetime", *SKETCH_FIELDS, *fields
+                )[:batch_size]
+            )
+            if not rows:
+                return total
+
+            _add_counts(kind, _count(kind, [row[2:] for row in rows]), using)
+            last_inserted_at, last_id = rows[-1][:2]
+            RollupWatermark.objects.using(using).update_or_create(
+                kind=kind, defaults={"datetime": last_inserted_at, "event_id": last_id}
+            )
+        total += len(rows)
+        if len(rows) < batch_size:
+            return total
+
+
+def rebuild_rollups(kind, since, batch_size=None, using=None):
+    """Count the events of ``kind`` from the day of ``since`` on again. Returns how many.
+
+    Only the events the watermark has passed are recounted, the next
+    :func:`update_rollups` counts the others.
+    """
+    using = using or DATABASE_ALIAS
+    batch_size = batch_size or ROLLUP_BATCH_SIZE
+    model, fields = ROLLUP_SOURCES[kind]
+    since = truncate(since, DAY)
+    total = 0
+    with transaction.atomic(using=using):
+        watermark = (
+            RollupWatermark.objects.using(using).select_for_update().filter(kind=kind).first()
+        )
+        EventRollup.objects.using(using).filter(kind=kind, start__gte=since).delete()
+        if watermark is None:
+            return total
+        events = model.objects.using(using).filter(datetime__gte=since).filter(
+            Q(inserted_at__lt=watermark.datetime)
+            | Q(inserted_at=watermark.datetime, id__lte=watermark.event_id)
+        )
+        rows = events.values_list("datetime", *SKETCH_FIELDS, *fields).iterator(
+            chunk_size=batch_size
+        )
+        while batch := list(islice(rows, batch_size)):
+            _add_counts(kind, _count(kind, batch), using)
+            total += len(batch)
+    return total
+
+
+def _rollups(kind, period, start, end, key, subkey, using):
+    rollups = EventRollup.objects.using(using or DATABASE_ALIAS).filter(kind=kind, period=period)
+    if start is not None:
+        rollups = rollups.filter(start__gte=truncate(start, period))
+    if end is not None:
+        rollups = rollups.filter(start__lt=end)
+    if key is not None:
+        rollups = rollups.filter(key=key)
+    if subkey is not None:
+        rollups = rollups.filter(subkey=subkey)
+    return rollups
+
+
+def series(kind, period=HOUR, start=None, end=None, key=None, subkey=None, using=None):
+    """``[(period start, count)]`` of the events of ``kind``, oldest first.
+
+    Periods without events are left out. ``start`` and ``end`` bound the period starts;
+    ``key`` and ``subkey`` restrict the count to some events, e.g. one URL.
+    """
+    rollups = _rollups(kind, period, start, end, key, subkey, using)
+    return list(
+        rollups.values("start").annotate(total=Sum("count")).order_by("start").values_list(
+            "start", "total"
+        )
+    )
+
+
+def top(kind, period=DAY, start=None, end=None, subkey=None, limit=10, using=None):
+    """``[(key, count)]`` of the most frequent keys of ``kind`` over the periods."""
+    rollups = _rollups(kind, period, start, end, None, subkey, using)
+    return list(
+        rollups.values("key")
+        .annotate(total=Sum("count"))
+        .order_by("-total", "key")
+        .values_list("key", "total")[:limit]
+    )
+
+
+def distinct(kind, field, period=DAY, start=None, end=None, key=None, subkey=None, using=None):
+    """Estimated number of distinct ``field`` ("users" or "ips") of the events of ``kind``.
+
+    The sketches of the rollups selected as in :func:`series` are merged, so e.g. the
+    unique users of a URL over a week are read from 7 daily rollups per method.
+    """
+    column = {"users": "user_sketch", "ips": "ip_sketch"}[field]
+    rollups = _rollups(kind, period, start, end, key, subkey, using).exclude(**{column: None})
+    sketch = HyperLogLog(ROLLUP_SKETCH_PRECISION)
+    for data in rollups.values_list(column, flat=True).iterator():
+        sketch.merge(HyperLogLog.from_bytes(data))
+    return sketch.estimate()
+
+
+def unique_users(kind, period=DAY, start=None, end=None, key=None, using=None):
+    return distinct(kind, "users", period, start, end, key=key, using=using)
+
+
+def unique_ips(kind, period=DAY, start=None, end=None, key=None, using=None):
+    return distinct(kind, "ips", period, start, end, key=key, using=using)
+
+
+def requests_per_url(period=HOUR, start=None, end=None, limit=10, using=None):
+    return top("request", period, start, end, limit=limit, using=using)
+
+
+def failed_logins(period=DAY, start=None, end=None, username=None, using=None):
+    return series(
+        "login", period, start, end, key=username, subkey=str(LoginEvent.FAILED), using=using
+    )
+
+
+def crud_events_per_model(period=DAY, start=None, end=None, event_type=None, limit=10, using=None):
+    subkey = str(event_type) if event_type is not None else None
+    return top("crud", period, start, end, subkey=subkey, limit=limit, using=using)
@@ -0,0 +1,45 @@
+from django.db import router
+
+from activitylog.settings import DATABASE_ALIAS
+
+APP_LABEL = "activitylog"
+
+
+def _is_activitylog(model_or_instance):
+    return model_or_instance is not None and model_or_instance._meta.app_label == APP_LABEL
+
+
+class ActivityLogRouter:
+    """Keep every activitylog table on ``DJANGO_ACTIVITY_LOG_DATABASE_ALIAS``.
+
+    Users and content types referenced by events stay where the other routers put
+    them; the event foreign keys have no database constraint. List this router first
+    in ``DATABASE_ROUTERS``.
+    """
+
+    def _db_for_related(self, model, hints, db_for):
+        # Without this, Django would look users and content types up on the
+        # database of the event they are accessed from.
+        if _is_activitylog(hints.get("instance")):
+            return db_for(model)
+        return None
+
+    def db_for_read(self, model, **hints):
+        if _is_activitylog(model):
+            return DATABASE_ALIAS
+        return self._db_for_related(model, hints, router.db_for_read)
+
+    def db_for_write(self, model, **hints):
+        if _is_activitylog(model):
+            return DATABASE_ALIAS
+        return self._db_for_related(model, hints, router.db_for_write)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if _is_activitylog(obj1) or _is_activitylog(obj2):
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if app_label == APP_LABEL:
+            return db == DATABASE_ALIAS
+        return None
@@ -0,0 +1,190 @@
+import atexit
+import contextlib
+import gzip
+import json
+import os
+import threading
+import time
+import uuid
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+# A segment is written under OPEN_SUFFIX and renamed once it is closed, so readers
+# never see a partially written segment.
+OPEN_SUFFIX = ".open"
+SEGMENT_PREFIX = "activitylog-"
+
+FSYNC_NEVER = "never"
+FSYNC_SEGMENT = "segment"
+FSYNC_ALWAYS = "always"
+
+
+class SegmentBackend:
+    """Append events to size and time rotated JSON lines segment files.
+
+    Every process writes its own segment at a time, named after its pid, and rotates
+    it once it holds ``max_bytes`` bytes or is ``max_age`` seconds old. ``fsync`` is
+    ``"never"``, ``"segment"`` (when a segment is closed) or ``"always"`` (after every
+    write). Closed segments are loaded into the event tables by the
+    ``ingest_activitylog_segments`` management command.
+    """
+
+    # Hand every write to the OS, so it survives the process if not the machine.
+    flush_writes = False
+
+    def __init__(self, directory=None, max_bytes=None, max_age=None, compress=None, fsync=None):
+        from activitylog import settings as activitylog_settings
+
+        self.directory = directory or activitylog_settings.SEGMENT_DIR
+        if not self.directory:
+            raise ValueError("SegmentBackend needs a directory (DJANGO_ACTIVITY_LOG_SEGMENT_DIR).")
+        self.max_bytes = max_bytes or activitylog_settings.SEGMENT_MAX_BYTES
+        self.max_age = max_age or activitylog_settings.SEGMENT_MAX_AGE
+        self.compress = activitylog_settings.SEGMENT_COMPRESS if compress is None else compress
+        self.fsync = fsync or activitylog_settings.SEGMENT_FSYNC
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._raw = None
+        self._file = None
+        self._path = None
+        self._opened_at = 0
+        self._pid = None
+        self._size = 0
+        self._sequence = 0
+        atexit.register(self.close)
+
+    def _open(self):
+        self._sequence += 1
+        name = (
+            f"{SEGMENT_PREFIX}{timezone.now():%Y%m%dT%H%M%S}-{os.getpid()}-{self._sequence}.jsonl"
+        )
+        if self.compress:
+            name += ".gz"
+        self._path = os.path.join(self.directory, name)
+        self._raw = open(self._path + OPEN_SUFFIX, "ab")
+        self._file = gzip.GzipFile(fileobj=self._raw, mode="ab") if self.compress else self._raw
+        self._opened_at = time.monotonic()
+        self._pid = os.getpid()
+        self._size = 0
+
+    def _sync(self):
+        self._file.flush()
+        if self._file is not self._raw:
+            self._raw.flush()
+        os.fsync(self._raw.fileno())
+
+    def _close(self):
+        if self._file is None:
+            return
+        if self._file is not self._raw:
+            self._file.close()
+        if self.fsync != FSYNC_NEVER:
+            self._raw.flush()
+            os.fsync(self._raw.fileno())
+        self._raw.close()
+        # the segment may already have been recovered by ``closed_segments``
+        with contextlib.suppress(FileNotFoundError):
+            os.replace(self._path + OPEN_SUFFIX, self._path)
+        self._raw = self._file = self._path = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _write(self, event, infos):
+        now = timezone.now()
+        data = "".join(
+            json.dumps(
+                {"event": event, "id": uuid.uuid4(), "datetime": now, **info}, cls=DjangoJSONEncoder
+            )
+            + "\n"
+            for info in infos
+        ).encode()
+        with self._lock:
+            # A forked process must not keep writing the segment of its parent.
+            if self._file is not None and self._pid != os.getpid():
+                self._raw = self._file = self._path = None
+            # Nothing is appended to a segment after max_age, so segments idle for longer
+            # can safely be recovered, see closed_segments().
+            if self._file is not None and time.monotonic() - self._opened_at >= self.max_age:
+                self._close()
+            if self._file is None:
+                self._open()
+            self._file.write(data)
+            self._size += len(data)
+            if self.fsync == FSYNC_ALWAYS:
+                self._sync()
+            else:
+                if self._file is not self._raw:
+                    self._file.flush()
+                if self.flush_writes:
+                    self._raw.flush()
+            if self._size >= self.max_bytes or time.monotonic() - self._opened_at >= self.max_age:
+                self._close()
+
+    def request(self, request_info):
+        self._write("request", [request_info])
+
+    def bulk_request(self, request_infos):
+        self._write("request", request_infos)
+
+    def cors(self, cors_info):
+        self._write("cors", [cors_info])
+
+    def bulk_cors(self, cors_infos):
+        self._write("cors", cors_infos)
+
+    def crud(self, crud_info):
+        self._write("crud", [crud_info])
+
+    def bulk_crud(self, crud_infos):
+        self._write("crud", crud_infos)
+
+    def login(self, login_info):
+        self._write("login", [login_info])
+
+    def bulk_login(self, login_infos):
+        self._write("login", login_infos)
+
+
+def closed_segments(directory, recover_older_than=None):
+    """Paths of the closed segments in ``directory``, oldest first.
+
+    With ``recover_older_than`` (seconds), open segments not written to for that long,
+    e.g. left behind by a killed process, are closed first.
+    """
+    names = sorted(os.listdir(directory))
+    if recover_older_than is not None:
+        cutoff = time.time() - recover_older_than
+        for name in names:
+            path = os.path.join(directory, name)
+            if (
+                name.startswith(SEGMENT_PREFIX)
+                and name.endswith(OPEN_SUFFIX)
+                and os.path.getmtime(path) < cutoff
+            ):
+                os.replace(path, path[: -len(OPEN_SUFFIX)])
+        names = sorted(os.listdir(directory))
+
+    return [
+        os.path.join(directory, name)
+        for name in names
+        if name.startswith(SEGMENT_PREFIX) and name.endswith((".jsonl", ".jsonl.gz"))
+    ]
+
+
+def read_segment(path):
+    """Yield the events of a segment, skipping a truncated last line."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+        except EOFError:
+            # the process writing a compressed segment died before closing it
+            return
@@ -10,7 +10,10 @@ from django.contrib.sessions.models import Session
 from django.db.migrations import Migration
 from django.db.migrations.recorder import MigrationRecorder
 
-from activitylog.models import CRUDEvent, LoginEvent, RequestEvent, CorsEvent
+from activitylog.models import (
+    CRUDCheckpoint, CRUDEvent, CRUDEventObject, LoginEvent, RequestEvent, CorsEvent,
+    EventRollup, FlaggedRequest, RollupWatermark,
+)
 
 
 def get_model_list(class_list):
@@ -31,6 +34,49 @@ WATCH_MODEL_EVENTS = getattr(settings, "DJANGO_ACTIVITY_LOG_WATCH_MODEL_EVENTS",
 WATCH_REQUEST_EVENTS = getattr(settings, "DJANGO_ACTIVITY_LOG_WATCH_REQUEST_EVENTS", True)
 WATCH_CORS_EVENTS = getattr(settings, "DJANGO_ACTIVITY_LOG_WATCH_CORS_EVENTS", True)
 
+# When request events are written: "request", by a request_started receiver, or
+# "response", by ActivityLogMiddleware once the response is ready, which also records
+# the status code, duration, response size and number of queries of the request. In
+# "response" mode, REQUEST_EVENT_SLOW_MS keeps only requests taking at least that many
+# milliseconds and REQUEST_EVENT_NON_2XX only requests answered with a status outside
+# 2xx; with both, a request matching either is kept.
+REQUEST_EVENT_CAPTURE = getattr(settings, "DJANGO_ACTIVITY_LOG_REQUEST_EVENT_CAPTURE", "request")
+REQUEST_EVENT_SLOW_MS = getattr(settings, "DJANGO_ACTIVITY_LOG_REQUEST_EVENT_SLOW_MS", None)
+REQUEST_EVENT_NON_2XX = getattr(settings, "DJANGO_ACTIVITY_LOG_REQUEST_EVENT_NON_2XX", False)
+
+# activitylog.detector: with DETECTOR, ActivityLogMiddleware stores a FlaggedRequest for
+# every request taking DETECTOR_SLOW_MS milliseconds or more, running DETECTOR_MAX_QUERIES
+# queries or more, or running one query shape DETECTOR_REPEATED_QUERIES times or more
+# (an N+1). The DETECTOR_TOP_QUERIES most repeated shapes are kept with it.
+DETECTOR = getattr(settings, "DJANGO_ACTIVITY_LOG_DETECTOR", False)
+DETECTOR_SLOW_MS = getattr(settings, "DJANGO_ACTIVITY_LOG_DETECTOR_SLOW_MS", 1000)
+DETECTOR_MAX_QUERIES = getattr(settings, "DJANGO_ACTIVITY_LOG_DETECTOR_MAX_QUERIES", 100)
+DETECTOR_REPEATED_QUERIES = getattr(settings, "DJANGO_ACTIVITY_LOG_DETECTOR_REPEATED_QUERIES", 10)
+DETECTOR_TOP_QUERIES = getattr(settings, "DJANGO_ACTIVITY_LOG_DETECTOR_TOP_QUERIES", 5)
+
+# activitylog.login_failures: with LOGIN_FAILURE_TRACKER, failed logins are counted per
+# remote IP and per username over the last LOGIN_FAILURE_WINDOW seconds, split in
+# LOGIN_FAILURE_BUCKETS sub-windows. Counters are kept in process, or in the Django
+# cache LOGIN_FAILURE_CACHE to share them between processes. Once an IP or username
+# reaches LOGIN_FAILURE_LOCKOUT_THRESHOLD failures, every further failure calls
+# LOGIN_FAILURE_LOCKOUT_HANDLER (a dotted path), see activitylog.login_failures. IPs are
+# taken from REMOTE_ADDR, or behind LOGIN_FAILURE_TRUSTED_PROXIES reverse proxies from that
+# entry from the right of X-Forwarded-For; REMOTE_ADDR_HEADER may be set by the client.
+LOGIN_FAILURE_TRACKER = getattr(settings, "DJANGO_ACTIVITY_LOG_LOGIN_FAILURE_TRACKER", False)
+LOGIN_FAILURE_WINDOW = getattr(settings, "DJANGO_ACTIVITY_LOG_LOGIN_FAILURE_WINDOW", 300)
+LOGIN_FAILURE_BUCKETS = getattr(settings, "DJANGO_ACTIVITY_LOG_LOGIN_FAILURE_BUCKETS", 10)
+LOGIN_FAILURE_CACHE = getattr(settings, "DJANGO_ACTIVITY_LOG_LOGIN_FAILURE_CACHE", None)
+LOGIN_FAILURE_MAX_KEYS = getattr(settings, "DJANGO_ACTIVITY_LOG_LOGIN_FAILURE_MAX_KEYS", 100000)
+LOGIN_FAILURE_LOCKOUT_THRESHOLD = getattr(
+    settings, "DJANGO_ACTIVITY_LOG_LOGIN_FAILURE_LOCKOUT_THRESHOLD", None
+)
+LOGIN_FAILURE_LOCKOUT_HANDLER = getattr(
+    settings, "DJANGO_ACTIVITY_LOG_LOGIN_FAILURE_LOCKOUT_HANDLER", None
+)
+LOGIN_FAILURE_TRUSTED_PROXIES = getattr(
+    settings, "DJANGO_ACTIVITY_LOG_LOGIN_FAILURE_TRUSTED_PROXIES", 0
+)
+
 X_FORWARDED_FOR = getattr(settings, "DJANGO_ACTIVITY_LOG_REMOTE_ADDR_HEADER", 'HTTP_X_FORWARDED_FOR')
 if X_FORWARDED_FOR:
     REMOTE_ADDR_HEADER = X_FORWARDED_FOR.split(',')[0].strip()
@@ -48,15 +94,30 @@ LOGGING_BACKEND = getattr(
     settings, "DJANGO_ACTIVITY_LOG_LOGGING_BACKEND", "activitylog.backends.ModelBackend"
 )
 
+# Ordered sinks of activitylog.pipeline.PipelineBackend. Each sink is a dict with a
+# "BACKEND" path and optional "OPTIONS", "NAME", "BATCH_SIZE", "FLUSH_INTERVAL" (seconds),
+# "MAX_QUEUE_SIZE" and "EVENTS" (event kinds it receives). Sinks with a batch size of 1
+# and no flush interval write inline.
+PIPELINE_SINKS = getattr(
+    settings,
+    "DJANGO_ACTIVITY_LOG_PIPELINE_SINKS",
+    [{"BACKEND": "activitylog.backends.ModelBackend"}],
+)
+
 # Models which Django Activity Log will not log.
 # By default, all but some models will be audited.
 # The list of excluded models can be overwritten or extended
 # by defining the following settings in the project.
 UNREGISTERED_CLASSES = [
     CRUDEvent,
+    CRUDCheckpoint,
+    CRUDEventObject,
     LoginEvent,
     RequestEvent,
     CorsEvent,
+    FlaggedRequest,
+    EventRollup,
+    RollupWatermark,
     Migration,
     Session,
     Permission,
@@ -240,4 +301,119 @@ CORS_EVENT_SEARCH_FIELDS = getattr(
 
 READONLY_EVENTS = getattr(settings, "DJANGO_ACTIVITY_LOG_READONLY_EVENTS", False)
 
+# Opt-in keyset (seek) pagination for the event changelists. Pages are located by
+# a (datetime, id) cursor instead of OFFSET, so deep pages are as cheap as the first
+# one. Column sorting is disabled and the total row count is not computed.
+ADMIN_KEYSET_PAGINATION = getattr(
+    settings, "DJANGO_ACTIVITY_LOG_ADMIN_KEYSET_PAGINATION", False
+)
+
 GEOIP_PATH = os.path.join('local/GeoLite2-City.mmdb')
+
+# Seconds the per-object event count shown by CRUDHistoryAdminMixin.crud_history_link
+# is cached for.
+CRUD_HISTORY_COUNT_CACHE_TIMEOUT = getattr(
+    settings, "DJANGO_ACTIVITY_LOG_CRUD_HISTORY_COUNT_CACHE_TIMEOUT", 300
+)
+
+# How AuditQuerySetMixin records bulk_create, update and delete:
+# "rows" writes one CRUD event per affected row with a single bulk insert,
+# "summary" writes one BULK_* event listing the affected primary keys in object_ids.
+BULK_EVENTS = getattr(settings, "DJANGO_ACTIVITY_LOG_BULK_EVENTS", "rows")
+
+# Reverse many-to-many events record only the pks added or removed ("m2m_rev_pk_set").
+# When enabled, the full list of related pks ("m2m_rev_pks") is read and stored as
+# well, which costs one query over the whole membership per change.
+M2M_REV_SNAPSHOT = getattr(settings, "DJANGO_ACTIVITY_LOG_M2M_REV_SNAPSHOT", False)
+
+# Per-model field selection for serialization and diffs, keyed by "app_label.ModelName":
+#   {"blog.Post": {"exclude_fields": ["body"], "hash_fields": ["api_token"]}}
+# "fields" restricts auditing to the listed fields, "exclude_fields" skips fields and
+# "hash_fields" stores a SHA-256 digest instead of the value. Models may instead declare
+# the same attributes on an inner ``ActivityLogMeta`` class.
+MODEL_FIELDS = getattr(settings, "DJANGO_ACTIVITY_LOG_MODEL_FIELDS", {})
+
+# activitylog.segments.SegmentBackend: directory of the segment files, rotation size
+# (bytes) and age (seconds), gzip compression and fsync policy ("never", "segment" or
+# "always").
+SEGMENT_DIR = getattr(settings, "DJANGO_ACTIVITY_LOG_SEGMENT_DIR", None)
+SEGMENT_MAX_BYTES = getattr(settings, "DJANGO_ACTIVITY_LOG_SEGMENT_MAX_BYTES", 64 * 1024 * 1024)
+SEGMENT_MAX_AGE = getattr(settings, "DJANGO_ACTIVITY_LOG_SEGMENT_MAX_AGE", 300)
+SEGMENT_COMPRESS = getattr(settings, "DJANGO_ACTIVITY_LOG_SEGMENT_COMPRESS", False)
+SEGMENT_FSYNC = getattr(settings, "DJANGO_ACTIVITY_LOG_SEGMENT_FSYNC", "segment")
+
+# activitylog.taskqueue.QueueBackend: broker class and its options, and the defaults
+# of the run_activitylog_worker command.
+QUEUE_BROKER = getattr(
+    settings, "DJANGO_ACTIVITY_LOG_QUEUE_BROKER", "activitylog.taskqueue.SQLiteBroker"
+)
+QUEUE_BROKER_OPTIONS = getattr(settings, "DJANGO_ACTIVITY_LOG_QUEUE_BROKER_OPTIONS", {})
+QUEUE_WORKER_CONCURRENCY = getattr(settings, "DJANGO_ACTIVITY_LOG_QUEUE_WORKER_CONCURRENCY", 1)
+QUEUE_BATCH_SIZE = getattr(settings, "DJANGO_ACTIVITY_LOG_QUEUE_BATCH_SIZE", 500)
+# Attempts after which the worker moves a job it cannot write to the broker's dead letters.
+QUEUE_MAX_ATTEMPTS = getattr(settings, "DJANGO_ACTIVITY_LOG_QUEUE_MAX_ATTEMPTS", 5)
+
+# Database alias the admin reads events from, e.g. a read replica of DATABASE_ALIAS.
+# None reads from the database chosen by the routers.
+ADMIN_DATABASE_ALIAS = getattr(settings, "DJANGO_ACTIVITY_LOG_ADMIN_DATABASE_ALIAS", None)
+
+# Counters and histograms of activitylog.metrics. With METRICS_DIR set, every process
+# writes its values there every METRICS_WRITE_INTERVAL seconds, so the metrics view and
+# the activitylog_stats command report all gunicorn workers together. METRICS_TOKEN,
+# when set, is the bearer token the metrics view requires.
+METRICS = getattr(settings, "DJANGO_ACTIVITY_LOG_METRICS", True)
+METRICS_DIR = getattr(settings, "DJANGO_ACTIVITY_LOG_METRICS_DIR", None)
+METRICS_WRITE_INTERVAL = getattr(settings, "DJANGO_ACTIVITY_LOG_METRICS_WRITE_INTERVAL", 5)
+METRICS_TOKEN = getattr(settings, "DJANGO_ACTIVITY_LOG_METRICS_TOKEN", None)
+
+# Break the time and queries spent in the activity log down per request: in a
+# Server-Timing response header set by ActivityLogMiddleware, and/or in a JSON log line
+# of the "activitylog.request_cost" logger.
+SERVER_TIMING = getattr(settings, "DJANGO_ACTIVITY_LOG_SERVER_TIMING", False)
+REQUEST_COST_LOG = getattr(settings, "DJANGO_ACTIVITY_LOG_REQUEST_COST_LOG", False)
+
+# activitylog.breaker.CircuitBreakerBackend: the backend it protects and when it opens.
+# A write is slow when it takes BREAKER_SLOW_CALL_SECONDS or more; the breaker opens
+# once, over the last BREAKER_WINDOW writes (and at least BREAKER_MIN_CALLS), the share
+# of slow writes reaches BREAKER_SLOW_CALL_RATE or the share of failed ones
+# BREAKER_ERROR_RATE. While open, events of the BREAKER_SHED_EVENTS kinds are sampled
+# ("sample", BREAKER_SAMPLE_RATE of them are written), dropped ("drop") or spooled
+# ("spool", see SPOOL_DIR). After BREAKER_COOLDOWN seconds it lets all events through
+# again to probe the backend.
+BREAKER_BACKEND = getattr(
+    settings, "DJANGO_ACTIVITY_LOG_BREAKER_BACKEND", "activitylog.backends.ModelBackend"
+)
+BREAKER_BACKEND_OPTIONS = getattr(settings, "DJANGO_ACTIVITY_LOG_BREAKER_BACKEND_OPTIONS", {})
+BREAKER_SLOW_CALL_SECONDS = getattr(settings, "DJANGO_ACTIVITY_LOG_BREAKER_SLOW_CALL_SECONDS", 0.25)
+BREAKER_SLOW_CALL_RATE = getattr(settings, "DJANGO_ACTIVITY_LOG_BREAKER_SLOW_CALL_RATE", 0.5)
+BREAKER_ERROR_RATE = getattr(settings, "DJANGO_ACTIVITY_LOG_BREAKER_ERROR_RATE", 0.5)
+BREAKER_WINDOW = getattr(settings, "DJANGO_ACTIVITY_LOG_BREAKER_WINDOW", 100)
+BREAKER_MIN_CALLS = getattr(settings, "DJANGO_ACTIVITY_LOG_BREAKER_MIN_CALLS", 10)
+BREAKER_COOLDOWN = getattr(settings, "DJANGO_ACTIVITY_LOG_BREAKER_COOLDOWN", 30)
+BREAKER_SHED_EVENTS = getattr(
+    settings, "DJANGO_ACTIVITY_LOG_BREAKER_SHED_EVENTS", ["request", "cors"]
+)
+BREAKER_SHED_MODE = getattr(settings, "DJANGO_ACTIVITY_LOG_BREAKER_SHED_MODE", "sample")
+BREAKER_SAMPLE_RATE = getattr(settings, "DJANGO_ACTIVITY_LOG_BREAKER_SAMPLE_RATE", 0.1)
+
+# Local spool of the events that could not be written: failed writes, and events an
+# open circuit breaker sheds with BREAKER_SHED_MODE = "spool". Disabled unless
+# SPOOL_DIR is set. The spool files are segments (see SEGMENT_*) closed after
+# SPOOL_MAX_AGE seconds; replay_activitylog_spool writes them to the event tables.
+SPOOL_DIR = getattr(settings, "DJANGO_ACTIVITY_LOG_SPOOL_DIR", None)
+SPOOL_MAX_AGE = getattr(settings, "DJANGO_ACTIVITY_LOG_SPOOL_MAX_AGE", 60)
+SPOOL_FSYNC = getattr(settings, "DJANGO_ACTIVITY_LOG_SPOOL_FSYNC", "segment")
+
+# rollup_activitylog: events inserted less than ROLLUP_LAG seconds ago are left for the
+# next run, so that rows still being committed are not skipped; ROLLUP_BATCH_SIZE events are counted
+# per transaction. The distinct users and IPs of each rollup are estimated with
+# HyperLogLog sketches of 2 ** ROLLUP_SKETCH_PRECISION registers (4 to 16): counts up to
+# registers / 8 are exact, larger ones have a standard error of 1.04 / sqrt(registers).
+ROLLUP_LAG = getattr(settings, "DJANGO_ACTIVITY_LOG_ROLLUP_LAG", 60)
+ROLLUP_BATCH_SIZE = getattr(settings, "DJANGO_ACTIVITY_LOG_ROLLUP_BATCH_SIZE", 5000)
+ROLLUP_SKETCH_PRECISION = getattr(settings, "DJANGO_ACTIVITY_LOG_ROLLUP_SKETCH_PRECISION", 12)
+
+# archive_activitylog: events older than ARCHIVE_AFTER_DAYS days are moved to monthly
+# CSV.gz files under ARCHIVE_DIR, see activitylog.archive.
+ARCHIVE_DIR = getattr(settings, "DJANGO_ACTIVITY_LOG_ARCHIVE_DIR", None)
+ARCHIVE_AFTER_DAYS = getattr(settings, "DJANGO_ACTIVITY_LOG_ARCHIVE_AFTER_DAYS", None)
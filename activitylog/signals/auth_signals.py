@@ -1,21 +1,21 @@
 import contextlib
 
 from django.contrib.auth import get_user_model, signals
-from django.db import transaction
-from django.utils.module_loading import import_string
 from activitylog.middleware.middleware import get_current_request, set_local_details
 from activitylog.models import LoginEvent
 from django.contrib.gis.geoip2 import GeoIP2
 
+from activitylog import login_failures, metrics
+from activitylog.backends import get_audit_logger
 from activitylog.settings import (
     DATABASE_ALIAS,
-    LOGGING_BACKEND,
+    LOGIN_FAILURE_TRACKER,
     REMOTE_ADDR_HEADER,
     WATCH_AUTH_EVENTS, HTTP_SEC_CH_UA, HTTP_SEC_CH_UA_PLATFORM, GNOME_SHELL_SESSION_MODE,
 )
-from activitylog.utils import should_propagate_exceptions
+from activitylog.utils import isolated, should_propagate_exceptions
 
-audit_logger = import_string(LOGGING_BACKEND)()
+audit_logger = get_audit_logger()
 
 
 def get_user_auth_location():
@@ -33,13 +33,15 @@ def get_user_auth_location():
     return remote_ip, browser, platform, operating_system
 
 
+@metrics.timed("user_logged_in")
 def user_logged_in(sender, request, user, **kwargs):
     remote_ip, browser, platform, operating_system = get_user_auth_location()
     try:
-        g = GeoIP2()
-        lat, long = g.lat_lon(remote_ip)
-        city = g.city(remote_ip)
-        country = g.country(remote_ip)
+        with metrics.geoip_seconds.time():
+            g = GeoIP2()
+            lat, long = g.lat_lon(remote_ip)
+            city = g.city(remote_ip)
+            country = g.country(remote_ip)
     except Exception:
         lat = None
         long = None
@@ -49,7 +51,7 @@ def user_logged_in(sender, request, user, **kwargs):
     print(remote_ip, "remote ip has been printed !!")
 
     try:
-        with transaction.atomic(using=DATABASE_ALIAS):
+        with isolated(DATABASE_ALIAS):
             audit_logger.login(
                 {
                     "login_type": LoginEvent.LOGIN,
@@ -66,13 +68,15 @@ def user_logged_in(sender, request, user, **kwargs):
                 }
             )
     except Exception:
+        metrics.failures.inc("user_logged_in")
         if should_propagate_exceptions():
             raise
 
 
+@metrics.timed("user_logged_out")
 def user_logged_out(sender, request, user, **kwargs):
     try:
-        with transaction.atomic(using=DATABASE_ALIAS):
+        with isolated(DATABASE_ALIAS):
             audit_logger.login(
                 {
                     "login_type": LoginEvent.LOGOUT,
@@ -85,13 +89,15 @@ def user_logged_out(sender, request, user, **kwargs):
                 }
             )
     except Exception:
+        metrics.failures.inc("user_logged_out")
         if should_propagate_exceptions():
             raise
 
 
+@metrics.timed("user_login_failed")
 def user_login_failed(sender, credentials, **kwargs):
     try:
-        with transaction.atomic(using=DATABASE_ALIAS):
+        with isolated(DATABASE_ALIAS):
             request = get_current_request()
             user_model = get_user_model()
             audit_logger.login(
@@ -106,6 +112,29 @@ def user_login_failed(sender, credentials, **kwargs):
             )
             # print()
     except Exception:
+        metrics.failures.inc("user_login_failed")
+        if should_propagate_exceptions():
+            raise
+
+
+@metrics.timed("login_failure_tracker")
+def track_login_failure(sender, credentials, request=None, **kwargs):
+    try:
+        request = request or get_current_request()
+        remote_ip = login_failures.client_ip(request)
+        username = credentials.get(get_user_model().USERNAME_FIELD)
+        login_failures.record_failure(request, ip=remote_ip, username=username)
+    except Exception:
+        metrics.failures.inc("login_failure_tracker")
+        if should_propagate_exceptions():
+            raise
+
+
+def reset_login_failures(sender, request, user, **kwargs):
+    try:
+        login_failures.reset_failures(username=getattr(user, user.USERNAME_FIELD))
+    except Exception:
+        metrics.failures.inc("login_failure_tracker")
         if should_propagate_exceptions():
             raise
 
@@ -120,3 +149,11 @@ if WATCH_AUTH_EVENTS:
     signals.user_login_failed.connect(
         user_login_failed, dispatch_uid="activity_log_signals_login_failed"
     )
+
+if LOGIN_FAILURE_TRACKER:
+    signals.user_login_failed.connect(
+        track_login_failure, dispatch_uid="activity_log_signals_track_login_failure"
+    )
+    signals.user_logged_in.connect(
+        reset_login_failures, dispatch_uid="activity_log_signals_reset_login_failures"
+    )
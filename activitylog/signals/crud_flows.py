@@ -1,23 +1,20 @@
 import contextlib
-import json
 import logging
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
-from django.contrib.contenttypes.models import ContentType
 from django.contrib.gis.geoip2 import GeoIP2
-from django.core.serializers.json import DjangoJSONEncoder
-from django.db import transaction
 from django.utils import timezone
-from django.utils.module_loading import import_string
 from activitylog.middleware.middleware import get_current_user, get_current_request, set_local_details
-from activitylog.models import CRUDEvent
-from activitylog.settings import DATABASE_ALIAS, LOGGING_BACKEND, REMOTE_ADDR_HEADER, HTTP_SEC_CH_UA, \
+from activitylog import metrics
+from activitylog.backends import get_audit_logger
+from activitylog.settings import DATABASE_ALIAS, REMOTE_ADDR_HEADER, HTTP_SEC_CH_UA, \
     HTTP_SEC_CH_UA_PLATFORM, GNOME_SHELL_SESSION_MODE
-from activitylog.utils import get_m2m_field_name, should_propagate_exceptions
+from activitylog.registry import registry
+from activitylog.utils import isolated, should_propagate_exceptions
 
 logger = logging.getLogger(__name__)
-audit_logger = import_string(LOGGING_BACKEND)()
+audit_logger = get_audit_logger()
 
 
 def get_current_user_details():
@@ -50,108 +47,129 @@ def get_user_location():
     return remote_ip, browser, platform, operating_system
 
 
-def log_event(event_type, instance, object_json_repr, **kwargs):
+def get_event_context():
+    """User, client and location details shared by every CRUD event of the current request."""
     user_id, user_pk_as_string = get_current_user_details()
     remote_ip, browser, platform, operating_system = get_user_location()
 
     try:
-        g = GeoIP2()
-        lat, long = g.lat_lon(remote_ip)
-        city = g.city(remote_ip)
-        country = g.country(remote_ip)
+        with metrics.geoip_seconds.time():
+            g = GeoIP2()
+            lat, long = g.lat_lon(remote_ip)
+            city = g.city(remote_ip)
+            country = g.country(remote_ip)
     except Exception:
         lat = None
         long = None
         city = None
         country = None
 
-    with transaction.atomic(using=DATABASE_ALIAS):
+    return {
+        "user_id": user_id,
+        "remote_ip": remote_ip,
+        "browser": browser,
+        "platform": platform,
+        "latitude": lat,
+        "longitude": long,
+        "city": city,
+        "country": country,
+        "operating_system": operating_system,
+        "user_pk_as_string": user_pk_as_string,
+    }
+
+
+class CRUDEventRecord:
+    """One CRUD event waiting for its transaction to commit.
+
+    Everything the event needs from the instance is captured when the signal fires,
+    so the ``on_commit`` callback keeps no model instance alive: a long transaction
+    saving many rows only holds one small record per row. Calling the record writes
+    the event.
+    """
+
+    __slots__ = (
+        "signal",
+        "event_type",
+        "content_type_id",
+        "object_id",
+        "object_repr",
+        "object_json_repr",
+        "changed_fields",
+    )
+
+    def __init__(self, signal, event_type, instance, object_json_repr, changed_fields=None):
+        self.signal = signal
+        self.event_type = event_type
+        self.content_type_id = registry.get_plan(type(instance)).content_type_id
+        self.object_id = instance.pk
+        self.object_repr = str(instance)
+        self.object_json_repr = object_json_repr
+        self.changed_fields = changed_fields
+
+    def __str__(self):
+        return self.object_repr
+
+    @property
+    def pk(self):
+        return self.object_id
+
+    def __call__(self):
+        try:
+            with metrics.handler_seconds.time("crud_flow"):
+                log_record(self)
+        except Exception:
+            handle_flow_exception(self, self.signal)
+
+
+def log_record(record):
+    with isolated(DATABASE_ALIAS):
         audit_logger.crud(
             {
-                "content_type_id": ContentType.objects.get_for_model(instance).id,
+                "content_type_id": record.content_type_id,
                 "datetime": timezone.now(),
-                "event_type": event_type,
-                "object_id": instance.pk,
-                "object_json_repr": object_json_repr or "",
-                "object_repr": str(instance),
-                "user_id": user_id,
-                "remote_ip": remote_ip,
-                "browser": browser,
-                "platform": platform,
-                "latitude": lat,
-                "longitude": long,
-                "city": city,
-                "country": country,
-                "operating_system": operating_system,
-                "user_pk_as_string": user_pk_as_string,
-                **kwargs,
+                "event_type": record.event_type,
+                "object_id": record.object_id,
+                "object_json_repr": record.object_json_repr or "",
+                "object_repr": record.object_repr,
+                "changed_fields": record.changed_fields,
+                **get_event_context(),
             }
         )
 
 
+def log_event(event_type, instance, object_json_repr, **kwargs):
+    log_record(CRUDEventRecord(None, event_type, instance, object_json_repr, **kwargs))
+
+
+def log_bulk_events(crud_infos):
+    """Write several CRUD events at once, sharing one request context lookup.
+
+    Uses the backend's ``bulk_crud`` when it provides one, so ``ModelBackend`` issues a
+    single ``bulk_create``.
+    """
+    context = get_event_context()
+    now = timezone.now()
+    crud_infos = [{"datetime": now, **context, **crud_info} for crud_info in crud_infos]
+    if not crud_infos:
+        return
+
+    with isolated(DATABASE_ALIAS):
+        bulk_crud = getattr(audit_logger, "bulk_crud", None)
+        if bulk_crud is not None:
+            bulk_crud(crud_infos)
+        else:
+            for crud_info in crud_infos:
+                audit_logger.crud(crud_info)
+
+
 def handle_flow_exception(instance, signal):
     instance_str = ""
     with contextlib.suppress(Exception):
         instance_str = f" instance: {instance}, instance pk: {instance.pk}"
 
+    metrics.failures.inc(f"crud_flow.{signal}")
     logger.exception(
         f"activity log had a {signal} exception on CRUDEvent creation.{instance_str}"
     )
     if should_propagate_exceptions():
         raise
-
-
-def pre_save_crud_flow(instance, object_json_repr, changed_fields):
-    try:
-        log_event(
-            CRUDEvent.UPDATE,
-            instance,
-            object_json_repr,
-            changed_fields=changed_fields,
-        )
-    except Exception:
-        handle_flow_exception(instance, "pre_save")
-
-
-def post_save_crud_flow(instance, object_json_repr):
-    try:
-        log_event(
-            CRUDEvent.CREATE,
-            instance,
-            object_json_repr,
-        )
-    except Exception:
-        handle_flow_exception(instance, "pre_save")
-
-
-def m2m_changed_crud_flow(  # noqa: PLR0913
-        action, model, instance, pk_set, event_type, object_json_repr
-):
-    try:
-        if action == "post_clear":
-            changed_fields = []
-        else:
-            changed_fields = json.dumps(
-                {get_m2m_field_name(model, instance): list(pk_set)},
-                cls=DjangoJSONEncoder,
-            )
-        log_event(
-            event_type,
-            instance,
-            object_json_repr,
-            changed_fields=changed_fields,
-        )
-    except Exception:
-        handle_flow_exception(instance, "pre_save")
-
-
-def post_delete_crud_flow(instance, object_json_repr):
-    try:
-        log_event(
-            CRUDEvent.DELETE,
-            instance,
-            object_json_repr,
-        )
-
-    except Exception:
-        handle_flow_exception(instance, "pre_save")
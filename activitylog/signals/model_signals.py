@@ -1,79 +1,81 @@
 import json
 import logging
-from functools import partial
 from django.conf import settings
-from django.core import serializers
 from django.core.serializers.json import DjangoJSONEncoder
 from django.db import transaction
 from django.db.models import signals
 from django.utils.encoding import force_str
 
+from activitylog import metrics
 from activitylog.middleware.middleware import get_current_request
 from activitylog.models import CRUDEvent
+from activitylog.registry import registry
 from activitylog.settings import (
     CRUD_DIFFERENCE_CALLBACKS,
-    REGISTERED_CLASSES,
-    UNREGISTERED_CLASSES,
+    M2M_REV_SNAPSHOT,
     WATCH_MODEL_EVENTS,
 )
-from activitylog.utils import model_delta, should_propagate_exceptions
+from activitylog.utils import is_instance_auditing_suppressed, isolated, should_propagate_exceptions
 
-from .crud_flows import (
-    m2m_changed_crud_flow,
-    post_delete_crud_flow,
-    post_save_crud_flow,
-    pre_save_crud_flow,
-)
+from .crud_flows import CRUDEventRecord
 
 logger = logging.getLogger(__name__)
 
 
-def should_audit(instance):
-    """Return True or False to indicate whether the instance should be audited."""
-    # do not audit any model listed in UNREGISTERED_CLASSES
-    for unregistered_class in UNREGISTERED_CLASSES:
-        if isinstance(instance, unregistered_class):
-            return False
+def should_audit_model(model):
+    """Return True or False to indicate whether instances of the model should be audited."""
+    return registry.get_plan(model).audited
 
-    # only audit models listed in REGISTERED_CLASSES (if it's set)
-    if len(REGISTERED_CLASSES) > 0:
-        for registered_class in REGISTERED_CLASSES:
-            if isinstance(instance, registered_class):
-                break
-        else:
-            return False
 
-    # all good
-    return True
+def should_audit(instance):
+    """Return True or False to indicate whether the instance should be audited."""
+    if is_instance_auditing_suppressed(type(instance)):
+        return False
+    return should_audit_model(type(instance))
 
 
 def call_callbacks(
     instance, object_json_repr, created, raw, using, update_fields, **kwargs
 ) -> bool:
+    if not CRUD_DIFFERENCE_CALLBACKS:
+        return True
+
     kwargs["request"] = get_current_request()  # Make request available in callbacks
 
-    return all(
-        callback(
-            instance,
-            object_json_repr,
-            created,
-            raw,
-            using,
-            update_fields,
-            **kwargs,
+    # Callbacks may query the database; keep their failures out of the caller's transaction.
+    with isolated(using):
+        return all(
+            callback(
+                instance,
+                object_json_repr,
+                created,
+                raw,
+                using,
+                update_fields,
+                **kwargs,
+            )
+            for callback in CRUD_DIFFERENCE_CALLBACKS
+            if callable(callback)
         )
-        for callback in CRUD_DIFFERENCE_CALLBACKS
-        if callable(callback)
-    )
+
+
+def schedule(record, using):
+    """Write ``record`` once the current transaction on ``using`` commits."""
+    if getattr(settings, "TEST", False):
+        record()
+    else:
+        transaction.on_commit(record, using=using)
 
 
 def handle_signal_exception(signal):
+    metrics.failures.inc(signal)
     logger.exception(f"activity log had a {signal} exception.")
 
     if should_propagate_exceptions():
         raise
 
 
+@metrics.timed("pre_save")
 def pre_save(sender, instance, raw, using, update_fields, **kwargs):
     if raw:
         # Return if loading Fixtures
@@ -83,52 +85,59 @@ def pre_save(sender, instance, raw, using, update_fields, **kwargs):
         if not should_audit(instance):
             return False
 
-        with transaction.atomic(using=using):
-            try:
-                object_json_repr = serializers.serialize("json", [instance])
-            except Exception:
-                # We need a better way for this to work. ManyToMany will fail on
-                # pre_save on create
-                return None
-
-            # Determine if the instance is a create
-            created = instance.pk is None or instance._state.adding
-
-            # created or updated?
-            delta = {}
-            if not created:
-                old_model = sender.objects.get(pk=instance.pk)
-                delta = model_delta(old_model, instance)
-
-                if not delta and getattr(
-                    settings,
-                    "DJANGO_ACTIVITY_LOG_CRUD_EVENT_NO_CHANGED_FIELDS_SKIP",
-                    False,
-                ):
-                    return False
-
-            # callbacks
-            create_crud_event = call_callbacks(
-                instance, object_json_repr, created, raw, using, update_fields, **kwargs
-            )
-
-            # Create crud event only if all callbacks returned True
-            if create_crud_event and not created:
-                crud_flow = partial(
-                    pre_save_crud_flow,
-                    instance=instance,
-                    object_json_repr=object_json_repr,
-                    changed_fields=json.dumps(delta),
+        # Determine if the instance is a create
+        created = instance.pk is None or instance._state.adding
+        if created and not CRUD_DIFFERENCE_CALLBACKS:
+            # creations are recorded by post_save
+            return None
+
+        plan = registry.get_plan(type(instance))
+        try:
+            object_json_repr = plan.serialize(instance)
+        except Exception:
+            # We need a better way for this to work. ManyToMany will fail on
+            # pre_save on create
+            return None
+
+        # created or updated?
+        delta = {}
+        if not created:
+            # a failing read must not abort the caller's transaction
+            with isolated(using):
+                old_model = (
+                    sender.objects.db_manager(using)
+                    .only(*plan.loaded_field_names)
+                    .get(pk=instance.pk)
                 )
+            delta = plan.diff(old_model, instance)
+
+            if not delta and getattr(
+                settings,
+                "DJANGO_ACTIVITY_LOG_CRUD_EVENT_NO_CHANGED_FIELDS_SKIP",
+                False,
+            ):
+                return False
+
+        # callbacks
+        create_crud_event = call_callbacks(
+            instance, object_json_repr, created, raw, using, update_fields, **kwargs
+        )
 
-                if getattr(settings, "TEST", False):
-                    crud_flow()
-                else:
-                    transaction.on_commit(crud_flow, using=using)
+        # Create crud event only if all callbacks returned True
+        if create_crud_event and not created:
+            record = CRUDEventRecord(
+                "pre_save",
+                CRUDEvent.UPDATE,
+                instance,
+                object_json_repr,
+                changed_fields=json.dumps(delta),
+            )
+            schedule(record, using)
     except Exception:
         handle_signal_exception("pre_save")
 
 
+@metrics.timed("post_save")
 def post_save(sender, instance, created, raw, using, update_fields, **kwargs):
     if raw:
         # Return if loading Fixtures
@@ -138,45 +147,25 @@ def post_save(sender, instance, created, raw, using, update_fields, **kwargs):
         if not should_audit(instance):
             return False
 
-        with transaction.atomic(using=using):
-            object_json_repr = serializers.serialize("json", [instance])
+        plan = registry.get_plan(type(instance))
+        object_json_repr = plan.serialize(instance)
 
-            # callbacks
-            create_crud_event = call_callbacks(
-                instance, object_json_repr, created, raw, using, update_fields, **kwargs
-            )
+        # callbacks
+        create_crud_event = call_callbacks(
+            instance, object_json_repr, created, raw, using, update_fields, **kwargs
+        )
 
-            # Create crud event only if all callbacks returned True
-            if create_crud_event and created:
-                crud_flow = partial(
-                    post_save_crud_flow,
-                    instance=instance,
-                    object_json_repr=object_json_repr,
-                )
-                if getattr(settings, "TEST", False):
-                    crud_flow()
-                else:
-                    transaction.on_commit(crud_flow, using=using)
+        # Create crud event only if all callbacks returned True
+        if create_crud_event and created:
+            schedule(
+                CRUDEventRecord("post_save", CRUDEvent.CREATE, instance, object_json_repr),
+                using,
+            )
     except Exception:
         handle_signal_exception("post_save")
 
 
-def _m2m_rev_field_name(model1, model2):
-    """Get the name of the reverse m2m accessor from `model1` to `model2`.
-
-    For example, if User has a ManyToManyField connected to Group,
-    `_m2m_rev_field_name(Group, User)` retrieves the name of the field on
-    Group that lists a group's Users. (By default, this field is called
-    `user_set`, but the name can be overridden).
-    """
-    m2m_field_names = [
-        rel.get_accessor_name()
-        for rel in model1._meta.get_fields()
-        if rel.many_to_many and rel.auto_created and rel.related_model == model2
-    ]
-    return m2m_field_names[0]
-
-
+@metrics.timed("m2m_changed")
 def m2m_changed(sender, instance, action, reverse, model, pk_set, using, **kwargs):
     try:
         if not should_audit(instance):
@@ -184,74 +173,74 @@ def m2m_changed(sender, instance, action, reverse, model, pk_set, using, **kwarg
         if action not in ("post_add", "post_remove", "post_clear"):
             return False
 
-        with transaction.atomic(using=using):
-            object_json_repr = serializers.serialize("json", [instance])
-
-            if reverse:
-                reverse_actions = {
-                    "post_add": CRUDEvent.M2M_ADD_REV,
-                    "post_remove": CRUDEvent.M2M_REMOVE_REV,
-                    "post_clear": CRUDEvent.M2M_CLEAR_REV,
-                }
-                event_type = reverse_actions.get(action, CRUDEvent.M2M_CHANGE_REV)
-
-                # Add reverse M2M changes to event. Must use json lib because
-                # django serializers ignore extra fields.
-                tmp_repr = json.loads(object_json_repr)
-
-                m2m_rev_field = _m2m_rev_field_name(instance._meta.concrete_model, model)
-                related_instances = getattr(instance, m2m_rev_field).all()
-                related_ids = [r.pk for r in related_instances]
-
-                tmp_repr[0]["m2m_rev_model"] = force_str(model._meta)
-                tmp_repr[0]["m2m_rev_pks"] = related_ids
-                tmp_repr[0]["m2m_rev_action"] = action
-                object_json_repr = json.dumps(tmp_repr, cls=DjangoJSONEncoder)
-            else:
-                forward_actions = {
-                    "post_add": CRUDEvent.M2M_ADD,
-                    "post_remove": CRUDEvent.M2M_REMOVE,
-                    "post_clear": CRUDEvent.M2M_CLEAR,
-                }
-                event_type = forward_actions.get(action, CRUDEvent.M2M_CHANGE)
-
-            crud_flow = partial(
-                m2m_changed_crud_flow,
-                action=action,
-                model=model,
-                instance=instance,
-                pk_set=pk_set,
-                event_type=event_type,
-                object_json_repr=object_json_repr,
-            )
-            if getattr(settings, "TEST", False):
-                crud_flow()
-            else:
-                transaction.on_commit(crud_flow, using=using)
+        plan = registry.get_plan(type(instance))
+        if reverse:
+            reverse_actions = {
+                "post_add": CRUDEvent.M2M_ADD_REV,
+                "post_remove": CRUDEvent.M2M_REMOVE_REV,
+                "post_clear": CRUDEvent.M2M_CLEAR_REV,
+            }
+            event_type = reverse_actions.get(action, CRUDEvent.M2M_CHANGE_REV)
+
+            # Add reverse M2M changes to event. Django serializers ignore extra
+            # fields, so they are added to the python representation before it
+            # is dumped. Only the changed pks are recorded; a clear has none.
+            m2m_field_name, _ = plan.m2m_rev_fields.get(sender, (None, None))
+            tmp_repr = plan.serialize_python(instance)
+            tmp_repr[0]["m2m_rev_model"] = force_str(model._meta)
+            tmp_repr[0]["m2m_rev_pk_set"] = sorted(pk_set) if pk_set else None
+            tmp_repr[0]["m2m_rev_action"] = action
+
+            if M2M_REV_SNAPSHOT and m2m_field_name is not None:
+                # Read the full membership now: once the transaction commits, or in a
+                # queue worker, it may already have changed again.
+                with isolated(using):
+                    tmp_repr[0]["m2m_rev_pks"] = sorted(
+                        model._default_manager.db_manager(using)
+                        .filter(**{m2m_field_name: instance.pk})
+                        .values_list("pk", flat=True)
+                    )
+            object_json_repr = json.dumps(tmp_repr, cls=DjangoJSONEncoder)
+        else:
+            forward_actions = {
+                "post_add": CRUDEvent.M2M_ADD,
+                "post_remove": CRUDEvent.M2M_REMOVE,
+                "post_clear": CRUDEvent.M2M_CLEAR,
+            }
+            event_type = forward_actions.get(action, CRUDEvent.M2M_CHANGE)
+            m2m_field_name = plan.m2m_fields.get(sender)
+            object_json_repr = plan.serialize(instance)
+
+        if action == "post_clear":
+            changed_fields = json.dumps([])
+        else:
+            changed_fields = json.dumps({m2m_field_name: list(pk_set)}, cls=DjangoJSONEncoder)
+
+        record = CRUDEventRecord(
+            "m2m-changed",
+            event_type,
+            instance,
+            object_json_repr,
+            changed_fields=changed_fields,
+        )
+        schedule(record, using)
     except Exception:
         handle_signal_exception("m2m-changed")
 
 
+@metrics.timed("post_delete")
 def post_delete(sender, instance, using, **kwargs):
     try:
         if not should_audit(instance):
             return False
 
-        with transaction.atomic(using=using):
-            object_json_repr = serializers.serialize("json", [instance])
+        plan = registry.get_plan(type(instance))
+        object_json_repr = plan.serialize(instance)
 
-            crud_flow = partial(
-                post_delete_crud_flow,
-                instance=instance,
-                object_json_repr=object_json_repr,
-            )
-            if getattr(settings, "TEST", False):
-                crud_flow()
-            else:
-                transaction.on_commit(
-                    crud_flow,
-                    using=using,
-                )
+        schedule(
+            CRUDEventRecord("post-delete", CRUDEvent.DELETE, instance, object_json_repr),
+            using,
+        )
     except Exception:
         handle_signal_exception("post-delete")
 
@@ -0,0 +1,198 @@
+import re
+from functools import lru_cache
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY as AUTH_SESSION_KEY
+from django.contrib.auth import get_user_model
+from django.contrib.gis.geoip2 import GeoIP2
+from django.contrib.sessions.models import Session
+from django.http.cookie import SimpleCookie
+from django.utils import timezone
+from rest_framework_jwt.utils import jwt_decode_handler
+
+from activitylog import metrics
+from activitylog.settings import (
+    REGISTERED_URLS,
+    REMOTE_ADDR_HEADER,
+    UNREGISTERED_URLS,
+    HTTP_SEC_CH_UA, HTTP_SEC_CH_UA_PLATFORM, GNOME_SHELL_SESSION_MODE,
+)
+
+session_engine = import_module(settings.SESSION_ENGINE)
+
+# Key of the RequestContext in the WSGI environ or ASGI scope of its request.
+CONTEXT_KEY = "activitylog.request_context"
+
+_UNRESOLVED = object()
+
+
+def should_log_url(url):
+    # check if current url is blacklisted
+    for unregistered_url in UNREGISTERED_URLS:
+        pattern = re.compile(unregistered_url)
+        if pattern.match(url):
+            return False
+
+    # only audit URLs listed in REGISTERED_URLS (if it's set)
+    if len(REGISTERED_URLS) > 0:
+        for registered_url in REGISTERED_URLS:
+            pattern = re.compile(registered_url)
+            if pattern.match(url):
+                return True
+        return False
+
+    # all good
+    return True
+
+
+@lru_cache(maxsize=None)
+def _geoip():
+    # Opening the GeoIP database is expensive; a failure is retried on the next call.
+    return GeoIP2()
+
+
+class RequestContext:
+    """What the request and CORS events of one request have in common.
+
+    Built once per request by :func:`get_request_context`. The user and the location
+    are looked up on first use, so every ``request_started`` receiver shares a single
+    session load or JWT decode, user query and GeoIP lookup.
+    """
+
+    __slots__ = ("path", "method", "query_string", "meta", "remote_ip", "_user_id", "_location")
+
+    def __init__(self, environ=None, scope=None):
+        if environ:
+            self.meta = environ
+            self.path = environ["PATH_INFO"]
+            self.method = environ["REQUEST_METHOD"]
+            self.query_string = environ["QUERY_STRING"]
+            self.remote_ip = environ.get(REMOTE_ADDR_HEADER, None)
+        else:
+            # ASGI headers, under the names they have in a WSGI environ.
+            self.meta = {}
+            for name, value in scope.get("headers") or ():
+                key = "HTTP_" + name.decode("latin1").upper().replace("-", "_")
+                value = value.decode("latin1")
+                self.meta[key] = f"{self.meta[key]},{value}" if key in self.meta else value
+            self.path = scope.get("path")
+            self.method = scope.get("method")
+            self.query_string = (scope.get("query_string") or b"").decode("latin1")
+            self.remote_ip = (scope.get("client") or ("0.0.0.0", 0))[0]
+        self._user_id = _UNRESOLVED
+        self._location = None
+
+    @property
+    def browser(self):
+        return self.meta.get(HTTP_SEC_CH_UA, None)
+
+    @property
+    def platform(self):
+        return self.meta.get(HTTP_SEC_CH_UA_PLATFORM, None)
+
+    @property
+    def operating_system(self):
+        return self.meta.get(GNOME_SHELL_SESSION_MODE, None)
+
+    @property
+    def frontend_url(self):
+        return self.meta.get("HTTP_X_FRONTEND_URL")
+
+    @property
+    def url_method(self):
+        return self.meta.get("HTTP_URL_METHOD")
+
+    @property
+    def user_id(self):
+        if self._user_id is _UNRESOLVED:
+            self._user_id = self._resolve_user_id()
+        return self._user_id
+
+    @user_id.setter
+    def user_id(self, value):
+        self._user_id = value
+
+    def _resolve_user_id(self):
+        user_id = None
+        cookie_string = self.meta.get("HTTP_COOKIE")
+        authorization = self.meta.get("HTTP_AUTHORIZATION")
+        # get the user from cookies
+        if cookie_string:
+            cookie = SimpleCookie()
+            cookie.load(cookie_string)
+            session_cookie_name = settings.SESSION_COOKIE_NAME
+            if session_cookie_name in cookie:
+                session_id = cookie[session_cookie_name].value
+
+                try:
+                    session = session_engine.SessionStore(session_key=session_id).load()
+                except Session.DoesNotExist:
+                    session = None
+
+                if session and AUTH_SESSION_KEY in session:
+                    user_id = session.get(AUTH_SESSION_KEY)
+
+        elif authorization:
+            try:
+                jwt_token = authorization.split()[1]
+            except Exception:
+                jwt_token = authorization.split()[0]
+            try:
+                payload = jwt_decode_handler(jwt_token)
+                user_id = payload["user_id"]
+            except Exception:
+                user_id = None
+
+        if user_id is None:
+            return None
+        try:
+            return (
+                get_user_model()._default_manager.filter(pk=user_id)
+                .values_list("pk", flat=True)
+                .first()
+            )
+        except Exception:
+            return None
+
+    @property
+    def location(self):
+        """``(latitude, longitude, city, country)`` of the remote address."""
+        if self._location is None:
+            try:
+                with metrics.geoip_seconds.time():
+                    g = _geoip()
+                    lat, long = g.lat_lon(self.remote_ip)
+                    self._location = (
+                        lat, long, g.city(self.remote_ip), g.country(self.remote_ip)
+                    )
+            except Exception:
+                self._location = (None, None, None, None)
+        return self._location
+
+    def event_info(self, url, method):
+        lat, long, city, country = self.location
+        return {
+            "url": url,
+            "method": method,
+            "query_string": self.query_string,
+            "user_id": self.user_id,
+            "browser": self.browser,
+            "platform": self.platform,
+            "operating_system": self.operating_system,
+            "remote_ip": self.remote_ip,
+            "latitude": lat,
+            "longitude": long,
+            "city": city,
+            "country": country,
+            "datetime": timezone.now(),
+        }
+
+
+def get_request_context(environ=None, scope=None):
+    """The :class:`RequestContext` of the request, created by the first caller."""
+    carrier = environ if environ else scope
+    context = carrier.get(CONTEXT_KEY)
+    if context is None:
+        context = carrier[CONTEXT_KEY] = RequestContext(environ, scope)
+    return context
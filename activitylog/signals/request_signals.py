@@ -1,146 +1,148 @@
-import re
-from importlib import import_module
-from django.conf import settings
-from django.contrib.auth import SESSION_KEY as AUTH_SESSION_KEY
-from django.contrib.auth import get_user_model
-from django.contrib.gis.geoip2 import GeoIP2
-from django.contrib.sessions.models import Session
+import contextvars
+import logging
+import uuid
+
 from django.core.signals import request_started
-from django.http.cookie import SimpleCookie
-from django.utils import timezone
-from django.utils.module_loading import import_string
-from rest_framework_jwt.utils import jwt_decode_handler
+from django.db import connections
+from django.db.backends.signals import connection_created
 
+from activitylog import detector, metrics
+from activitylog.backends import get_audit_logger
 from activitylog.settings import (
-    LOGGING_BACKEND,
-    REGISTERED_URLS,
-    REMOTE_ADDR_HEADER,
-    UNREGISTERED_URLS,
-    WATCH_REQUEST_EVENTS, HTTP_SEC_CH_UA, HTTP_SEC_CH_UA_PLATFORM, GNOME_SHELL_SESSION_MODE,
+    DETECTOR,
+    REQUEST_EVENT_CAPTURE,
+    REQUEST_EVENT_NON_2XX,
+    REQUEST_EVENT_SLOW_MS,
+    WATCH_REQUEST_EVENTS,
 )
+from activitylog.signals.request_context import get_request_context, should_log_url
+from activitylog.utils import should_propagate_exceptions
 
-session_engine = import_module(settings.SESSION_ENGINE)
-audit_logger = import_string(LOGGING_BACKEND)()
-
+logger = logging.getLogger(__name__)
 
-def should_log_url(url):
-    # check if current url is blacklisted
-    for unregistered_url in UNREGISTERED_URLS:
-        pattern = re.compile(unregistered_url)
-        if pattern.match(url):
-            return False
+audit_logger = get_audit_logger()
 
-    # only audit URLs listed in REGISTERED_URLS (if it's set)
-    if len(REGISTERED_URLS) > 0:
-        for registered_url in REGISTERED_URLS:
-            pattern = re.compile(registered_url)
-            if pattern.match(url):
-                return True
-        return False
+# Whether ActivityLogMiddleware writes request events, see REQUEST_EVENT_CAPTURE.
+CAPTURE_RESPONSES = WATCH_REQUEST_EVENTS and REQUEST_EVENT_CAPTURE == "response"
+# Whether ActivityLogMiddleware times requests and counts their queries.
+MEASURE_RESPONSES = CAPTURE_RESPONSES or DETECTOR
 
-    # all good
-    return True
+_query_counter = contextvars.ContextVar("activitylog_query_counter", default=None)
 
 
+@metrics.timed("request_started")
 def request_started_handler(sender, **kwargs):
-    global authorization
-    environ = kwargs.get("environ")
-    scope = kwargs.get("scope")
-    browser = None
-    platform = None
-    operating_system = None
-    if environ:
-        path = environ["PATH_INFO"]
-        cookie_string = environ.get("HTTP_COOKIE")
-        authorization = environ.get('HTTP_AUTHORIZATION')
-        remote_ip = environ.get(REMOTE_ADDR_HEADER, None)
-        method = environ["REQUEST_METHOD"]
-        query_string = environ["QUERY_STRING"]
-
-        browser = environ.get(HTTP_SEC_CH_UA, None)
-        platform = environ.get(HTTP_SEC_CH_UA_PLATFORM, None)
-        operating_system = environ.get(GNOME_SHELL_SESSION_MODE, None)
-
-    else:
-        method = scope.get("method")
-        path = scope.get("path")
-        headers = dict(scope.get("headers"))
-        cookie_string = headers.get(b"cookie")
-        if isinstance(cookie_string, bytes):
-            cookie_string = cookie_string.decode("utf-8")
-        remote_ip = next(iter(scope.get("client", ("0.0.0.0", 0))))
-        query_string = scope.get("query_string")
-
-    if not should_log_url(path):
+    context = get_request_context(kwargs.get("environ"), kwargs.get("scope"))
+    if not should_log_url(context.path):
         return
 
-    user = None
-    # get the user from cookies
-    if not user and cookie_string:
-        cookie = SimpleCookie()
-        cookie.load(cookie_string)
-        session_cookie_name = settings.SESSION_COOKIE_NAME
-        if session_cookie_name in cookie:
-            session_id = cookie[session_cookie_name].value
-
-            try:
-                session = session_engine.SessionStore(session_key=session_id).load()
-            except Session.DoesNotExist:
-                session = None
-
-            if session and AUTH_SESSION_KEY in session:
-                user_id = session.get(AUTH_SESSION_KEY)
-                try:
-                    user = get_user_model().objects.get(id=user_id)
-                except Exception:
-                    user = None
-
-    elif not user and authorization:
-        try:
-            jwt_token = authorization.split()[1]
-        except Exception:
-            jwt_token = authorization.split()[0]
-        try:
-            payload = jwt_decode_handler(jwt_token)
-            user_id = payload["user_id"]
-        except Exception:
-            user_id = None
-        try:
-            user = get_user_model().objects.get(id=user_id)
-        except Exception:
-            user = None
+    audit_logger.request(context.event_info(context.path, context.method))
+
+
+class QueryCounter:
+    """Number of queries run on any database while handling one request.
+
+    With the detector, ``statements`` also counts how many times each SQL ran.
+    """
+
+    __slots__ = ("count", "statements", "_token")
+
+    def __init__(self):
+        self.count = 0
+        self.statements = {} if DETECTOR else None
+        self._token = _query_counter.set(self)
+
+    def stop(self):
+        _query_counter.reset(self._token)
+        return self.count
+
+
+def _count_query(execute, sql, params, many, context):
+    counter = _query_counter.get()
+    if counter is not None:
+        counter.count += 1
+        if counter.statements is not None:
+            counter.statements[sql] = counter.statements.get(sql, 0) + 1
+    return execute(sql, params, many, context)
+
+
+def _install_query_counter(sender=None, connection=None, **kwargs):
+    # First in the list: connection.execute_wrapper() blocks pop the last wrapper.
+    if _count_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _count_query)
+
+
+def _response_bytes(response):
+    if response.has_header("Content-Length"):
+        return int(response["Content-Length"])
+    if not response.streaming:
+        return len(response.content)
+    return None
+
+
+def keep_request_event(response, duration_ms):
+    """Whether the request passes REQUEST_EVENT_SLOW_MS and REQUEST_EVENT_NON_2XX."""
+    if REQUEST_EVENT_SLOW_MS is None and not REQUEST_EVENT_NON_2XX:
+        return True
+    slow = REQUEST_EVENT_SLOW_MS is not None and duration_ms >= REQUEST_EVENT_SLOW_MS
+    failed = REQUEST_EVENT_NON_2XX and not 200 <= response.status_code < 300
+    return slow or failed
+
+
+@metrics.timed("request_response")
+def log_response(request, response, duration, queries):
+    """Write the request event of a handled request, and let the detector inspect it.
+
+    ``queries`` is the :class:`QueryCounter` of the request.
+    """
+    duration_ms = duration * 1000
+    capture = CAPTURE_RESPONSES and keep_request_event(response, duration_ms)
+    if not capture and not DETECTOR:
+        return
 
     try:
-        g = GeoIP2()
-        lat, long = g.lat_lon(remote_ip)
-        city = g.city(remote_ip)
-        country = g.country(remote_ip)
+        # shared with the CORS event, which was recorded when the request started
+        scope = getattr(request, "scope", None)
+        if scope is not None:
+            context = get_request_context(scope=scope)
+        else:
+            context = get_request_context(request.META)
+        if not should_log_url(context.path):
+            return
+
+        request_event_id = None
+        if capture:
+            # the user authenticated by the middleware or the view, if any
+            user = getattr(request, "user", None)
+            if user is not None and user.is_authenticated:
+                context.user_id = user.pk
+            request_event_id = uuid.uuid4()
+            request_info = context.event_info(context.path, context.method)
+            request_info.update(
+                id=request_event_id,
+                status_code=response.status_code,
+                duration_ms=round(duration_ms, 3),
+                response_bytes=_response_bytes(response),
+                db_query_count=queries.count,
+            )
+            audit_logger.request(request_info)
+        if DETECTOR:
+            detector.inspect(context, response, duration_ms, queries, request_event_id)
     except Exception:
-        lat = None
-        long = None
-        city = None
-        country = None
-
-    audit_logger.request(
-        {
-            "url": path,
-            "method": method,
-            "query_string": query_string,
-            "user_id": getattr(user, "id", None),
-            "browser": browser,
-            "platform": platform,
-            "operating_system": operating_system,
-            "remote_ip": remote_ip,
-            "latitude": lat,
-            "longitude": long,
-            "city": city,
-            "country": country,
-            "datetime": timezone.now(),
-        }
-    )
+        metrics.failures.inc("request_response")
+        logger.exception("activity log could not write the request event of %s", request.path)
+        if should_propagate_exceptions():
+            raise
 
 
-if WATCH_REQUEST_EVENTS:
+if MEASURE_RESPONSES:
+    connection_created.connect(
+        _install_query_counter, dispatch_uid="activity_log_request_query_counter"
+    )
+    for connection in connections.all(initialized_only=True):
+        _install_query_counter(connection=connection)
+
+if WATCH_REQUEST_EVENTS and not CAPTURE_RESPONSES:
     request_started.connect(
         request_started_handler, dispatch_uid="activity_log_signals_request_started"
     )
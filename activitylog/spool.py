@@ -0,0 +1,104 @@
+import logging
+import threading
+import uuid
+
+from activitylog import metrics
+from activitylog.segments import SegmentBackend
+
+logger = logging.getLogger(__name__)
+
+_spool = None
+_spool_lock = threading.Lock()
+
+
+class Spool(SegmentBackend):
+    """Append-only segment files of the events that could not be written.
+
+    Every event keeps its ``id``, so replaying a spool with ``replay_activitylog_spool``
+    never duplicates an event that reached the database after all.
+    """
+
+    flush_writes = True
+
+    def __init__(self, directory=None, max_age=None, fsync=None):
+        from activitylog import settings as activitylog_settings
+
+        super().__init__(
+            directory=directory or activitylog_settings.SPOOL_DIR,
+            max_age=max_age or activitylog_settings.SPOOL_MAX_AGE,
+            compress=False,
+            fsync=fsync or activitylog_settings.SPOOL_FSYNC,
+        )
+
+    def append(self, kind, infos, reason):
+        self._write(kind, infos)
+        metrics.spooled_events.inc(kind, reason, amount=len(infos))
+
+
+def get_spool():
+    """Return the process wide :class:`Spool`, or None without ``DJANGO_ACTIVITY_LOG_SPOOL_DIR``."""
+    global _spool
+    from activitylog.settings import SPOOL_DIR
+
+    if _spool is None and SPOOL_DIR:
+        with _spool_lock:
+            if _spool is None:
+                _spool = Spool()
+    return _spool
+
+
+class SpoolingBackend:
+    """Spool the events ``backend`` fails to write instead of raising.
+
+    Events are given their UUID before the write is attempted, so an event whose write
+    failed after reaching the database is not duplicated by the replay.
+    """
+
+    def __init__(self, backend, spool=None):
+        self.backend = backend
+        self.spool = spool or get_spool()
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
+
+    def _write(self, kind, infos, bulk=False):
+        infos = [info if "id" in info else {"id": uuid.uuid4(), **info} for info in infos]
+        try:
+            if not bulk:
+                return getattr(self.backend, kind)(infos[0])
+            bulk_method = getattr(self.backend, f"bulk_{kind}", None)
+            if bulk_method is not None:
+                return bulk_method(infos)
+            for info in infos:
+                getattr(self.backend, kind)(info)
+        except Exception:
+            logger.warning(
+                "Could not write %d %s event(s), spooling them.", len(infos), kind, exc_info=True
+            )
+            # a failure to spool is raised, chained to the failed write
+            self.spool.append(kind, infos, "failed")
+        return None
+
+    def request(self, request_info):
+        return self._write("request", [request_info])
+
+    def bulk_request(self, request_infos):
+        return self._write("request", request_infos, bulk=True)
+
+    def cors(self, cors_info):
+        return self._write("cors", [cors_info])
+
+    def bulk_cors(self, cors_infos):
+        return self._write("cors", cors_infos, bulk=True)
+
+    def crud(self, crud_info):
+        return self._write("crud", [crud_info])
+
+    def bulk_crud(self, crud_infos):
+        return self._write("crud", crud_infos, bulk=True)
+
+    def login(self, login_info):
+        return self._write("login", [login_info])
+
+    def bulk_login(self, login_infos):
+        return self._write("login", login_infos, bulk=True)
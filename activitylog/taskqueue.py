@@ -0,0 +1,259 @@
+import abc
+import contextlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+_broker = None
+
+
+class BaseBroker(abc.ABC):
+    """Job queue used by :class:`QueueBackend` and the ``run_activitylog_worker`` command.
+
+    A job is one event dict. ``reserve`` hands out up to ``limit`` jobs as
+    ``(job_id, event, attempts)`` tuples, ``attempts`` counting this reservation;
+    jobs not acknowledged within ``visibility_timeout`` seconds are handed out again,
+    so a crashed worker loses nothing. ``bury`` moves jobs that keep failing to a
+    dead-letter store, where they are kept but no longer handed out.
+    """
+
+    @abc.abstractmethod
+    def enqueue(self, events):
+        pass
+
+    @abc.abstractmethod
+    def reserve(self, limit):
+        pass
+
+    @abc.abstractmethod
+    def ack(self, job_ids):
+        pass
+
+    @abc.abstractmethod
+    def bury(self, job_ids, error=""):
+        pass
+
+    @abc.abstractmethod
+    def size(self):
+        pass
+
+    @abc.abstractmethod
+    def dead_size(self):
+        pass
+
+
+class MemoryBroker(BaseBroker):
+    """Queue of the current process, for tests. ``run_activitylog_worker`` runs in a
+    process of its own and never sees these jobs.
+    """
+
+    def __init__(self, visibility_timeout=300):
+        self.visibility_timeout = visibility_timeout
+        self._lock = threading.Lock()
+        self._ready = deque()
+        self._reserved = {}
+        self._attempts = {}
+        self._next_id = 0
+        # (job_id, event, attempts, error) of the buried jobs
+        self.dead = []
+
+    def enqueue(self, events):
+        with self._lock:
+            for event in events:
+                self._next_id += 1
+                self._ready.append((self._next_id, event))
+                self._attempts[self._next_id] = 0
+
+    def reserve(self, limit):
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                job_id
+                for job_id, (reserved_at, _) in self._reserved.items()
+                if now - reserved_at >= self.visibility_timeout
+            ]
+            for job_id in expired:
+                self._ready.appendleft((job_id, self._reserved.pop(job_id)[1]))
+            jobs = []
+            for _ in range(min(limit, len(self._ready))):
+                job_id, event = self._ready.popleft()
+                self._reserved[job_id] = (now, event)
+                self._attempts[job_id] += 1
+                jobs.append((job_id, event, self._attempts[job_id]))
+        return jobs
+
+    def ack(self, job_ids):
+        with self._lock:
+            for job_id in job_ids:
+                self._reserved.pop(job_id, None)
+                self._attempts.pop(job_id, None)
+
+    def bury(self, job_ids, error=""):
+        with self._lock:
+            for job_id in job_ids:
+                reserved = self._reserved.pop(job_id, None)
+                if reserved is not None:
+                    self.dead.append((job_id, reserved[1], self._attempts.pop(job_id), error))
+
+    def size(self):
+        with self._lock:
+            return len(self._ready) + len(self._reserved)
+
+    def dead_size(self):
+        with self._lock:
+            return len(self.dead)
+
+
+class SQLiteBroker(BaseBroker):
+    """Queue in a local SQLite file, shared by every process of the host.
+
+    Buried jobs are moved to the ``activitylog_dead_job`` table of the same file.
+    """
+
+    def __init__(self, path, visibility_timeout=300):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self._local = threading.local()
+        with self._connect() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS activitylog_job ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, reserved_at REAL)"
+            )
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(activitylog_job)")]
+            if "attempts" not in columns:
+                # queue files created before jobs counted their attempts
+                connection.execute(
+                    "ALTER TABLE activitylog_job ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0"
+                )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS activitylog_dead_job ("
+                "id INTEGER PRIMARY KEY, payload TEXT NOT NULL, attempts INTEGER NOT NULL, "
+                "error TEXT NOT NULL, buried_at REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextlib.contextmanager
+    def _transaction(self, connection):
+        """Write transaction, rolled back when any statement or the COMMIT fails.
+
+        Waits up to the 30 seconds busy timeout of the connection for other writers.
+        A COMMIT failing e.g. with "database is locked" would otherwise leave the
+        transaction open, and every later statement of the thread part of it.
+        """
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            connection.execute("COMMIT")
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+
+    def enqueue(self, events):
+        connection = self._connect()
+        rows = [(json.dumps(event, cls=DjangoJSONEncoder),) for event in events]
+        with self._transaction(connection):
+            connection.executemany("INSERT INTO activitylog_job (payload) VALUES (?)", rows)
+
+    def reserve(self, limit):
+        connection = self._connect()
+        now = time.time()
+        with self._transaction(connection):
+            jobs = connection.execute(
+                "SELECT id, payload, attempts + 1 FROM activitylog_job "
+                "WHERE reserved_at IS NULL OR reserved_at < ? ORDER BY id LIMIT ?",
+                (now - self.visibility_timeout, limit),
+            ).fetchall()
+            connection.executemany(
+                "UPDATE activitylog_job SET reserved_at = ?, attempts = attempts + 1 WHERE id = ?",
+                [(now, job_id) for job_id, _, _ in jobs],
+            )
+        return [(job_id, json.loads(payload), attempts) for job_id, payload, attempts in jobs]
+
+    def ack(self, job_ids):
+        self._connect().executemany(
+            "DELETE FROM activitylog_job WHERE id = ?", [(job_id,) for job_id in job_ids]
+        )
+
+    def bury(self, job_ids, error=""):
+        connection = self._connect()
+        rows = [(error, time.time(), job_id) for job_id in job_ids]
+        with self._transaction(connection):
+            connection.executemany(
+                "INSERT OR REPLACE INTO activitylog_dead_job (id, payload, attempts, error, buried_at) "
+                "SELECT id, payload, attempts, ?, ? FROM activitylog_job WHERE id = ?",
+                rows,
+            )
+            connection.executemany(
+                "DELETE FROM activitylog_job WHERE id = ?", [(job_id,) for job_id in job_ids]
+            )
+
+    def size(self):
+        return self._connect().execute("SELECT COUNT(*) FROM activitylog_job").fetchone()[0]
+
+    def dead_size(self):
+        return self._connect().execute("SELECT COUNT(*) FROM activitylog_dead_job").fetchone()[0]
+
+
+def get_broker():
+    """Return the process wide instance of ``DJANGO_ACTIVITY_LOG_QUEUE_BROKER``."""
+    global _broker
+    if _broker is None:
+        from activitylog.settings import QUEUE_BROKER, QUEUE_BROKER_OPTIONS
+
+        _broker = import_string(QUEUE_BROKER)(**QUEUE_BROKER_OPTIONS)
+    return _broker
+
+
+class QueueBackend:
+    """Only enqueue events; ``run_activitylog_worker`` processes write them in bulk."""
+
+    def __init__(self, broker=None):
+        self.broker = broker or get_broker()
+
+    def _enqueue(self, event, infos):
+        now = timezone.now()
+        self.broker.enqueue(
+            [{"event": event, "id": uuid.uuid4(), "datetime": now, **info} for info in infos]
+        )
+
+    def request(self, request_info):
+        self._enqueue("request", [request_info])
+
+    def bulk_request(self, request_infos):
+        self._enqueue("request", request_infos)
+
+    def cors(self, cors_info):
+        self._enqueue("cors", [cors_info])
+
+    def bulk_cors(self, cors_infos):
+        self._enqueue("cors", cors_infos)
+
+    def crud(self, crud_info):
+        self._enqueue("crud", [crud_info])
+
+    def bulk_crud(self, crud_infos):
+        self._enqueue("crud", crud_infos)
+
+    def login(self, login_info):
+        self._enqueue("login", [login_info])
+
+    def bulk_login(self, login_infos):
+        self._enqueue("login", login_infos)
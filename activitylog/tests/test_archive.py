@@ -0,0 +1,170 @@
+import io
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from activitylog.archive import ArchiveWriter, archive_files, delete_archived, read_archive
+from activitylog.managers import AuditQuerySet
+from activitylog.models import CRUDCheckpoint, CRUDEvent, CRUDEventObject, RequestEvent
+from activitylog.reconstruction import reconstruct
+
+APRIL = datetime(2024, 4, 30, 23, 30, tzinfo=timezone.utc)
+MAY = datetime(2024, 5, 2, 8, 0, 0, 123000, tzinfo=timezone.utc)
+
+
+def request(url, when, **fields):
+    event = RequestEvent.objects.create(url=url, method="GET", **fields)
+    # datetime is set by auto_now_add
+    RequestEvent.objects.filter(pk=event.pk).update(datetime=when)
+    return RequestEvent.objects.get(pk=event.pk)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.user = User.objects.create(username="alice")
+
+    def test_round_trip(self):
+        events = [
+            request("/a/", APRIL, user=self.user, remote_ip="10.0.0.1", status_code=200),
+            request("/b/", MAY, query_string="page=2, \"x\"\nnext", duration_ms=1.5),
+            request("/c/", MAY + timedelta(minutes=1)),
+        ]
+        recent = request("/recent/", datetime.now(timezone.utc))
+
+        writer = ArchiveWriter(self.directory, "request", MAY + timedelta(days=1), batch_size=2)
+        written = list(writer.write())
+        self.assertEqual([count for _, count in written], [1, 2])
+        self.assertEqual([path for path, _ in written], archive_files(self.directory, "request"))
+        names = [name for _, _, names in os.walk(self.directory) for name in names]
+        self.assertEqual(len(names), 2)
+        self.assertFalse([name for name in names if name.endswith(".tmp")])
+
+        for path, count in written:
+            self.assertEqual(delete_archived(path, "request", batch_size=1), count)
+        self.assertEqual(list(RequestEvent.objects.all()), [recent])
+
+        archived = list(read_archive(self.directory, "request"))
+        self.assertEqual(len(archived), 3)
+        for event, row in zip(events, archived):
+            self.assertEqual(row["id"], event.id)
+            self.assertEqual(row["url"], event.url)
+            self.assertEqual(row["user_id"], event.user_id)
+            self.assertEqual(row["datetime"], event.datetime)
+            self.assertEqual(row["query_string"], event.query_string)
+            self.assertEqual(row["status_code"], event.status_code)
+            self.assertEqual(row["duration_ms"], event.duration_ms)
+
+    def test_filters_only_open_the_selected_months(self):
+        request("/a/", APRIL, user=self.user)
+        request("/b/", MAY)
+        request("/c/", MAY + timedelta(minutes=1), user=self.user)
+        list(ArchiveWriter(self.directory, "request", MAY + timedelta(days=1)).write())
+
+        may = list(read_archive(self.directory, "request", start=MAY.replace(day=1)))
+        self.assertEqual([row["url"] for row in may], ["/b/", "/c/"])
+        self.assertEqual(len(archive_files(self.directory, "request", end=APRIL)), 1)
+        self.assertEqual(
+            [row["url"] for row in read_archive(self.directory, "request", user_id=self.user.pk)],
+            ["/a/", "/c/"],
+        )
+        anonymous = read_archive(self.directory, "request", where=lambda row: not row["user_id"])
+        self.assertEqual([row["url"] for row in anonymous], ["/b/"])
+
+    def test_command(self):
+        request("/old/", APRIL)
+        recent = request("/recent/", datetime.now(timezone.utc))
+        stdout = io.StringIO()
+        call_command(
+            "archive_activitylog", directory=self.directory, older_than=7, kinds=["request"],
+            stdout=stdout,
+        )
+
+        self.assertIn("request: 1 event(s) archived.", stdout.getvalue())
+        self.assertEqual(list(RequestEvent.objects.all()), [recent])
+        self.assertEqual([row["url"] for row in read_archive(self.directory, "request")], ["/old/"])
+
+    def test_command_keeps_the_events(self):
+        request("/old/", APRIL)
+        call_command(
+            "archive_activitylog", directory=self.directory, older_than=7, kinds=["request"],
+            keep=True, stdout=io.StringIO(),
+        )
+        self.assertEqual(RequestEvent.objects.count(), 1)
+        self.assertEqual(len(archive_files(self.directory, "request")), 1)
+
+    def test_runs_do_not_archive_events_twice(self):
+        request("/old/", APRIL)
+        request("/older/", APRIL - timedelta(days=1))
+        for _ in range(2):
+            call_command(
+                "archive_activitylog", directory=self.directory, older_than=7,
+                kinds=["request"], keep=True, stdout=io.StringIO(),
+            )
+        self.assertEqual(len(archive_files(self.directory, "request")), 1)
+
+        # the events kept are deleted by the next run, from the file they are in
+        request("/new/", APRIL + timedelta(minutes=1))
+        stdout = io.StringIO()
+        call_command(
+            "archive_activitylog", directory=self.directory, older_than=7, kinds=["request"],
+            stdout=stdout,
+        )
+        self.assertIn("request: 1 event(s) archived.", stdout.getvalue())
+        self.assertIn("2 already archived event(s) deleted", stdout.getvalue())
+        self.assertFalse(RequestEvent.objects.exists())
+        self.assertEqual(
+            [row["url"] for row in read_archive(self.directory, "request")],
+            ["/older/", "/old/", "/new/"],
+        )
+
+
+class SummaryQuerySet(AuditQuerySet):
+    audit_bulk_events = "summary"
+
+
+@override_settings(TEST=True)
+class CRUDArchiveTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def archive(self):
+        for number, event in enumerate(CRUDEvent.objects.order_by("datetime", "pk")):
+            CRUDEvent.objects.filter(pk=event.pk).update(datetime=APRIL + timedelta(minutes=number))
+        call_command(
+            "archive_activitylog", directory=self.directory, older_than=7, kinds=["crud"],
+            stdout=io.StringIO(),
+        )
+
+    def test_archived_objects_are_reconstructed_from_checkpoints(self):
+        group = Group.objects.create(name="staff")
+        group.name = "admins"
+        group.save()
+        SummaryQuerySet(model=Group).bulk_create([Group(name="bulk")])
+        bulk = Group.objects.get(name="bulk")
+        self.archive()
+        self.assertFalse(CRUDEvent.objects.exists())
+        self.assertFalse(CRUDEventObject.objects.exists())
+        self.assertEqual(CRUDCheckpoint.objects.count(), 2)
+
+        group.name = "owners"
+        group.save()
+        SummaryQuerySet(model=Group).filter(pk=bulk.pk).update(name="renamed")
+        # without its snapshot, the update is replayed on the checkpoint
+        CRUDEvent.objects.update(object_json_repr="")
+        self.assertEqual(reconstruct(Group, group.pk)["name"], "owners")
+        self.assertEqual(reconstruct(Group, bulk.pk)["name"], "renamed")
+
+    def test_deleted_objects_get_no_checkpoint(self):
+        Group.objects.create(name="staff").delete()
+        self.archive()
+        self.assertFalse(CRUDEvent.objects.exists())
+        self.assertFalse(CRUDCheckpoint.objects.exists())
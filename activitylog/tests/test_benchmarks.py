@@ -0,0 +1,53 @@
+import io
+import json
+from contextlib import redirect_stderr, redirect_stdout
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from benchmarks import __main__ as suite
+from benchmarks import compare
+
+
+def failing():
+    raise ImportError("cannot import name 'gone'")
+
+
+class BenchmarkSuiteTests(SimpleTestCase):
+    def test_failures_are_recorded_and_the_others_still_run(self):
+        modules = {
+            "broken": SimpleNamespace(run=failing),
+            "working": SimpleNamespace(run=lambda: {"create": {"median_us": 10.0}}),
+        }
+        stdout = io.StringIO()
+        with mock.patch.object(suite, "BENCHMARKS", {"broken": "broken", "working": "working"}), \
+                mock.patch.object(suite, "import_module", modules.__getitem__), \
+                mock.patch.object(suite, "setup"), \
+                redirect_stdout(stdout), redirect_stderr(io.StringIO()), \
+                self.assertRaises(SystemExit) as exit:
+            suite.main([])
+
+        self.assertEqual(exit.exception.code, 1)
+        results = json.loads(stdout.getvalue())["results"]
+        self.assertEqual(results["broken"], {"error": "ImportError: cannot import name 'gone'"})
+        self.assertEqual(results["working"], {"create": {"median_us": 10.0}})
+
+    def test_compare_skips_failed_benchmarks(self):
+        baseline = {
+            "results": {
+                "save": {"create": {"median_us": 10.0, "queries": 2}},
+                "admin": {"page": {"median_us": 5.0}},
+            }
+        }
+        current = {
+            "results": {
+                "save": {"create": {"median_us": 12.0, "queries": 2}},
+                "admin": {"error": "ImportError: cannot import name 'gone'"},
+            }
+        }
+        self.assertEqual(compare.failed(current), {"admin"})
+        self.assertEqual(
+            compare.compare(baseline, current),
+            [("save.create.median_us", 10.0, 12.0, True), ("save.create.queries", 2, 2, False)],
+        )
@@ -0,0 +1,92 @@
+from django.test import SimpleTestCase
+
+from activitylog import metrics
+from activitylog.breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreakerBackend
+
+
+class FakeBackend:
+    def __init__(self):
+        self.failing = False
+        self.written = []
+
+    def _write(self, kind, info):
+        if self.failing:
+            raise RuntimeError("database unavailable")
+        self.written.append((kind, info))
+        return info
+
+    def request(self, info):
+        return self._write("request", info)
+
+    def crud(self, info):
+        return self._write("crud", info)
+
+    def bulk_request(self, infos):
+        return [self._write("request", info) for info in infos]
+
+
+def breaker_state(name):
+    samples = metrics.registry.collect()["activitylog_breaker_state"]["samples"]
+    return dict((labels[0], value) for labels, value in samples)[name]
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def breaker(self, name, **options):
+        backend = FakeBackend()
+        options = {
+            "slow_call_seconds": 10, "window": 10, "min_calls": 4, "cooldown": 3600,
+            "shed_mode": "drop", **options,
+        }
+        return backend, CircuitBreakerBackend(backend=backend, name=name, **options)
+
+    def open(self, backend, breaker):
+        backend.failing = True
+        for number in range(breaker.min_calls):
+            with self.assertRaises(RuntimeError):
+                breaker.crud(number)
+        backend.failing = False
+
+    def test_healthy_backend(self):
+        backend, breaker = self.breaker("healthy")
+        for number in range(20):
+            self.assertEqual(breaker.request(number), number)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(len(backend.written), 20)
+
+    def test_errors_open_the_breaker(self):
+        backend, breaker = self.breaker("errors")
+        self.open(backend, breaker)
+        self.assertEqual(breaker.state, OPEN)
+        self.assertEqual(breaker_state("errors"), 2)
+
+        # request events are shed, CRUD events still written
+        breaker.request(1)
+        breaker.crud(2)
+        self.assertEqual(backend.written, [("crud", 2)])
+
+    def test_slow_writes_open_the_breaker(self):
+        backend, breaker = self.breaker("slow", slow_call_seconds=0)
+        for number in range(4):
+            breaker.crud(number)
+        self.assertEqual(breaker.state, OPEN)
+
+    def test_closes_after_the_cooldown(self):
+        backend, breaker = self.breaker("cooldown", cooldown=0)
+        self.open(backend, breaker)
+        breaker.request(1)
+        self.assertEqual(breaker.state, HALF_OPEN)
+        for number in range(3):
+            breaker.request(number)
+        self.assertEqual(breaker.state, CLOSED)
+        self.assertEqual(breaker_state("cooldown"), 0)
+        self.assertEqual(len(backend.written), 4)
+
+    def test_sample_mode(self):
+        backend, breaker = self.breaker("sample", shed_mode="sample", sample_rate=0.5)
+        self.open(backend, breaker)
+        breaker.bulk_request(list(range(1000)))
+        self.assertTrue(300 < len(backend.written) < 700, len(backend.written))
+
+    def test_unknown_shed_mode(self):
+        with self.assertRaises(ValueError):
+            self.breaker("unknown", shed_mode="queue")
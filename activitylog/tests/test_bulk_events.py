@@ -0,0 +1,137 @@
+import json
+
+from django.contrib.auth.models import Group
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.test import TestCase, override_settings
+
+from activitylog.backends import write_events
+from activitylog.managers import AuditQuerySet
+from activitylog.models import CRUDEvent, CRUDEventObject
+from activitylog.reconstruction import object_events, reconstruct
+
+
+class SummaryQuerySet(AuditQuerySet):
+    audit_bulk_events = "summary"
+
+
+class RowsQuerySet(AuditQuerySet):
+    audit_bulk_events = "rows"
+
+
+@override_settings(TEST=True)
+class RowsModeTests(TestCase):
+    def test_bulk_create_update_delete(self):
+        RowsQuerySet(model=Group).bulk_create([Group(name=f"group{i}") for i in range(10)])
+        self.assertEqual(CRUDEvent.objects.filter(event_type=CRUDEvent.CREATE).count(), 10)
+
+        RowsQuerySet(model=Group).filter(name__in=["group1", "group2"]).update(
+            name=Concat("name", Value("x"))
+        )
+        updates = CRUDEvent.objects.filter(event_type=CRUDEvent.UPDATE)
+        self.assertEqual(updates.count(), 2)
+        old, new = json.loads(updates.first().changed_fields)["name"]
+        self.assertEqual(new, old + "x")
+
+        RowsQuerySet(model=Group).filter(name__endswith="x").delete()
+        deletes = CRUDEvent.objects.filter(event_type=CRUDEvent.DELETE)
+        self.assertEqual(deletes.count(), 2)
+        self.assertEqual(Group.objects.count(), 8)
+
+
+@override_settings(TEST=True)
+class SummaryModeTests(TestCase):
+    def setUp(self):
+        SummaryQuerySet(model=Group).bulk_create([Group(name=f"group{i}") for i in range(5)])
+        self.group = Group.objects.get(name="group1")
+
+    def test_one_event_per_operation(self):
+        event = CRUDEvent.objects.get(event_type=CRUDEvent.BULK_CREATE)
+        pks = sorted(Group.objects.values_list("pk", flat=True))
+        self.assertEqual(event.object_id, "")
+        self.assertEqual(event.object_ids, "," + ",".join(map(str, pks)) + ",")
+        self.assertEqual(json.loads(event.changed_fields), {"count": 5})
+        self.assertEqual(
+            sorted(int(pk) for pk in CRUDEventObject.objects.values_list("object_id", flat=True)),
+            pks,
+        )
+
+        SummaryQuerySet(model=Group).delete()
+        self.assertEqual(CRUDEvent.objects.filter(event_type=CRUDEvent.BULK_DELETE).count(), 1)
+        self.assertFalse(CRUDEvent.objects.filter(event_type=CRUDEvent.DELETE).exists())
+
+    def test_bulk_created_objects_are_reconstructed(self):
+        self.assertEqual(reconstruct(Group, self.group.pk), {"name": "group1", "permissions": []})
+
+    def test_bulk_updates_apply_on_bulk_created_objects(self):
+        SummaryQuerySet(model=Group).filter(pk=self.group.pk).update(name="renamed")
+        self.assertEqual(reconstruct(Group, self.group.pk)["name"], "renamed")
+        self.assertEqual(reconstruct(Group, Group.objects.get(name="group2").pk)["name"], "group2")
+
+    def test_history_and_reconstruction_include_bulk_events(self):
+        other = Group.objects.get(name="group2")
+        self.group.save()
+        SummaryQuerySet(model=Group).filter(pk=self.group.pk).update(name="renamed")
+        SummaryQuerySet(model=Group).filter(pk=other.pk).update(name="other")
+
+        event_types = list(
+            object_events(Group, self.group.pk).order_by("datetime").values_list("event_type", flat=True)
+        )
+        self.assertEqual(event_types, [CRUDEvent.BULK_CREATE, CRUDEvent.UPDATE, CRUDEvent.BULK_UPDATE])
+        self.assertEqual(reconstruct(Group, self.group.pk)["name"], "renamed")
+
+        SummaryQuerySet(model=Group).filter(pk=self.group.pk).delete()
+        self.assertIsNone(reconstruct(Group, self.group.pk))
+
+    def test_expressions_are_not_recorded_as_values(self):
+        SummaryQuerySet(model=Group).filter(pk=self.group.pk).update(name=F("name"))
+        event = CRUDEvent.objects.get(event_type=CRUDEvent.BULK_UPDATE)
+        self.assertEqual(json.loads(event.changed_fields), {"fields": {}, "computed": ["name"]})
+
+
+@override_settings(TEST=True)
+class ObjectEventsTests(TestCase):
+    def test_bulk_events_of_other_objects_are_left_out(self):
+        Group.objects.bulk_create([Group(pk=pk, name=f"group{pk}") for pk in (1, 11, 21)])
+        SummaryQuerySet(model=Group).filter(pk__in=[11, 21]).update(name=Concat("name", Value("x")))
+        SummaryQuerySet(model=Group).filter(pk=1).update(name="renamed")
+
+        events = object_events(Group, 1)
+        self.assertEqual([event.object_ids for event in events], [",1,"])
+
+    def test_written_events_link_their_objects_once(self):
+        event = {
+            "event": "crud",
+            "id": "1f0c6c1e-8d5e-4c4f-9a57-6f3c1b2a7d10",
+            "event_type": CRUDEvent.BULK_DELETE,
+            "object_id": "",
+            "object_ids": ",1,a%2Cb,",
+            "content_type_id": ContentType.objects.get_for_model(Group).pk,
+        }
+        write_events([event], using="default")
+        write_events([event], using="default")
+        self.assertEqual(
+            sorted(CRUDEventObject.objects.values_list("object_id", flat=True)), ["1", "a,b"]
+        )
+        self.assertEqual(object_events(Group, "a,b").get().event_type, CRUDEvent.BULK_DELETE)
+
+    def test_object_rows_are_not_audited(self):
+        SummaryQuerySet(model=Group).bulk_create([Group(name="group")])
+        CRUDEventObject.objects.all().delete()
+        self.assertEqual(CRUDEvent.objects.get().event_type, CRUDEvent.BULK_CREATE)
+
+    def test_objects_without_bulk_events_use_the_timeline_index(self):
+        group = Group.objects.create(name="group")
+        with self.assertNumQueries(2):
+            events = list(object_events(Group, group.pk))
+        self.assertEqual([event.event_type for event in events], [CRUDEvent.CREATE])
+
+
+@override_settings(TEST=True)
+class RowsModeReconstructionTests(TestCase):
+    def test_bulk_created_objects_are_reconstructed(self):
+        RowsQuerySet(model=Group).bulk_create([Group(name="group")])
+        group = Group.objects.get()
+        RowsQuerySet(model=Group).filter(pk=group.pk).update(name="renamed")
+        self.assertEqual(reconstruct(Group, group.pk)["name"], "renamed")
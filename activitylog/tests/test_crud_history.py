@@ -0,0 +1,80 @@
+import json
+
+from django.contrib.admin import site
+from django.contrib.auth.admin import UserAdmin
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.test import RequestFactory, TestCase, override_settings
+
+from activitylog.crudhistory_admin_mixin import CRUDHistoryAdminMixin, parse_changed_fields
+from activitylog.keyset import AFTER_VAR
+from activitylog.models import CRUDEvent
+
+
+class HistoryUserAdmin(CRUDHistoryAdminMixin, UserAdmin):
+    crud_history_per_page = 5
+
+
+@override_settings(TEST=True)
+class CRUDHistoryTests(TestCase):
+    def setUp(self):
+        self.admin_user = User.objects.create_superuser("admin", "admin@example.com", "secret")
+        self.user = User.objects.create(username="bob")
+        self.model_admin = HistoryUserAdmin(User, site)
+
+    def add_update(self, changes):
+        return CRUDEvent.objects.create(
+            event_type=CRUDEvent.UPDATE,
+            object_id=str(self.user.pk),
+            content_type=ContentType.objects.get_for_model(User),
+            changed_fields=json.dumps(changes),
+        )
+
+    def get(self, query=None):
+        request = RequestFactory().get(f"/admin/auth/user/{self.user.pk}/crud_history/", query)
+        request.user = self.admin_user
+        return self.model_admin.crud_history_action(request, self.user).render()
+
+    def test_falsy_old_values_are_shown(self):
+        event = self.add_update({"is_staff": [False, True], "last_name": ["", "B"], "count": [0, 5]})
+        self.assertEqual(
+            parse_changed_fields(event),
+            [
+                {"field": "is_staff", "old": False, "new": True},
+                {"field": "last_name", "old": "", "new": "B"},
+                {"field": "count", "old": 0, "new": 5},
+            ],
+        )
+        response = self.get()
+        self.assertContains(response, "<del>False</del> → True")
+        self.assertContains(response, "<del>0</del> → 5")
+        self.assertContains(response, "<del></del> → B")
+
+    def test_created_values_have_no_old_value(self):
+        event = CRUDEvent.objects.filter(
+            object_id=str(self.user.pk), event_type=CRUDEvent.CREATE
+        ).get()
+        self.assertFalse(any("old" in change for change in parse_changed_fields(event)))
+
+    def test_timeline_is_paginated(self):
+        for i in range(12):
+            self.user.first_name = f"name{i}"
+            self.user.save()
+        response = self.get()
+        self.assertContains(response, "name11")
+        seen = [entry["event"].pk for entry in response.context_data["entries"]]
+        while response.context_data["next_url"]:
+            cursor = response.context_data["next_url"].split(f"{AFTER_VAR}=", 1)[1]
+            response = self.get({AFTER_VAR: cursor})
+            seen += [entry["event"].pk for entry in response.context_data["entries"]]
+        events = CRUDEvent.objects.filter(
+            object_id=str(self.user.pk), content_type=ContentType.objects.get_for_model(User)
+        )
+        self.assertEqual(sorted(seen), sorted(events.values_list("pk", flat=True)))
+        self.assertEqual(self.model_admin.get_crud_history_count(self.user), events.count())
+
+    def test_invalid_cursor_redirects(self):
+        request = RequestFactory().get("/history/", {AFTER_VAR: "bad"})
+        request.user = self.admin_user
+        response = self.model_admin.crud_history_action(request, self.user)
+        self.assertEqual(response.status_code, 302)
@@ -0,0 +1,53 @@
+import json
+from types import SimpleNamespace
+from unittest import mock
+
+from django.db import DatabaseError
+from django.http import HttpResponse
+from django.test import TestCase
+
+from activitylog import detector, metrics
+from activitylog.detector import inspect, normalize_sql, query_shapes
+from activitylog.models import FlaggedRequest
+
+
+def failures():
+    samples = metrics.registry.collect()["activitylog_failures_total"]["samples"]
+    return dict((labels[0], value) for labels, value in samples).get("detector", 0)
+
+
+class DetectorTests(TestCase):
+    context = SimpleNamespace(path="/orders/", method="GET")
+
+    def queries(self, statements):
+        return SimpleNamespace(count=sum(statements.values()), statements=statements)
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT id FROM t WHERE id IN (%s, %s, %s) AND name = 'it''s' LIMIT 21"),
+            normalize_sql("SELECT id  FROM t WHERE id IN (%s) AND name = 'x' LIMIT 5"),
+        )
+        shapes = query_shapes({"SELECT %s": 2, "SELECT 5": 3, "DELETE FROM t": 1})
+        self.assertEqual(shapes[0][1:], [5, "SELECT ?"])
+
+    @mock.patch.object(detector, "DETECTOR_REPEATED_QUERIES", 10)
+    def test_repeated_queries_are_flagged(self):
+        queries = self.queries({"SELECT * FROM item WHERE order_id = %s": 12, "SELECT 1": 1})
+        flagged = inspect(self.context, HttpResponse(), 5, queries)
+
+        self.assertEqual(FlaggedRequest.objects.get(), flagged)
+        self.assertEqual(flagged.reasons, FlaggedRequest.REPEATED)
+        self.assertEqual(json.loads(flagged.query_shapes)[0][1], 12)
+
+    def test_fast_requests_are_not_flagged(self):
+        self.assertIsNone(inspect(self.context, HttpResponse(), 5, self.queries({"SELECT 1": 1})))
+        self.assertFalse(FlaggedRequest.objects.exists())
+
+    @mock.patch.object(detector, "DETECTOR_SLOW_MS", 100)
+    def test_write_errors_are_logged(self):
+        before = failures()
+        with mock.patch.object(
+            FlaggedRequest.objects, "using", side_effect=DatabaseError("unavailable")
+        ), self.assertLogs("activitylog.detector", "ERROR"):
+            self.assertIsNone(inspect(self.context, HttpResponse(), 500, self.queries({})))
+        self.assertEqual(failures(), before + 1)
@@ -0,0 +1,63 @@
+import gc
+import sys
+import weakref
+
+from django.contrib.auth.models import Group, User
+from django.db import connection, models, transaction
+from django.test import TestCase
+
+from activitylog.models import CRUDEvent
+from activitylog.signals.crud_flows import CRUDEventRecord
+
+
+class CRUDEventRecordTests(TestCase):
+    def setUp(self):
+        self.user = User(pk=1, username="alice", first_name="x" * 200)
+        self.record = CRUDEventRecord(
+            "post_save", CRUDEvent.CREATE, self.user, '[{"model": "auth.user"}]'
+        )
+
+    def test_slots(self):
+        self.assertFalse(hasattr(self.record, "__dict__"))
+        with self.assertRaises(AttributeError):
+            self.record.instance = self.user
+
+    def test_keeps_no_instance(self):
+        self.assertFalse(
+            [value for value in gc.get_referents(self.record) if isinstance(value, models.Model)]
+        )
+        self.assertEqual(self.record.pk, 1)
+        self.assertEqual(str(self.record), "alice")
+
+    def test_size_per_row(self):
+        # the record and its values, beyond the serialized instance it has to keep
+        size = sys.getsizeof(self.record) + sum(
+            sys.getsizeof(value)
+            for value in gc.get_referents(self.record)
+            if value is not self.record.object_json_repr and not isinstance(value, type)
+        )
+        self.assertLess(size, 512)
+
+
+class PendingEventTests(TestCase):
+    def test_long_transaction_holds_records_not_instances(self):
+        saved = []
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                for number in range(100):
+                    group = Group.objects.create(name=f"group-{number}")
+                    group.name += "!"
+                    group.save()
+                    saved.append(weakref.ref(group))
+                del group
+                gc.collect()
+
+                pending = [func for _, func, _ in connection.run_on_commit]
+                self.assertEqual(len(pending), 200)
+                self.assertTrue(all(type(func) is CRUDEventRecord for func in pending))
+                # nothing else keeps the saved instances alive until the commit
+                self.assertEqual([ref for ref in saved if ref() is not None], [])
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(CRUDEvent.objects.filter(event_type=CRUDEvent.UPDATE).count(), 100)
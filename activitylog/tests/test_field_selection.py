@@ -0,0 +1,65 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from activitylog import settings as activitylog_settings
+from activitylog.models import CRUDEvent
+from activitylog.registry import ModelAuditPlan, hash_value, registry
+
+USER_FIELDS = {
+    "auth.User": {"exclude_fields": ["last_login", "groups"], "hash_fields": ["password"]}
+}
+
+
+class ModelAuditPlanTests(SimpleTestCase):
+    @mock.patch.object(activitylog_settings, "MODEL_FIELDS", USER_FIELDS)
+    def test_selected_fields(self):
+        plan = ModelAuditPlan(User)
+        diff_fields = [field.name for field in plan.diff_fields]
+        self.assertNotIn("last_login", diff_fields)
+        self.assertNotIn("password", diff_fields)
+        self.assertEqual([field.name for field in plan.hash_fields], ["password"])
+        self.assertNotIn("groups", plan.m2m_field_names)
+        self.assertNotIn("last_login", plan.serialize_fields)
+
+    @mock.patch.object(activitylog_settings, "MODEL_FIELDS", {"auth.User": {"fields": ["nope"]}})
+    def test_unknown_field(self):
+        with self.assertRaises(ImproperlyConfigured):
+            ModelAuditPlan(User)
+
+    def test_all_fields_by_default(self):
+        self.assertIsNone(ModelAuditPlan(User).serialize_fields)
+
+    def test_hash_value(self):
+        self.assertEqual(len(hash_value("secret")), 64)
+        self.assertEqual(hash_value("secret"), hash_value("secret"))
+        self.assertIsNone(hash_value(None))
+
+
+@override_settings(TEST=True)
+@mock.patch.object(activitylog_settings, "MODEL_FIELDS", USER_FIELDS)
+class FieldSelectionEventTests(TestCase):
+    def setUp(self):
+        registry.clear()
+        self.addCleanup(registry.clear)
+
+    def test_events(self):
+        user = User.objects.create(username="alice", password="secret")
+        event = CRUDEvent.objects.get(event_type=CRUDEvent.CREATE)
+        fields = json.loads(event.object_json_repr)[0]["fields"]
+        self.assertNotIn("last_login", fields)
+        self.assertNotIn("groups", fields)
+        self.assertEqual(fields["password"], hash_value("secret"))
+
+        user.password = "other"
+        user.last_login = user.date_joined
+        user.save()
+        event = CRUDEvent.objects.get(event_type=CRUDEvent.UPDATE)
+        self.assertEqual(
+            json.loads(event.changed_fields),
+            {"password": [hash_value("secret"), hash_value("other")]},
+        )
+        self.assertNotIn("other", event.object_json_repr)
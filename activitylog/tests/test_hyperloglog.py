@@ -0,0 +1,76 @@
+import struct
+from datetime import datetime, timedelta, timezone
+
+from django.test import SimpleTestCase, TestCase
+
+from activitylog import rollups
+from activitylog.hyperloglog import SPARSE, HyperLogLog
+from activitylog.models import EventRollup, RequestEvent
+
+START = datetime(2024, 5, 1, 10, 15, tzinfo=timezone.utc)
+
+
+def ips(count, prefix="10.0"):
+    return [f"{prefix}.{number // 256}.{number % 256}" for number in range(count)]
+
+
+class HyperLogLogTests(SimpleTestCase):
+    def test_small_cardinalities_are_exact(self):
+        for count in (0, 1, 50, 512):
+            with self.subTest(count=count):
+                sketch = HyperLogLog().update(ips(count) * 2)
+                self.assertTrue(sketch.exact)
+                self.assertEqual(sketch.estimate(), count)
+
+    def test_large_cardinalities_within_the_standard_error(self):
+        sketch = HyperLogLog().update(range(50000))
+        self.assertFalse(sketch.exact)
+        self.assertLessEqual(len(sketch.registers), 4096)
+        # 3 standard errors of 1.6%
+        self.assertAlmostEqual(sketch.estimate(), 50000, delta=50000 * 0.05)
+
+    def test_round_trip(self):
+        for sketch in (HyperLogLog().update(ips(50)), HyperLogLog().update(range(5000))):
+            with self.subTest(exact=sketch.exact):
+                data = sketch.to_bytes()
+                copy = HyperLogLog.from_bytes(data)
+                self.assertEqual(copy.estimate(), sketch.estimate())
+                self.assertEqual(copy.to_bytes(), data)
+
+    def test_legacy_sparse_encoding(self):
+        sketch = HyperLogLog().update(range(5000))
+        pairs = [(index, rank) for index, rank in enumerate(sketch.registers) if rank]
+        data = bytes((SPARSE, 12)) + b"".join(struct.pack(">HB", *pair) for pair in pairs)
+        self.assertEqual(HyperLogLog.from_bytes(data).estimate(), sketch.estimate())
+
+    def test_merge_across_precisions(self):
+        exact = HyperLogLog(14).update(ips(50)).merge(HyperLogLog(10).update(ips(50, "10.1")))
+        self.assertEqual((exact.precision, exact.estimate()), (10, 100))
+
+        dense = HyperLogLog(14).update(range(50000))
+        dense.merge(HyperLogLog(10).update(range(25000, 80000)))
+        self.assertEqual(dense.precision, 10)
+        self.assertAlmostEqual(dense.estimate(), 80000, delta=80000 * 0.1)
+
+    def test_fold(self):
+        sketch = HyperLogLog(12).update(range(50000))
+        self.assertEqual(sketch.fold(10).registers, HyperLogLog(10).update(range(50000)).registers)
+        with self.assertRaises(ValueError):
+            sketch.fold(14)
+
+
+class RollupSketchTests(TestCase):
+    def test_unique_ips_of_a_day(self):
+        for number, ip in enumerate(ips(50)):
+            event = RequestEvent.objects.create(url="/a/", method="GET", remote_ip=ip)
+            RequestEvent.objects.filter(pk=event.pk).update(
+                datetime=START + timedelta(minutes=number)
+            )
+        rollups.update_rollups("request", batch_size=7, lag=0)
+
+        self.assertEqual(rollups.unique_ips("request", period=rollups.DAY), 50)
+        self.assertEqual(rollups.unique_ips("request", period=rollups.HOUR), 50)
+        sketch = HyperLogLog.from_bytes(
+            EventRollup.objects.get(period=rollups.DAY).ip_sketch
+        )
+        self.assertEqual(sketch.precision, 12)
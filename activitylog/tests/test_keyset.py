@@ -0,0 +1,69 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from activitylog.keyset import InvalidCursor, decode_cursor, encode_cursor, keyset_page
+from activitylog.models import RequestEvent
+
+
+class KeysetPageTests(TestCase):
+    def setUp(self):
+        now = timezone.now()
+        # three events per minute, so that pages split rows sharing a datetime
+        for i in range(25):
+            event = RequestEvent.objects.create(url=f"/{i}/", method="GET")
+            RequestEvent.objects.filter(pk=event.pk).update(datetime=now - timedelta(minutes=i // 3))
+        self.events = list(RequestEvent.objects.order_by("-datetime", "-pk"))
+
+    def walk_forward(self, per_page):
+        pages = [keyset_page(RequestEvent.objects.all(), per_page)]
+        while pages[-1].has_next:
+            pages.append(
+                keyset_page(RequestEvent.objects.all(), per_page, after=pages[-1].next_cursor)
+            )
+        return pages
+
+    def test_forward_pages_cover_every_event_once(self):
+        pages = self.walk_forward(10)
+        self.assertEqual([len(page.object_list) for page in pages], [10, 10, 5])
+        self.assertEqual([event for page in pages for event in page.object_list], self.events)
+        self.assertFalse(pages[0].has_previous)
+        self.assertTrue(pages[1].has_previous)
+        self.assertFalse(pages[-1].has_next)
+
+    def test_backward_page_is_the_previous_page(self):
+        pages = self.walk_forward(10)
+        back = keyset_page(RequestEvent.objects.all(), 10, before=pages[2].previous_cursor)
+        self.assertEqual(back.object_list, pages[1].object_list)
+        self.assertTrue(back.has_previous)
+        self.assertTrue(back.has_next)
+
+    def test_backward_to_the_newest_end_returns_a_full_page(self):
+        # a cursor 4 events from the newest one, as after deleting a few events
+        cursor = encode_cursor(self.events[4])
+        page = keyset_page(RequestEvent.objects.all(), 10, before=cursor)
+        self.assertEqual(page.object_list, self.events[:10])
+        self.assertFalse(page.has_previous)
+        self.assertTrue(page.has_next)
+        self.assertEqual(page.next_cursor, encode_cursor(self.events[9]))
+
+    def test_has_previous_is_probed(self):
+        newest = self.events[0]
+        RequestEvent.objects.filter(pk=newest.pk).delete()
+        page = keyset_page(RequestEvent.objects.all(), 10, after=encode_cursor(newest))
+        self.assertEqual(page.object_list, self.events[1:11])
+        self.assertFalse(page.has_previous)
+
+    def test_filtered_queryset(self):
+        queryset = RequestEvent.objects.filter(url__in=["/0/", "/1/", "/2/"])
+        page = keyset_page(queryset, 2)
+        page = keyset_page(queryset, 2, after=page.next_cursor)
+        self.assertEqual(page.object_list, self.events[2:3])
+        self.assertFalse(page.has_next)
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(RequestEvent, "not-a-cursor")
+        with self.assertRaises(InvalidCursor):
+            keyset_page(RequestEvent.objects.all(), 10, after="bm9wZXxub3Bl")
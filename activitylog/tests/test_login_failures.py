@@ -0,0 +1,109 @@
+from unittest import mock
+
+from django.test import RequestFactory, SimpleTestCase
+
+from activitylog import login_failures
+from activitylog import settings as activitylog_settings
+from activitylog.login_failures import (
+    CacheWindowCounter,
+    LocalWindowCounter,
+    WindowCounter,
+    client_ip,
+)
+from activitylog.signals import auth_signals
+
+
+class WindowCounterTests(SimpleTestCase):
+    def test_counts_slide_with_the_window(self):
+        counter = LocalWindowCounter(window=60, buckets=6, max_keys=10)
+        self.assertEqual(counter.add("ip:1", now=0), 1)
+        self.assertEqual(counter.add("ip:1", now=25), 2)
+        self.assertEqual(counter.add("ip:1", now=59), 3)
+        # the sub-window [0, 10) is out of the window
+        self.assertEqual(counter.count("ip:1", now=60), 2)
+        self.assertEqual(counter.count("ip:1", now=130), 0)
+        self.assertEqual(counter.count("ip:2", now=60), 0)
+
+    def test_least_recently_counted_keys_are_forgotten(self):
+        counter = LocalWindowCounter(window=60, buckets=6, max_keys=2)
+        counter.add("a", now=0)
+        counter.add("b", now=0)
+        counter.add("a", now=1)
+        counter.add("c", now=2)
+        self.assertEqual([counter.count(key, now=3) for key in ("a", "b", "c")], [2, 0, 1])
+
+    def test_cache_counter(self):
+        counter = CacheWindowCounter(window=60, buckets=6, cache="default")
+        counter.cache.clear()
+        self.assertEqual(counter.add("username:bob", now=0), 1)
+        self.assertEqual(counter.add("username:bob", now=30), 2)
+        self.assertEqual(counter.count("username:bob", now=65), 1)
+        counter.add("username:bob")
+        counter.clear("username:bob")
+        self.assertEqual(counter.count("username:bob"), 0)
+
+    def test_counters_implement_the_interface(self):
+        with self.assertRaises(TypeError):
+            WindowCounter(60, 6)
+
+
+@mock.patch.object(activitylog_settings, "LOGIN_FAILURE_LOCKOUT_THRESHOLD", 2)
+class LockoutTests(SimpleTestCase):
+    def setUp(self):
+        counter = LocalWindowCounter(window=60, buckets=6, max_keys=10)
+        patcher = mock.patch.object(login_failures, "_counter", counter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(login_failures._lockout_handler.cache_clear)
+        login_failures._lockout_handler.cache_clear()
+
+    def test_handler_is_called_from_the_threshold(self):
+        handler = mock.Mock()
+        with mock.patch.object(activitylog_settings, "LOGIN_FAILURE_LOCKOUT_HANDLER", handler):
+            login_failures.record_failure(ip="203.0.113.7", username="bob")
+            handler.assert_not_called()
+            failures = login_failures.record_failure(ip="203.0.113.7", username="alice")
+
+        self.assertEqual(failures, {"ip": 2, "username": 1})
+        handler.assert_called_once_with(None, ip="203.0.113.7", username="alice", failures=failures)
+        self.assertTrue(login_failures.is_locked_out(ip="203.0.113.7"))
+        self.assertFalse(login_failures.is_locked_out(username="alice"))
+        login_failures.reset_failures(ip="203.0.113.7")
+        self.assertEqual(login_failures.recent_failures(ip="203.0.113.7", username="bob"), 1)
+
+    def test_failures_without_ip_are_counted_per_username_only(self):
+        request = RequestFactory().post("/login/", REMOTE_ADDR="")
+        auth_signals.track_login_failure(None, {"username": "bob"}, request=request)
+        auth_signals.track_login_failure(None, {"username": "alice"}, request=request)
+
+        self.assertEqual(login_failures.recent_failures(username="bob"), 1)
+        self.assertEqual(
+            login_failures.get_counter()._counts.keys(), {"username:bob", "username:alice"}
+        )
+
+
+class ClientIPTests(SimpleTestCase):
+    factory = RequestFactory()
+
+    def test_remote_addr_without_proxies(self):
+        request = self.factory.get("/", REMOTE_ADDR="203.0.113.7", HTTP_X_FORWARDED_FOR="1.2.3.4")
+        self.assertEqual(client_ip(request, trusted_proxies=0), "203.0.113.7")
+        self.assertIsNone(client_ip(None))
+
+    def test_forwarded_address_seen_by_the_first_trusted_proxy(self):
+        # the client sent "1.2.3.4", the two proxies appended what they saw
+        request = self.factory.get(
+            "/", REMOTE_ADDR="10.0.0.2", HTTP_X_FORWARDED_FOR="1.2.3.4, 203.0.113.7, 10.0.0.1"
+        )
+        self.assertEqual(client_ip(request, trusted_proxies=2), "203.0.113.7")
+        self.assertEqual(client_ip(request, trusted_proxies=1), "10.0.0.1")
+        self.assertIsNone(client_ip(request, trusted_proxies=4))
+
+    def test_tracker_uses_the_setting(self):
+        request = self.factory.post(
+            "/login/", REMOTE_ADDR="10.0.0.1", HTTP_X_FORWARDED_FOR="1.2.3.4, 203.0.113.7"
+        )
+        with mock.patch.object(activitylog_settings, "LOGIN_FAILURE_TRUSTED_PROXIES", 1), \
+                mock.patch.object(login_failures, "record_failure") as record_failure:
+            auth_signals.track_login_failure(None, {"username": "bob"}, request=request)
+        record_failure.assert_called_once_with(request, ip="203.0.113.7", username="bob")
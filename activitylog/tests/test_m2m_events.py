@@ -0,0 +1,62 @@
+import json
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+
+from activitylog.models import CRUDEvent
+from activitylog.signals import model_signals
+
+
+class ReverseM2MEventTests(TestCase):
+    def setUp(self):
+        self.group = Group.objects.create(name="staff")
+        self.alice = User.objects.create(username="alice")
+        self.bob = User.objects.create(username="bob")
+
+    def reverse_events(self):
+        return [
+            json.loads(event.object_json_repr)[0]
+            for event in CRUDEvent.objects.filter(event_type=CRUDEvent.M2M_ADD_REV).order_by(
+                "datetime"
+            )
+        ]
+
+    @override_settings(TEST=True)
+    def test_only_the_delta_is_recorded(self):
+        self.group.user_set.add(self.alice)
+        self.group.user_set.add(self.bob)
+
+        first, second = self.reverse_events()
+        self.assertEqual(first["m2m_rev_pk_set"], [self.alice.pk])
+        self.assertEqual(second["m2m_rev_pk_set"], [self.bob.pk])
+        self.assertNotIn("m2m_rev_pks", first)
+
+    @mock.patch.object(model_signals, "M2M_REV_SNAPSHOT", True)
+    def test_snapshot_is_taken_when_the_membership_changes(self):
+        # both events are written on commit, after the second change
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.user_set.add(self.alice)
+            self.group.user_set.add(self.bob)
+
+        first, second = self.reverse_events()
+        self.assertEqual(first["m2m_rev_pks"], [self.alice.pk])
+        self.assertEqual(second["m2m_rev_pks"], sorted([self.alice.pk, self.bob.pk]))
+
+    @override_settings(TEST=True, DJANGO_ACTIVITY_LOG_PROPAGATE_EXCEPTIONS=True)
+    @mock.patch.object(model_signals, "M2M_REV_SNAPSHOT", True)
+    def test_snapshot_without_field_name(self):
+        # a through model the plan does not know has no m2m field name to filter on
+        model_signals.m2m_changed(
+            sender=Group,
+            instance=self.group,
+            action="post_add",
+            reverse=True,
+            model=User,
+            pk_set={self.alice.pk},
+            using="default",
+        )
+
+        (event,) = self.reverse_events()
+        self.assertEqual(event["m2m_rev_pk_set"], [self.alice.pk])
+        self.assertNotIn("m2m_rev_pks", event)
@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from activitylog.metrics import FILE_PREFIX, MetricsRegistry, merge, render_prometheus
+
+
+def samples(snapshot, name):
+    return {tuple(labels): value for labels, value in snapshot[name]["samples"]}
+
+
+class MetricsMergeTests(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def registry(self):
+        registry = MetricsRegistry(self.directory, write_interval=60)
+        registry.counter("events_total", "Events.", ("kind",))
+        registry.gauge("breaker_state", "Breaker state.", ("breaker",))
+        registry.histogram("write_seconds", "Writes.")
+        # nothing is written at exit, once the directory is gone
+        self.addCleanup(setattr, registry, "directory", None)
+        return registry
+
+    def dead_pid(self):
+        process = subprocess.Popen([sys.executable, "-c", ""])
+        process.wait()
+        return process.pid
+
+    def test_merge(self):
+        merged = merge(
+            [
+                {"events_total": {"type": "counter", "samples": [[["crud"], 2]]}},
+                {"events_total": {"type": "counter", "samples": [[["crud"], 3], [["login"], 1]]}},
+            ]
+        )
+        self.assertEqual(samples(merged, "events_total"), {("crud",): 5, ("login",): 1})
+
+    def test_collect_adds_up_live_processes(self):
+        first, second = self.registry(), self.registry()
+        first._metrics["events_total"].inc("crud", amount=2)
+        first._metrics["write_seconds"].observe(0.003)
+        second._started += 1  # another process that was given the same pid
+        second._metrics["events_total"].inc("crud")
+        second._metrics["write_seconds"].observe(0.2)
+        second.write()
+        self.assertNotEqual(first.path, second.path)
+
+        snapshot = first.collect()
+        self.assertEqual(samples(snapshot, "events_total"), {("crud",): 3})
+        self.assertEqual(samples(snapshot, "write_seconds")[()][-1], 2)
+        self.assertIn('write_seconds_bucket{le="+Inf"} 2', render_prometheus(snapshot))
+
+    def test_files_of_dead_processes_are_removed(self):
+        registry = self.registry()
+        registry._metrics["breaker_state"].set(0, "default")
+        dead = self.registry()
+        dead._metrics["breaker_state"].set(2, "default")
+        dead._metrics["events_total"].inc("crud")
+        dead_path = os.path.join(self.directory, f"{FILE_PREFIX}{self.dead_pid()}-1.json")
+        with open(dead_path, "w") as f:
+            json.dump(dead.snapshot(), f)
+
+        snapshot = registry.collect()
+        # the open breaker of the dead process is not reported
+        self.assertEqual(samples(snapshot, "breaker_state"), {("default",): 0})
+        self.assertEqual(samples(snapshot, "events_total"), {})
+        self.assertFalse(os.path.exists(dead_path))
+
+    def test_stale_files_are_removed(self):
+        registry, stale = self.registry(), self.registry()
+        stale._started += 1
+        stale._metrics["events_total"].inc("crud")
+        stale.write()
+        old = time.time() - registry.stale_after - 1
+        os.utime(stale.path, (old, old))
+
+        self.assertEqual(samples(registry.collect(), "events_total"), {})
+        self.assertFalse(os.path.exists(stale.path))
+
+    def test_reset(self):
+        registry = self.registry()
+        registry._metrics["events_total"].inc("crud")
+        registry.write()
+        registry.reset()
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(samples(registry.collect(), "events_total"), {})
@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from activitylog.backends import ModelBackend
+from activitylog.models import LoginEvent
+from activitylog.pipeline import PipelineBackend, Sink
+
+
+class RecordingBackend:
+    def __init__(self):
+        self.calls = []
+
+    def crud(self, info):
+        self.calls.append(("crud", [info]))
+
+    def bulk_crud(self, infos):
+        self.calls.append(("bulk_crud", infos))
+
+    def login(self, info):
+        self.calls.append(("login", [info]))
+
+
+class BrokenBackend:
+    def crud(self, info):
+        raise RuntimeError("unavailable")
+
+
+class PipelineTests(SimpleTestCase):
+    def test_fan_out(self):
+        first, second = RecordingBackend(), RecordingBackend()
+        pipeline = PipelineBackend(
+            [Sink(BrokenBackend(), events=["crud"]), Sink(first, name="first"), Sink(second, name="second", events=["login"])]
+        )
+        with self.assertLogs("activitylog.pipeline"):
+            pipeline.crud({"object_id": 1})
+        pipeline.login({"username": "alice"})
+
+        (kind, (info,)), _ = first.calls
+        self.assertEqual(kind, "crud")
+        self.assertEqual(info["object_id"], 1)
+        self.assertIn("id", info)
+        self.assertIn("datetime", info)
+        self.assertEqual([kind for kind, _ in second.calls], ["login"])
+
+        metrics = pipeline.metrics()
+        self.assertEqual(metrics["BrokenBackend"]["failed"], 1)
+        self.assertEqual(metrics["first"]["written"], 2)
+        self.assertEqual(metrics["second"]["written"], 1)
+
+    @mock.patch.object(Sink, "_ensure_worker")
+    def test_batches(self, _):
+        backend = RecordingBackend()
+        sink = Sink(backend, batch_size=2)
+        pipeline = PipelineBackend([sink])
+        for pk in range(3):
+            pipeline.crud({"object_id": pk})
+        self.assertEqual(backend.calls, [])
+
+        pipeline.flush()
+        self.assertEqual([kind for kind, _ in backend.calls], ["bulk_crud", "crud"])
+        self.assertEqual(sink.metrics()["written"], 3)
+        self.assertEqual(sink.metrics()["queued"], 0)
+
+    @mock.patch.object(Sink, "_ensure_worker")
+    def test_full_queue_drops(self, _):
+        sink = Sink(RecordingBackend(), batch_size=10, max_queue_size=2)
+        sink.put("crud", [{}, {}, {}])
+        self.assertEqual(sink.metrics()["dropped"], 1)
+        self.assertEqual(sink.metrics()["queued"], 2)
+
+
+class ModelSinkTests(TestCase):
+    def test_model_sink_records_the_dispatched_values(self):
+        recording = RecordingBackend()
+        pipeline = PipelineBackend(
+            [Sink(ModelBackend(), name="model"), Sink(recording, name="recording")]
+        )
+        pipeline.login({"login_type": LoginEvent.LOGIN, "username": "alice"})
+
+        (_, (info,)), = recording.calls
+        event = LoginEvent.objects.get()
+        self.assertEqual((event.id, event.datetime), (info["id"], info["datetime"]))
@@ -0,0 +1,61 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.models import Group, User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from activitylog.models import CRUDCheckpoint, CRUDEvent
+from activitylog.reconstruction import reconstruct, write_checkpoints
+
+
+@override_settings(TEST=True)
+class ReconstructTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(username="bob")
+        self.times = []
+        for i in range(30):
+            self.user.first_name = f"name{i}"
+            self.user.save()
+            self.times.append(timezone.now())
+
+    def test_from_snapshots(self):
+        self.assertEqual(reconstruct(User, self.user.pk)["first_name"], "name29")
+        self.assertEqual(reconstruct(User, self.user.pk, at=self.times[10])["first_name"], "name10")
+
+    def test_from_deltas_and_checkpoints(self):
+        # without update snapshots, the changed_fields deltas are replayed
+        CRUDEvent.objects.filter(event_type=CRUDEvent.UPDATE).update(object_json_repr="")
+        self.assertEqual(reconstruct(User, self.user.pk, at=self.times[10])["first_name"], "name10")
+
+        self.assertEqual(write_checkpoints(User, self.user.pk, 7), 4)
+        self.assertEqual(write_checkpoints(User, self.user.pk, 7), 0)
+        self.assertEqual(CRUDCheckpoint.objects.count(), 4)
+        # the bulk events, the checkpoint, then at most 7 events
+        with self.assertNumQueries(3):
+            state = reconstruct(User, self.user.pk, at=self.times[20])
+        self.assertEqual(state["first_name"], "name20")
+        self.assertEqual(reconstruct(User, self.user.pk)["first_name"], "name29")
+
+    def test_many_to_many_and_delete(self):
+        group = Group.objects.create(name="staff")
+        self.user.groups.add(group)
+        self.assertEqual(reconstruct(User, self.user.pk)["groups"], [group.pk])
+
+        pk = self.user.pk
+        self.user.delete()
+        self.assertIsNone(reconstruct(User, pk))
+        self.assertEqual(reconstruct(User, pk, at=self.times[3])["first_name"], "name3")
+
+    def test_command(self):
+        out = StringIO()
+        call_command(
+            "reconstruct_activitylog_object",
+            "auth.user",
+            str(self.user.pk),
+            "--at",
+            self.times[5].isoformat(),
+            stdout=out,
+        )
+        self.assertEqual(json.loads(out.getvalue())["first_name"], "name5")
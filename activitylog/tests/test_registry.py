@@ -0,0 +1,38 @@
+from django.contrib.auth.models import Group, User
+from django.contrib.sessions.models import Session
+from django.db import models
+from django.test import SimpleTestCase
+from django.test.utils import isolate_apps
+
+from activitylog.models import CRUDEvent
+from activitylog.registry import AuditRegistry, registry
+
+
+class AuditRegistryTests(SimpleTestCase):
+    def test_populated_when_the_app_is_ready(self):
+        self.assertIn(User, registry)
+        self.assertIn(Group, registry)
+
+    def test_unregistered_models_are_not_audited(self):
+        self.assertFalse(registry.get_plan(Session).audited)
+        self.assertFalse(registry.get_plan(CRUDEvent).audited)
+        self.assertTrue(registry.get_plan(User).audited)
+
+    def test_many_to_many_fields(self):
+        through = User.groups.through
+        self.assertEqual(registry.get_plan(User).m2m_fields[through], "groups")
+        self.assertEqual(registry.get_plan(Group).m2m_rev_fields[through], ("groups", "user_set"))
+        self.assertIn("groups", registry.get_plan(User).m2m_field_names)
+
+    @isolate_apps("activitylog")
+    def test_plan_built_on_first_use(self):
+        class Late(models.Model):
+            class Meta:
+                app_label = "activitylog"
+
+        plans = AuditRegistry()
+        self.assertNotIn(Late, plans)
+        plan = plans.get_plan(Late)
+        self.assertIn(Late, plans)
+        self.assertIs(plans.get_plan(Late), plan)
+        self.assertEqual(plan.as_dict()["model"], "activitylog.Late")
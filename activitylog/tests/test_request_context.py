@@ -0,0 +1,49 @@
+from django.contrib.auth.models import User
+from django.core.signals import request_started
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from activitylog.models import CorsEvent, RequestEvent
+from activitylog.signals.request_context import CONTEXT_KEY, get_request_context
+
+
+class RequestContextTests(TestCase):
+    def test_request_and_cors_events_share_the_context(self):
+        user = User.objects.create_user("alice", password="secret")
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/missing/", HTTP_X_FRONTEND_URL="/front/", HTTP_URL_METHOD="POST")
+
+        request_event = RequestEvent.objects.get()
+        cors_event = CorsEvent.objects.get()
+        self.assertEqual(request_event.url, "/missing/")
+        self.assertEqual((cors_event.url, cors_event.method), ("/front/", "POST"))
+        self.assertEqual(request_event.user_id, user.pk)
+        self.assertEqual(cors_event.user_id, user.pk)
+        # the session and the user are loaded once for both events
+        sessions = [query for query in queries if 'FROM "django_session"' in query["sql"]]
+        self.assertEqual(len(sessions), 1)
+
+    def test_asgi_scope(self):
+        scope = {
+            "type": "http",
+            "path": "/page/",
+            "method": "GET",
+            "query_string": b"page=2",
+            "headers": [(b"x-frontend-url", b"/front/"), (b"sec-ch-ua", b"Chrome")],
+            "client": None,
+        }
+        context = get_request_context(scope=scope)
+        self.assertIs(scope[CONTEXT_KEY], context)
+        self.assertIs(get_request_context(scope=scope), context)
+
+        info = context.event_info(context.frontend_url, context.url_method)
+        self.assertEqual(info["url"], "/front/")
+        self.assertEqual(info["browser"], "Chrome")
+        self.assertEqual(info["query_string"], "page=2")
+        self.assertIsNone(info["user_id"])
+
+        request_started.send(sender=None, scope=scope)
+        self.assertEqual(RequestEvent.objects.count(), 1)
+        self.assertEqual(CorsEvent.objects.count(), 1)
@@ -0,0 +1,61 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from activitylog import metrics
+from activitylog.metrics import MetricsRegistry, RequestCost
+from activitylog.middleware import middleware
+from activitylog.middleware.middleware import ActivityLogMiddleware
+
+
+class RequestCostTests(TestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry()
+        self.outer = self.registry.histogram("outer_seconds", "Outer.", section="handlers")
+        self.inner = self.registry.histogram("inner_seconds", "Inner.", section="write")
+
+    def test_nested_sections(self):
+        metrics.start_request_cost()
+        with self.outer.time():
+            with self.inner.time():
+                with self.inner.time():
+                    pass
+        cost = metrics.pop_request_cost()
+        self.assertIsNone(metrics.pop_request_cost())
+
+        self.assertEqual(set(cost.sections), {"handlers", "write"})
+        self.assertLessEqual(cost.sections["write"], cost.sections["handlers"])
+        self.assertLessEqual(cost.sections["handlers"], cost.total)
+        # the inner section of the same name is not counted twice
+        self.assertEqual(self.inner.samples()[0][1][-1], 2)
+
+    def test_queries_counted_inside_sections(self):
+        cost = RequestCost()
+        cost.enter("write")
+        execute = mock.Mock()
+        with mock.patch.object(metrics, "_request_cost") as current:
+            current.get.return_value = cost
+            metrics._count_query(execute, "SELECT 1", None, False, {})
+            cost.leave(0.001)
+            metrics._count_query(execute, "SELECT 1", None, False, {})
+        self.assertEqual(cost.queries, 1)
+        self.assertEqual(execute.call_count, 2)
+
+    @override_settings(TEST=True)
+    @mock.patch.object(middleware, "SERVER_TIMING", True)
+    def test_server_timing_header(self):
+        metrics.start_request_cost()
+        with metrics.handler_seconds.time("post_save"):
+            Group.objects.create(name="staff")
+        response = HttpResponse()
+        response["Server-Timing"] = "app;dur=1"
+        ActivityLogMiddleware(lambda request: response).report_cost(
+            RequestFactory().get("/"), response
+        )
+
+        timing = response["Server-Timing"]
+        self.assertTrue(timing.startswith("app;dur=1, activitylog;dur="))
+        self.assertIn("activitylog-handlers;dur=", timing)
+        self.assertIsNone(metrics.pop_request_cost())
@@ -0,0 +1,48 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase
+
+from activitylog.models import RequestEvent
+from activitylog.signals import request_signals
+from activitylog.signals.request_signals import QueryCounter, log_response
+
+
+@mock.patch.object(request_signals, "CAPTURE_RESPONSES", True)
+class ResponseEventTests(TestCase):
+    def log(self, path, response, duration=0.05, user=None):
+        request = RequestFactory().get(path)
+        if user is not None:
+            request.user = user
+        queries = QueryCounter()
+        queries.count = 3
+        try:
+            log_response(request, response, duration, queries)
+        finally:
+            queries.stop()
+
+    def test_response_fields(self):
+        user = User.objects.create_user("alice", password="secret")
+        self.log("/page/", HttpResponse("hello"), user=user)
+
+        event = RequestEvent.objects.get(url="/page/")
+        self.assertEqual(event.status_code, 200)
+        self.assertEqual(event.response_bytes, 5)
+        self.assertEqual(event.duration_ms, 50)
+        self.assertEqual(event.db_query_count, 3)
+        self.assertEqual(event.user_id, user.pk)
+
+    def test_streaming_response_size_unknown(self):
+        self.log("/stream/", StreamingHttpResponse(iter(["a", "b"])))
+        self.assertIsNone(RequestEvent.objects.get(url="/stream/").response_bytes)
+
+    @mock.patch.object(request_signals, "REQUEST_EVENT_SLOW_MS", 250)
+    @mock.patch.object(request_signals, "REQUEST_EVENT_NON_2XX", True)
+    def test_only_slow_or_failed_requests(self):
+        self.log("/fast/", HttpResponse())
+        self.log("/missing/", HttpResponse(status=404))
+        self.log("/slow/", HttpResponse(), duration=0.3)
+        self.assertEqual(
+            set(RequestEvent.objects.values_list("url", flat=True)), {"/missing/", "/slow/"}
+        )
@@ -0,0 +1,93 @@
+import io
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
+from django.test import TestCase
+
+from activitylog import rollups
+from activitylog.models import CRUDEvent, EventRollup, LoginEvent, RequestEvent, RollupWatermark
+
+START = datetime(2024, 5, 1, 10, 15, tzinfo=timezone.utc)
+
+
+def at(model, when, **fields):
+    event = model.objects.create(**fields)
+    # datetime is set by auto_now_add
+    model.objects.filter(pk=event.pk).update(datetime=when)
+
+
+def request(url, when, method="GET"):
+    at(RequestEvent, when, url=url, method=method, remote_ip="10.0.0.1")
+
+
+class RollupTests(TestCase):
+    def test_incremental_counts(self):
+        for number in range(7):
+            request("/a/", START + timedelta(minutes=10 * number))
+        request("/b/", START)
+        request("/b/", START, method="POST")
+
+        self.assertEqual(rollups.update_rollups("request", batch_size=3, lag=0), 9)
+        self.assertEqual(rollups.update_rollups("request", lag=0), 0)
+        self.assertEqual(
+            rollups.series("request", rollups.HOUR, key="/a/"),
+            [(START.replace(minute=0), 5), (START.replace(hour=11, minute=0), 2)],
+        )
+        self.assertEqual(rollups.requests_per_url(period=rollups.DAY), [("/a/", 7), ("/b/", 2)])
+
+        # only the events after the watermark are counted
+        request("/b/", START + timedelta(minutes=61))
+        self.assertEqual(rollups.update_rollups("request", lag=0), 1)
+        self.assertEqual(rollups.top("request", rollups.DAY), [("/a/", 7), ("/b/", 3)])
+
+    def test_late_events_are_counted(self):
+        now = datetime.now(timezone.utc)
+        request("/a/", now - timedelta(seconds=90))
+        self.assertEqual(rollups.update_rollups("request", lag=0), 1)
+        # written after the first run, e.g. by the segment backend, 4 minutes after the request
+        request("/late/", now - timedelta(seconds=240))
+        request("/replayed/", START)
+        self.assertEqual(rollups.update_rollups("request", lag=0), 2)
+        self.assertEqual(rollups.top("request", rollups.HOUR, start=START), [
+            ("/a/", 1), ("/late/", 1), ("/replayed/", 1)
+        ])
+
+    def test_rebuild(self):
+        request("/a/", START)
+        request("/b/", START - timedelta(days=1))
+        rollups.update_rollups("request", lag=0)
+        EventRollup.objects.update(count=0)
+        request("/c/", START)
+
+        call_command(
+            "rollup_activitylog", "--rebuild-since", "2024-05-01", "--lag", "0",
+            stdout=io.StringIO(),
+        )
+        self.assertEqual(
+            rollups.top("request", rollups.DAY), [("/a/", 1), ("/c/", 1), ("/b/", 0)]
+        )
+        self.assertEqual(rollups.rebuild_rollups("request", START, batch_size=1), 2)
+        self.assertEqual(
+            rollups.top("request", rollups.DAY), [("/a/", 1), ("/c/", 1), ("/b/", 0)]
+        )
+
+    def test_recent_events_wait_for_the_lag(self):
+        request("/now/", datetime.now(timezone.utc))
+        self.assertEqual(rollups.update_rollups("request", lag=60), 0)
+        self.assertFalse(RollupWatermark.objects.exists())
+
+    def test_logins_and_crud_events(self):
+        for _ in range(3):
+            at(LoginEvent, START, login_type=LoginEvent.FAILED, username="bob")
+        at(LoginEvent, START, login_type=LoginEvent.LOGIN, username="bob")
+        content_type = ContentType.objects.get_for_model(User)
+        at(CRUDEvent, START, event_type=CRUDEvent.CREATE, object_id="1", content_type=content_type)
+        rollups.update_rollups("login", lag=0)
+        rollups.update_rollups("crud", lag=0)
+
+        self.assertEqual(rollups.failed_logins(), [(START.replace(hour=0, minute=0), 3)])
+        self.assertEqual(rollups.crud_events_per_model(), [("auth.user", 1)])
+        self.assertEqual(rollups.crud_events_per_model(event_type=CRUDEvent.DELETE), [])
+        self.assertEqual(RollupWatermark.objects.count(), 2)
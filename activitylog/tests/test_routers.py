@@ -0,0 +1,35 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase
+
+from activitylog import routers
+from activitylog.models import CRUDEvent, LoginEvent
+from activitylog.routers import ActivityLogRouter
+
+
+@mock.patch.object(routers, "DATABASE_ALIAS", "audit")
+class ActivityLogRouterTests(SimpleTestCase):
+    def setUp(self):
+        self.router = ActivityLogRouter()
+
+    def test_event_tables_on_the_audit_alias(self):
+        self.assertEqual(self.router.db_for_read(CRUDEvent), "audit")
+        self.assertEqual(self.router.db_for_write(LoginEvent), "audit")
+        self.assertIsNone(self.router.db_for_read(User))
+        self.assertIsNone(self.router.db_for_write(User))
+
+    def test_related_objects_stay_on_their_database(self):
+        event = LoginEvent(login_type=LoginEvent.LOGIN)
+        self.assertEqual(self.router.db_for_read(User, instance=event), "default")
+        self.assertEqual(self.router.db_for_write(User, instance=event), "default")
+        self.assertIsNone(self.router.db_for_read(User, instance=User()))
+
+    def test_relations(self):
+        self.assertTrue(self.router.allow_relation(LoginEvent(), User()))
+        self.assertIsNone(self.router.allow_relation(User(), User()))
+
+    def test_migrations(self):
+        self.assertTrue(self.router.allow_migrate("audit", "activitylog"))
+        self.assertFalse(self.router.allow_migrate("default", "activitylog"))
+        self.assertIsNone(self.router.allow_migrate("default", "auth"))
@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.contrib.auth.models import Group, User
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from activitylog.models import CRUDEvent
+from activitylog.signals import model_signals
+from activitylog.utils import isolated
+
+
+class SignalSavepointTests(TestCase):
+    def assertSavepointsOnlyAroundReads(self, queries):
+        inside = None
+        for sql in (query["sql"] for query in queries):
+            if sql.startswith("SAVEPOINT"):
+                inside = []
+            elif sql.startswith(("RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")):
+                self.assertTrue(inside)
+                self.assertTrue(all(read.startswith("SELECT") for read in inside), inside)
+                inside = None
+            elif inside is not None:
+                inside.append(sql)
+
+    def test_audited_saves_only_isolate_their_reads(self):
+        # events are written on commit; only the signal handlers run here
+        with self.captureOnCommitCallbacks() as callbacks:
+            with CaptureQueriesContext(connection) as queries:
+                group = Group.objects.create(name="staff")
+                group.name = "admins"
+                group.save()
+                user = User.objects.create(username="alice")
+                group.user_set.add(user)
+                group.delete()
+        self.assertSavepointsOnlyAroundReads(queries)
+        # the old row read by pre_save
+        self.assertTrue(any(query["sql"].startswith("SAVEPOINT") for query in queries))
+        self.assertEqual(len(callbacks), 5)
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(CRUDEvent.objects.count(), 5)
+
+
+class IsolatedTests(TransactionTestCase):
+    def test_savepoint_only_inside_a_transaction(self):
+        with CaptureQueriesContext(connection) as queries:
+            with isolated("default"):
+                Group.objects.create(name="staff")
+        self.assertFalse(any("SAVEPOINT" in query["sql"] for query in queries))
+
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                with isolated("default"):
+                    Group.objects.create(name="admins")
+        self.assertTrue(any("SAVEPOINT" in query["sql"] for query in queries))
+
+
+class AbortOnError:
+    """Fails every statement after ``failing`` until a rollback, as PostgreSQL does."""
+
+    def __init__(self, failing):
+        self.failing = failing
+        self.aborted = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith("ROLLBACK"):
+            self.aborted = False
+        elif self.aborted:
+            raise DatabaseError("current transaction is aborted")
+        elif self.failing in sql:
+            self.aborted = True
+            raise DatabaseError(f"{self.failing} failed")
+        return execute(sql, params, many, context)
+
+
+class AuditReadFailureTests(TransactionTestCase):
+    def test_failed_snapshot_keeps_the_transaction(self):
+        group = Group.objects.create(name="staff")
+        user = User.objects.create(username="alice")
+        # the reverse membership snapshot of m2m_changed
+        snapshot = 'SELECT "auth_user"."id" FROM "auth_user" INNER JOIN'
+        with mock.patch.object(model_signals, "M2M_REV_SNAPSHOT", True), \
+                self.assertLogs("activitylog.signals.model_signals"), \
+                connection.execute_wrapper(AbortOnError(snapshot)):
+            with transaction.atomic():
+                group.user_set.add(user)
+                Group.objects.filter(pk=group.pk).update(name="admins")
+
+        self.assertEqual(Group.objects.get().name, "admins")
+        self.assertEqual(list(group.user_set.all()), [user])
+
+    def test_failed_old_row_read_keeps_the_transaction(self):
+        group = Group.objects.create(name="staff")
+        old_row = 'SELECT "auth_group"."id", "auth_group"."name" FROM "auth_group" WHERE'
+        with self.assertLogs("activitylog.signals.model_signals"), \
+                connection.execute_wrapper(AbortOnError(old_row)):
+            with transaction.atomic():
+                group.name = "admins"
+                group.save()
+                User.objects.create(username="alice")
+
+        self.assertEqual(Group.objects.get().name, "admins")
+        self.assertTrue(User.objects.filter(username="alice").exists())
@@ -0,0 +1,105 @@
+import io
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from activitylog.backends import write_events
+from activitylog.management.commands.ingest_activitylog_segments import INGESTED_DIR
+from activitylog.models import LoginEvent, RequestEvent
+from activitylog.segments import SegmentBackend, closed_segments
+from activitylog.settings import SEGMENT_MAX_AGE
+
+
+def request_info(number, when):
+    return {"url": f"/page/{number}", "method": "GET", "remote_ip": "10.0.0.1", "datetime": when}
+
+
+class WriteEventsTests(TestCase):
+    def test_keeps_datetime_and_skips_written_events(self):
+        past = timezone.now() - timedelta(days=3)
+        event = {"event": "request", "id": uuid.uuid4(), **request_info(1, past)}
+        write_events([event], using="default")
+        login = {"event": "login", "id": uuid.uuid4(), "login_type": LoginEvent.LOGIN}
+        write_events([event, login], using="default")
+
+        self.assertEqual(RequestEvent.objects.get().datetime, past)
+        self.assertIsNotNone(LoginEvent.objects.get().datetime)
+        # events without a datetime still get the current time
+        created = RequestEvent.objects.create(url="/now", method="GET")
+        self.assertGreater(created.datetime, past)
+        self.assertEqual(
+            RequestEvent.objects.create(url="/then", method="GET", datetime=past).datetime, past
+        )
+
+
+class SegmentIngestTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_ingest(self):
+        for compress in (False, True):
+            with self.subTest(compress=compress):
+                RequestEvent.objects.all().delete()
+                LoginEvent.objects.all().delete()
+                backend = SegmentBackend(
+                    self.directory, max_bytes=600, max_age=100, compress=compress
+                )
+                past = timezone.now() - timedelta(days=3)
+                for number in range(10):
+                    backend.request(request_info(number, past))
+                backend.login({"login_type": LoginEvent.LOGIN, "username": "alice"})
+                backend.close()
+                self.assertGreater(len(closed_segments(self.directory)), 1)
+
+                call_command(
+                    "ingest_activitylog_segments",
+                    directory=self.directory,
+                    batch_size=3,
+                    stdout=io.StringIO(),
+                )
+                # segments store datetimes to the millisecond
+                old = RequestEvent.objects.filter(datetime__lt=past + timedelta(seconds=1))
+                self.assertEqual(old.count(), 10)
+                self.assertEqual(LoginEvent.objects.count(), 1)
+                self.assertEqual(closed_segments(self.directory), [])
+
+                # ingesting the same segments again writes nothing new
+                ingested = os.path.join(self.directory, INGESTED_DIR)
+                for name in os.listdir(ingested):
+                    os.replace(os.path.join(ingested, name), os.path.join(self.directory, name))
+                call_command(
+                    "ingest_activitylog_segments",
+                    directory=self.directory,
+                    delete=True,
+                    stdout=io.StringIO(),
+                )
+                self.assertEqual(RequestEvent.objects.count(), 10)
+                self.assertEqual(LoginEvent.objects.count(), 1)
+                self.assertEqual(os.listdir(self.directory), [INGESTED_DIR])
+
+    def test_open_segments_are_recovered(self):
+        backend = SegmentBackend(self.directory)
+        backend.request(request_info(1, timezone.now()))
+        self.assertEqual(closed_segments(self.directory), [])
+        self.assertEqual(len(closed_segments(self.directory, recover_older_than=-1)), 1)
+
+    def test_open_segments_are_recovered_only_after_max_age(self):
+        backend = SegmentBackend(self.directory)
+        self.addCleanup(backend.close)
+        backend.request(request_info(1, timezone.now()))
+        with self.assertRaisesMessage(CommandError, "DJANGO_ACTIVITY_LOG_SEGMENT_MAX_AGE"):
+            call_command(
+                "ingest_activitylog_segments",
+                directory=self.directory,
+                recover_older_than=SEGMENT_MAX_AGE - 1,
+                stdout=io.StringIO(),
+            )
+        self.assertEqual(RequestEvent.objects.count(), 0)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
@@ -0,0 +1,80 @@
+import io
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase
+from django.utils import timezone
+
+from activitylog.backends import ModelBackend
+from activitylog.breaker import CircuitBreakerBackend
+from activitylog.models import LoginEvent, RequestEvent
+from activitylog.spool import Spool, SpoolingBackend
+
+
+def request_info(url):
+    return {"url": url, "method": "GET", "remote_ip": "10.0.0.1", "datetime": timezone.now()}
+
+
+class FailingBackend(ModelBackend):
+    """Writes the event, then fails as if the commit acknowledgement was lost."""
+
+    def request(self, request_info):
+        super().request(request_info)
+        raise DatabaseError("connection lost")
+
+    def bulk_login(self, login_infos):
+        raise DatabaseError("database unavailable")
+
+
+class SpoolTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.spool = Spool(self.directory)
+
+    def replay(self):
+        self.spool.close()
+        call_command("replay_activitylog_spool", directory=self.directory, stdout=io.StringIO())
+
+    def test_failed_writes_are_spooled_and_replayed(self):
+        backend = SpoolingBackend(FailingBackend(), spool=self.spool)
+        with self.assertLogs("activitylog.spool", "WARNING"):
+            backend.request(request_info("/written"))
+            backend.bulk_login(
+                [
+                    {"login_type": LoginEvent.LOGIN, "username": "alice"},
+                    {"login_type": LoginEvent.LOGIN, "username": "bob"},
+                ]
+            )
+        self.assertEqual(LoginEvent.objects.count(), 0)
+
+        self.replay()
+        self.assertEqual(LoginEvent.objects.count(), 2)
+        # the event written before the failure keeps its id and is not duplicated
+        self.assertEqual(RequestEvent.objects.filter(url="/written").count(), 1)
+        self.replay()
+        self.assertEqual(LoginEvent.objects.count(), 2)
+
+    def test_breaker_spools_shed_events(self):
+        class Unavailable:
+            def crud(self, crud_info):
+                raise DatabaseError("database unavailable")
+
+            def request(self, request_info):
+                raise AssertionError("request events are shed")
+
+        with mock.patch("activitylog.breaker.get_spool", return_value=self.spool):
+            breaker = CircuitBreakerBackend(
+                backend=Unavailable(), name="spool", min_calls=2, window=2, cooldown=3600,
+                shed_mode="spool",
+            )
+        for _ in range(2):
+            with self.assertRaises(DatabaseError):
+                breaker.crud({})
+        breaker.request(request_info("/shed"))
+
+        self.replay()
+        self.assertTrue(RequestEvent.objects.filter(url="/shed").exists())
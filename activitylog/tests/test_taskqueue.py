@@ -0,0 +1,174 @@
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import uuid
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase, TransactionTestCase
+
+from activitylog.management.commands.run_activitylog_worker import Command
+from activitylog.models import CRUDEvent, RequestEvent
+from activitylog.taskqueue import BaseBroker, MemoryBroker, QueueBackend, SQLiteBroker
+
+
+def request_event(number, **extra):
+    return {
+        "event": "request", "id": str(uuid.uuid4()), "url": f"/{number}", "method": "GET", **extra
+    }
+
+
+class BrokerTests(TestCase):
+    def test_base_broker_is_abstract(self):
+        with self.assertRaises(TypeError):
+            BaseBroker()
+
+    def test_memory_broker(self):
+        broker = MemoryBroker(visibility_timeout=0)
+        broker.enqueue([{"number": 1}, {"number": 2}])
+        (job,) = broker.reserve(1)
+        self.assertEqual(job[1:], ({"number": 1}, 1))
+        # not acknowledged, the job is handed out again
+        self.assertEqual([attempts for _, _, attempts in broker.reserve(5)], [2, 1])
+        broker.ack([job[0]])
+        broker.bury([2], error="boom")
+        self.assertEqual(broker.size(), 0)
+        self.assertEqual(broker.dead_size(), 1)
+
+    def test_sqlite_broker(self):
+        with tempfile.TemporaryDirectory() as directory:
+            broker = SQLiteBroker(os.path.join(directory, "queue.sqlite3"), visibility_timeout=0)
+            broker.enqueue([{"number": 1}, {"number": 2}])
+            broker.reserve(1)
+            jobs = broker.reserve(5)
+            self.assertEqual([attempts for _, _, attempts in jobs], [2, 1])
+            broker.ack([jobs[1][0]])
+            broker.bury([jobs[0][0]], error="boom")
+            self.assertEqual(broker.size(), 0)
+            self.assertEqual(broker.dead_size(), 1)
+
+    def test_failed_reservation_is_rolled_back(self):
+        with tempfile.TemporaryDirectory() as directory:
+            broker = SQLiteBroker(os.path.join(directory, "queue.sqlite3"))
+            broker.enqueue([{"number": 1}, {"number": 2}])
+            connection = broker._connect()
+
+            class LockedOnCommit:
+                in_transaction = property(lambda self: connection.in_transaction)
+
+                def execute(self, sql, *args):
+                    if sql == "COMMIT":
+                        raise sqlite3.OperationalError("database is locked")
+                    return connection.execute(sql, *args)
+
+                def executemany(self, sql, *args):
+                    return connection.executemany(sql, *args)
+
+            with mock.patch.object(broker, "_connect", return_value=LockedOnCommit()):
+                with self.assertRaises(sqlite3.OperationalError):
+                    broker.reserve(5)
+            # nothing was reserved, and the connection is not left in a transaction
+            self.assertFalse(connection.in_transaction)
+            self.assertEqual(
+                [job[1:] for job in broker.reserve(5)], [({"number": 1}, 1), ({"number": 2}, 1)]
+            )
+
+    def test_concurrent_reservations(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "queue.sqlite3")
+            SQLiteBroker(path).enqueue([{"number": number} for number in range(200)])
+            reserved = []
+
+            def reserve():
+                broker = SQLiteBroker(path)
+                while jobs := broker.reserve(3):
+                    reserved.extend(job[1]["number"] for job in jobs)
+                    broker.ack([job[0] for job in jobs])
+
+            threads = [threading.Thread(target=reserve) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(sorted(reserved), list(range(200)))
+
+
+class WorkerTests(TestCase):
+    def setUp(self):
+        self.broker = MemoryBroker(visibility_timeout=0)
+        self.command = Command()
+        self.command.broker = self.broker
+        self.command.lock = threading.Lock()
+        self.command.written = self.command.buried = 0
+
+    def test_bad_event_does_not_fail_the_batch(self):
+        bad = request_event(0, datetime="not a date")
+        self.broker.enqueue([request_event(1), bad, request_event(2)])
+
+        with self.assertLogs("activitylog.management.commands.run_activitylog_worker"):
+            self.assertEqual(self.command.process(self.broker.reserve(10), max_attempts=2), 2)
+        self.assertEqual(RequestEvent.objects.count(), 2)
+        # retried, then moved to the dead letters once other events were written
+        self.broker.enqueue([request_event(3)])
+        with self.assertLogs("activitylog.management.commands.run_activitylog_worker"):
+            self.command.process(self.broker.reserve(10), max_attempts=2)
+        self.assertEqual(RequestEvent.objects.count(), 3)
+        self.assertEqual(self.broker.size(), 0)
+        self.assertEqual([event for _, event, _, _ in self.broker.dead], [bad])
+
+    def test_nothing_buried_when_nothing_can_be_written(self):
+        self.broker.enqueue([request_event(1)])
+        with mock.patch(
+            "activitylog.management.commands.run_activitylog_worker.write_events",
+            side_effect=RuntimeError("database unavailable"),
+        ), self.assertLogs("activitylog.management.commands.run_activitylog_worker"):
+            self.assertEqual(self.command.process(self.broker.reserve(10), max_attempts=1), 0)
+        self.assertEqual(self.broker.size(), 1)
+        self.assertEqual(self.broker.dead_size(), 0)
+
+    def test_failed_reservation_does_not_stop_the_worker(self):
+        self.broker.enqueue([request_event(1)])
+        reserve = self.broker.reserve
+        options = {"batch_size": 10, "max_attempts": 5, "poll_interval": 0, "once": True}
+        locked = sqlite3.OperationalError("database is locked")
+        with mock.patch.object(
+            self.broker, "reserve", side_effect=[locked, reserve(10), []]
+        ), mock.patch(
+            "activitylog.management.commands.run_activitylog_worker.connections"
+        ), self.assertLogs("activitylog.management.commands.run_activitylog_worker"):
+            self.command.work(options)
+        self.assertEqual(RequestEvent.objects.count(), 1)
+        self.assertEqual(self.broker.size(), 0)
+
+    def test_refuses_memory_broker(self):
+        with mock.patch(
+            "activitylog.management.commands.run_activitylog_worker.get_broker",
+            return_value=self.broker,
+        ), self.assertRaises(CommandError):
+            call_command("run_activitylog_worker", once=True)
+
+
+class QueueWorkerCommandTests(TransactionTestCase):
+    def test_drains_the_queue(self):
+        with tempfile.TemporaryDirectory() as directory:
+            broker = SQLiteBroker(os.path.join(directory, "queue.sqlite3"))
+            backend = QueueBackend(broker)
+            for number in range(25):
+                backend.request({"url": f"/{number}", "method": "GET"})
+            backend.bulk_crud(
+                [{"event_type": CRUDEvent.CREATE, "object_id": "1", "content_type_id": 1}]
+            )
+            with mock.patch(
+                "activitylog.management.commands.run_activitylog_worker.get_broker",
+                return_value=broker,
+            ):
+                call_command(
+                    # one thread: the in-memory test database is locked by concurrent writers
+                    "run_activitylog_worker", once=True, concurrency=1, batch_size=4,
+                    stdout=io.StringIO(),
+                )
+            self.assertEqual(RequestEvent.objects.count(), 25)
+            self.assertEqual(CRUDEvent.objects.count(), 1)
+            self.assertEqual(broker.size(), 0)
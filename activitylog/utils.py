@@ -1,7 +1,10 @@
+import contextlib
 import datetime as dt
+from threading import local
 
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connections, transaction
 from django.db.models import NOT_PROVIDED, DateTimeField
 from django.utils import timezone
 from django.utils.encoding import smart_str
@@ -35,20 +38,23 @@ def get_field_value(obj, field):
     return value
 
 
-def model_delta(old_model, new_model):
+def model_delta(old_model, new_model, fields=None):
     """Provide delta/difference between two models.
 
     :param old: The old state of the model instance.
     :type old: Model
     :param new: The new state of the model instance.
     :type new: Model
+    :param fields: The fields to compare, all concrete fields by default.
+    :type fields: Iterable[Field]
     :return: A dictionary with the names of the changed fields as keys and a
              two tuple of the old and new field values
              as value.
     :rtype: dict
     """
     delta = {}
-    fields = new_model._meta.fields
+    if fields is None:
+        fields = new_model._meta.fields
     for field in fields:
         old_value = get_field_value(old_model, field)
         new_value = get_field_value(new_model, field)
@@ -61,26 +67,42 @@ def model_delta(old_model, new_model):
     return delta
 
 
-def get_m2m_field_name(model, instance):
-    """Find M2M field name on instance.
+def should_propagate_exceptions():
+    """Whether Django Activity Log should propagate signal handler exceptions.
 
-    Called from m2m_changed signal
-    :param model: m2m_changed signal model.
-    :type model: Model
-    :param instance:m2m_changed signal instance.
-    :type new: Model
-    :return: ManyToManyField name of instance related to model.
-    :rtype: str
+    :rtype: bool
     """
-    for x in model._meta.related_objects:
-        if x.related_model().__class__ == instance.__class__:
-            return x.remote_field.name
-    return None
+    return getattr(settings, "DJANGO_ACTIVITY_LOG_PROPAGATE_EXCEPTIONS", False)
 
 
-def should_propagate_exceptions():
-    """Whether Django Activity Log should propagate signal handler exceptions.
+def isolated(using):
+    """``transaction.atomic()`` only when already inside a transaction.
 
-    :rtype: bool
+    There a failing query would break the caller's transaction, so it gets a
+    savepoint. In autocommit mode, e.g. in ``on_commit`` callbacks, no BEGIN/COMMIT
+    round trip is spent on what is a single statement.
     """
-    return getattr(settings, "DJANGO_ACTIVITY_LOG_PROPAGATE_EXCEPTIONS", False)
\ No newline at end of file
+    if connections[using].in_atomic_block:
+        return transaction.atomic(using=using)
+    return contextlib.nullcontext()
+
+
+_audit_state = local()
+
+
+@contextlib.contextmanager
+def suppress_instance_auditing(model):
+    """Skip the per-instance signal handlers for ``model`` inside the block.
+
+    Used by bulk operations that record their own events.
+    """
+    previous = getattr(_audit_state, "suppressed_models", frozenset())
+    _audit_state.suppressed_models = previous | {model._meta.concrete_model}
+    try:
+        yield
+    finally:
+        _audit_state.suppressed_models = previous
+
+
+def is_instance_auditing_suppressed(model):
+    return model._meta.concrete_model in getattr(_audit_state, "suppressed_models", ())
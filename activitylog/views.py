@@ -0,0 +1,19 @@
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+
+from activitylog.metrics import PROMETHEUS_CONTENT_TYPE, registry, render_prometheus
+from activitylog.settings import METRICS_TOKEN
+
+
+def metrics_view(request):
+    """Activity log metrics in the Prometheus text format.
+
+    Not routed by default; add it to the project's URLconf, e.g.
+    ``path("activitylog/metrics", metrics_view)``. With ``DJANGO_ACTIVITY_LOG_METRICS_TOKEN``
+    set, requests must send it as ``Authorization: Bearer <token>``.
+    """
+    if METRICS_TOKEN and not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {METRICS_TOKEN}"
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(render_prometheus(registry.collect()), content_type=PROMETHEUS_CONTENT_TYPE)
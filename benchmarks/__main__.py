@@ -0,0 +1,91 @@
+"""Run the benchmark suite and write one JSON document with all results.
+
+    python -m benchmarks [--only NAME ...] [--rows N] [--output FILE]
+
+A benchmark that fails is recorded as ``{"error": ...}`` and the others still run;
+the exit status is then 1. Compare two runs, e.g. of two versions, with
+``python -m benchmarks.compare``.
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import subprocess
+import sys
+import traceback
+from datetime import datetime, timezone
+from importlib import import_module
+
+from benchmarks.utils import quiet, setup
+
+# Benchmark name -> module; every module has a ``run()`` returning its results.
+BENCHMARKS = {
+    "save_queries": "benchmarks.save_queries",
+    "save_overhead": "benchmarks.save_overhead",
+    "on_commit_memory": "benchmarks.on_commit_memory",
+    "request_overhead": "benchmarks.request_overhead",
+    "login_overhead": "benchmarks.login_overhead",
+    "admin_views": "benchmarks.admin_views",
+}
+
+
+def environment():
+    import django
+
+    try:
+        from importlib.metadata import version
+
+        package_version = version("django-activitylog-jwt")
+    except Exception:
+        package_version = None
+    try:
+        revision = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        revision = None
+    return {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "version": package_version,
+        "revision": revision,
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, metavar="NAME")
+    parser.add_argument(
+        "--rows", type=int, default=1000000, help="Events in the admin_views table."
+    )
+    parser.add_argument("--output", help="Write the results to this file instead of stdout.")
+    options = parser.parse_args(argv)
+
+    setup()
+    results = {}
+    for name in options.only or BENCHMARKS:
+        print(f"running {name}", file=sys.stderr)
+        try:
+            module = import_module(BENCHMARKS[name])
+            with quiet():
+                results[name] = module.run(options.rows) if name == "admin_views" else module.run()
+        except Exception as e:
+            traceback.print_exc()
+            results[name] = {"error": f"{type(e).__name__}: {e}"}
+
+    document = {"environment": environment(), "results": results}
+    if options.output:
+        with open(options.output, "w") as f:
+            json.dump(document, f, indent=2)
+    else:
+        json.dump(document, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    if any("error" in result for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
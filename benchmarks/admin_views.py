@@ -0,0 +1,122 @@
+"""Admin changelist and CSV export of the CRUD events, against a large event table.
+
+``ROWS`` events (one million by default) are inserted first. Changelist pages are
+requested with offset and keyset pagination, near the start and in the middle of the
+table; the CSV export action runs over ``EXPORT_ROWS`` events.
+
+    python -m benchmarks.admin_views [ROWS [EXPORT_ROWS]]
+"""
+import json
+import math
+import sys
+from datetime import timedelta
+from itertools import islice
+
+from benchmarks.utils import count_queries, measure, quiet, setup
+
+INSERT_BATCH_SIZE = 10000
+
+
+def populate(rows, user):
+    from django.contrib.contenttypes.models import ContentType
+    from django.utils import timezone
+
+    from activitylog.models import CRUDEvent
+
+    content_type = ContentType.objects.get_for_model(user)
+    start = timezone.now()
+    events = (
+        CRUDEvent(
+            event_type=CRUDEvent.UPDATE,
+            object_id=str(i % 5000),
+            content_type=content_type,
+            object_repr=f"user-{i % 5000}",
+            object_json_repr=json.dumps([{"model": "auth.user", "pk": i % 5000, "fields": {}}]),
+            changed_fields=json.dumps({"first_name": [f"{i}", f"{i + 1}"]}),
+            remote_ip="127.0.0.1",
+            user=user,
+            datetime=start - timedelta(seconds=i),
+        )
+        for i in range(rows)
+    )
+    # the events keep their datetime, see EventDateTimeField
+    while batch := list(islice(events, INSERT_BATCH_SIZE)):
+        CRUDEvent.objects.bulk_create(batch)
+
+
+def run(rows=1000000, export_rows=10000, number=5):
+    from django.contrib import admin
+    from django.contrib.auth.models import User
+    from django.test import Client, RequestFactory
+    from django.urls import reverse
+
+    from activitylog.admin import export_to_csv
+    from activitylog.keyset import AFTER_VAR, encode_cursor
+    from activitylog.models import CRUDEvent
+
+    superuser = User.objects.create_superuser("admin-views", password="benchmark")
+    populate(rows, superuser)
+
+    model_admin = admin.site._registry[CRUDEvent]
+    client = Client()
+    client.force_login(superuser)
+    url = reverse("admin:activitylog_crudevent_changelist")
+    total = CRUDEvent.objects.count()
+    export_rows = min(export_rows, total)
+    middle_page = max(math.ceil(total / model_admin.list_per_page) // 2, 1)
+    middle = CRUDEvent.objects.order_by("-datetime", "-pk")[total // 2]
+
+    def get(path):
+        response = client.get(path)
+        assert response.status_code == 200, response.status_code
+
+    pages = {
+        "offset_first_page": (False, url),
+        "offset_middle_page": (False, f"{url}?p={middle_page}"),
+        "keyset_first_page": (True, url),
+        "keyset_middle_page": (True, f"{url}?{AFTER_VAR}={encode_cursor(middle)}"),
+    }
+
+    results = {"rows": total}
+    configured = model_admin.keyset_pagination, model_admin.change_list_template
+    try:
+        for name, (keyset, path) in pages.items():
+            model_admin.keyset_pagination = keyset
+            model_admin.change_list_template = (
+                model_admin.keyset_change_list_template if keyset else None
+            )
+            results[f"changelist.{name}"] = measure(lambda: get(path), number, warmup=1)
+            results[f"changelist.{name}"]["queries"] = count_queries(lambda: get(path))
+    finally:
+        model_admin.keyset_pagination, model_admin.change_list_template = configured
+
+    request = RequestFactory().post(url)
+    request.user = superuser
+
+    def export():
+        # A new queryset every time, so no run reads the result cache of the previous one.
+        queryset = CRUDEvent.objects.order_by("-datetime")[:export_rows]
+        return export_to_csv(model_admin, request, queryset)
+
+    results["csv_export"] = measure(export, number, warmup=1)
+    results["csv_export"].update(
+        rows=export_rows,
+        bytes=len(export().content),
+        rows_per_second=round(export_rows / (results["csv_export"]["median_us"] / 1e6)),
+        queries=count_queries(export),
+    )
+    return results
+
+
+def main():
+    setup()
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    export_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    with quiet():
+        results = run(rows, export_rows)
+    json.dump({"benchmark": "admin_views", "results": results}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
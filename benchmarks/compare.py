@@ -0,0 +1,85 @@
+"""Compare two result files of ``python -m benchmarks`` and report regressions.
+
+    python -m benchmarks.compare BASELINE.json CURRENT.json [--threshold 0.1]
+
+Timings regress when they are slower by more than ``threshold`` (a fraction), query
+and savepoint counts as soon as they grow. Exits with status 1 on any regression.
+Benchmarks that failed in either run are skipped and listed.
+"""
+import argparse
+import json
+import sys
+
+# Metric name -> whether larger values are better.
+TIMED_METRICS = {"median_us": False, "bytes_per_row": False, "rows_per_second": True}
+COUNTED_METRICS = {"queries", "savepoints"}
+
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def failed(document):
+    """Names of the benchmarks recorded with an error."""
+    return {name for name, result in document["results"].items() if "error" in result}
+
+
+def _succeeded(document, skipped):
+    return {name: result for name, result in document["results"].items() if name not in skipped}
+
+
+def compare(baseline, current, threshold=0.1):
+    """``(metric, baseline value, current value, regressed)`` for the shared metrics.
+
+    Benchmarks that failed in either run are left out.
+    """
+    skipped = failed(baseline) | failed(current)
+    old = dict(flatten(_succeeded(baseline, skipped)))
+    rows = []
+    for name, value in flatten(_succeeded(current, skipped)):
+        metric = name.rsplit(".", 1)[-1]
+        if name not in old or (metric not in TIMED_METRICS and metric not in COUNTED_METRICS):
+            continue
+        previous = old[name]
+        if metric in COUNTED_METRICS:
+            regressed = value > previous
+        elif TIMED_METRICS[metric]:
+            regressed = value < previous * (1 - threshold)
+        else:
+            regressed = value > previous * (1 + threshold)
+        rows.append((name, previous, value, regressed))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    options = parser.parse_args(argv)
+
+    with open(options.baseline) as f:
+        baseline = json.load(f)
+    with open(options.current) as f:
+        current = json.load(f)
+
+    rows = compare(baseline, current, options.threshold)
+    width = max((len(name) for name, *_ in rows), default=0)
+    for name, previous, value, regressed in rows:
+        change = f"{(value - previous) / previous:+.1%}" if previous else "n/a"
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<{width}}  {previous:>12}  {value:>12}  {change:>8}{flag}")
+    for name in sorted(failed(baseline)):
+        print(f"{name}: skipped, failed in {options.baseline}")
+    for name in sorted(failed(current) - failed(baseline)):
+        print(f"{name}: skipped, failed in {options.current}")
+    if any(regressed for *_, regressed in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
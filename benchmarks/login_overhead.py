@@ -0,0 +1,52 @@
+"""Time and queries of the login, logout and failed login receivers.
+
+    python -m benchmarks.login_overhead [NUMBER]
+"""
+import json
+import sys
+
+from benchmarks.utils import count_queries, measure, quiet, setup
+
+
+def run(number=300):
+    from django.contrib.auth.models import User
+    from django.test import RequestFactory
+
+    from activitylog.middleware.middleware import _thread_locals, clear_request
+    from activitylog.signals import auth_signals
+
+    user = User.objects.create(username="login-overhead")
+    request = RequestFactory().post("/login/", REMOTE_ADDR="127.0.0.1")
+    request.user = user
+
+    receivers = {
+        "logged_in": lambda: auth_signals.user_logged_in(User, request=request, user=user),
+        "logged_out": lambda: auth_signals.user_logged_out(User, request=request, user=user),
+        "login_failed": lambda: auth_signals.user_login_failed(
+            User, credentials={User.USERNAME_FIELD: user.get_username()}
+        ),
+    }
+
+    results = {}
+    # As set by ActivityLogMiddleware for the request being handled.
+    _thread_locals.request = request
+    try:
+        for name, receiver in receivers.items():
+            results[name] = measure(receiver, number)
+            results[name]["queries"] = count_queries(receiver)
+    finally:
+        clear_request()
+    return results
+
+
+def main():
+    setup()
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with quiet():
+        results = run(number)
+    json.dump({"benchmark": "login_overhead", "results": results}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
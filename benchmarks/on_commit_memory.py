@@ -0,0 +1,49 @@
+"""Memory held by audit callbacks waiting for a long transaction to commit.
+
+Run from the repository root against the bundled ``tests`` project::
+
+    python -m benchmarks.on_commit_memory [ROWS]
+"""
+import gc
+import json
+import sys
+import tracemalloc
+
+from benchmarks.utils import quiet, setup
+
+
+def run(rows=2000):
+    from django.contrib.auth.models import User
+    from django.db import connection, transaction
+
+    results = {}
+    with transaction.atomic():
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.take_snapshot()
+        for i in range(rows):
+            # The instance goes out of scope right away, as in a data migration.
+            User.objects.create(username=f"memory-{i}", first_name="x" * 200)
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        held = sum(stat.size_diff for stat in snapshot.compare_to(baseline, "filename"))
+        results["pending_callbacks"] = len(connection.run_on_commit)
+        results["rows"] = rows
+        results["bytes_held"] = held
+        results["bytes_per_row"] = round(held / rows)
+        transaction.set_rollback(True)
+    return results
+
+
+def main():
+    setup()
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    with quiet():
+        results = run(rows)
+    json.dump({"benchmark": "on_commit_memory", "results": results}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Time and queries of the ``request_started`` receivers, per request.
+
+    python -m benchmarks.request_overhead [NUMBER]
+"""
+import json
+import sys
+
+from benchmarks.utils import count_queries, measure, quiet, setup
+
+
+def run(number=300):
+    from django.conf import settings
+    from django.contrib.auth import BACKEND_SESSION_KEY, SESSION_KEY
+    from django.contrib.auth.models import User
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.test import RequestFactory
+
+    from activitylog.signals.cors_signals import cors_started_handler
+    from activitylog.signals.request_signals import request_started_handler
+
+    user = User.objects.create(username="request-overhead")
+    session = SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+    session.save()
+    cookie = f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+    factory = RequestFactory()
+
+    def request_only(environ):
+        request_started_handler(sender=None, environ=environ)
+
+    def request_and_cors(environ):
+        request_started_handler(sender=None, environ=environ)
+        cors_started_handler(sender=None, environ=environ)
+
+    cases = {
+        "anonymous": (request_only, {}),
+        "session": (request_only, {"HTTP_COOKIE": cookie}),
+        "session_with_cors": (
+            request_and_cors,
+            {"HTTP_COOKIE": cookie, "HTTP_X_FRONTEND_URL": "/frontend/", "HTTP_URL_METHOD": "GET"},
+        ),
+    }
+
+    results = {}
+    for name, (handler, headers) in cases.items():
+        # The environ is new for every call, as the receivers cache their work in it.
+        def prepare(headers=headers):
+            return factory.get("/benchmark/", {"page": "1"}, **headers).environ
+
+        results[name] = measure(handler, number, prepare)
+        results[name]["queries"] = count_queries(lambda: handler(prepare()))
+    return results
+
+
+def main():
+    setup()
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with quiet():
+        results = run(number)
+    json.dump({"benchmark": "request_overhead", "results": results}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Time added to every create, update, delete and many-to-many add by CRUD auditing.
+
+Each operation is timed with the signal handlers active and with auditing of the
+model suppressed; ``overhead_us`` is the difference of the medians.
+
+    python -m benchmarks.save_overhead [NUMBER]
+"""
+import itertools
+import json
+import sys
+
+from benchmarks.utils import measure, overhead, quiet, setup
+
+
+def run(number=300):
+    from django.contrib.auth.models import Group, User
+
+    from activitylog.utils import suppress_instance_auditing
+
+    sequence = itertools.count()
+    group = Group.objects.create(name="save-overhead")
+
+    def new_user(save=True):
+        user = User(username=f"save-overhead-{next(sequence)}", first_name="x" * 50)
+        if save:
+            user.save()
+        return user
+
+    def update(user):
+        user.first_name = f"{user.first_name}x"[-100:]
+        user.save()
+
+    operations = {
+        "create": (lambda user: user.save(), lambda: new_user(save=False)),
+        "update": (update, new_user),
+        "delete": (lambda user: user.delete(), new_user),
+        "m2m_add": (lambda user: user.groups.add(group), new_user),
+    }
+
+    results = {}
+    for name, (operation, prepare) in operations.items():
+        audited = measure(operation, number, prepare)
+        with suppress_instance_auditing(User):
+            unaudited = measure(operation, number, prepare)
+        results[name] = {
+            "audited": audited,
+            "unaudited": unaudited,
+            "overhead_us": overhead(audited, unaudited),
+        }
+    return results
+
+
+def main():
+    setup()
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with quiet():
+        results = run(number)
+    json.dump({"benchmark": "save_overhead", "results": results}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""Queries issued per audited save, inside a caller's transaction and in autocommit mode.
+
+Run from the repository root against the bundled ``tests`` project::
+
+    python -m benchmarks.save_queries
+"""
+import json
+import sys
+
+from benchmarks.utils import quiet, setup
+
+
+def count_queries(operation, atomic):
+    from django.db import connection, transaction
+    from django.test.utils import CaptureQueriesContext
+
+    with CaptureQueriesContext(connection) as context:
+        if atomic:
+            with transaction.atomic():
+                operation()
+        else:
+            operation()
+    statements = [query["sql"] for query in context.captured_queries]
+    return {
+        "queries": len(statements),
+        "savepoints": sum(sql.startswith("SAVEPOINT") for sql in statements),
+    }
+
+
+def run():
+    from django.contrib.auth.models import Group, User
+
+    group = Group.objects.create(name="benchmark")
+    results = {}
+    for atomic in (True, False):
+        mode = "atomic" if atomic else "autocommit"
+        user = User(username=f"benchmark-{mode}")
+
+        def update():
+            user.first_name = f"{user.first_name}x"
+            user.save()
+
+        operations = {
+            "create": user.save,
+            "update": update,
+            "m2m_add": lambda: user.groups.add(group),
+            "delete": user.delete,
+        }
+        for name, operation in operations.items():
+            results[f"{name}.{mode}"] = count_queries(operation, atomic)
+    return results
+
+
+def main():
+    setup()
+    with quiet():
+        results = run()
+    json.dump({"benchmark": "save_queries", "results": results}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import contextlib
+import os
+import statistics
+import sys
+import time
+
+
+def setup():
+    """Configure the bundled ``tests`` project and create its test database."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+    import django
+
+    django.setup()
+
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    # The SQL log of DEBUG would otherwise be part of every measurement.
+    setup_test_environment(debug=False)
+    connection.creation.create_test_db(verbosity=0)
+
+
+def measure(operation, number, prepare=None, warmup=5):
+    """Time ``number`` calls of ``operation``, in microseconds.
+
+    ``prepare`` is called before every call, outside of the timing, and its result is
+    passed to ``operation``.
+    """
+    timings = []
+    for i in range(warmup + number):
+        args = (prepare(),) if prepare is not None else ()
+        start = time.perf_counter()
+        operation(*args)
+        if i >= warmup:
+            timings.append(time.perf_counter() - start)
+    return {
+        "number": number,
+        "median_us": round(statistics.median(timings) * 1e6, 1),
+        "mean_us": round(statistics.mean(timings) * 1e6, 1),
+        "min_us": round(min(timings) * 1e6, 1),
+    }
+
+
+def overhead(audited, unaudited):
+    return round(audited["median_us"] - unaudited["median_us"], 1)
+
+
+def count_queries(operation):
+    """Number of queries run by ``operation``, without the cap of the query log."""
+    from django.db import connection
+
+    count = 0
+
+    def counter(execute, sql, params, many, context):
+        nonlocal count
+        count += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(counter):
+        operation()
+    return count
+
+
+@contextlib.contextmanager
+def quiet():
+    # Keep stray prints of the code under test out of the JSON written to stdout.
+    with contextlib.redirect_stdout(sys.stderr):
+        yield